@@ -20,7 +20,8 @@ from app.models import (
     Supplier, PurchaseBill, PurchaseReturn, PurchaseBillItem,
     Table, Session, Order, OrderItem, KOT,
     DeliveryPartner, BillOfMaterials, BOMItem, BatchProduction,
-    POSSession, Printer, QRCode, Organization, Branch, Floor, StorageArea, DiscountRule, PaymentMode, Role
+    POSSession, Printer, QRCode, Organization, Branch, Floor, StorageArea, DiscountRule, PaymentMode, Role,
+    DocumentSequence, OrderIdempotencyKey
 )
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,70 @@
+"""add_hot_query_indexes
+
+Composite indexes for the order / KOT / inventory lookups the POS runs all
+day, partial indexes over open orders, and pattern-ops indexes for the prefix
+LIKE used to number orders and KOTs.
+
+Built CONCURRENTLY on PostgreSQL so a live database keeps taking writes; that
+cannot run inside a transaction, hence the autocommit block. IF NOT EXISTS
+makes it safe on databases whose tables were created by init_db() after these
+indexes were added to the models. A concurrent build that fails leaves an
+INVALID index behind which IF NOT EXISTS would skip: drop it and re-run.
+
+Revision ID: 8c1f4e2d9a37
+Revises: 316082cc10c2
+Create Date: 2026-10-17 10:12:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1f4e2d9a37'
+down_revision: Union[str, Sequence[str], None] = '316082cc10c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_ORDER_PREDICATE = sa.text("status IN ('Pending', 'In Progress', 'BillRequested', 'Draft', 'Completed')")
+
+# (name, table, columns, dialect options, postgresql only)
+INDEXES = [
+    ('ix_orders_branch_created_at', 'orders', ['branch_id', 'created_at'], {}, False),
+    ('ix_orders_table_status', 'orders', ['table_id', 'status'], {}, False),
+    ('ix_orders_active_table', 'orders', ['table_id'],
+     {'postgresql_where': ACTIVE_ORDER_PREDICATE, 'sqlite_where': ACTIVE_ORDER_PREDICATE}, False),
+    ('ix_orders_active_branch', 'orders', ['branch_id', 'created_at'],
+     {'postgresql_where': ACTIVE_ORDER_PREDICATE, 'sqlite_where': ACTIVE_ORDER_PREDICATE}, False),
+    ('ix_orders_order_number_pattern', 'orders', ['order_number'],
+     {'postgresql_ops': {'order_number': 'varchar_pattern_ops'}}, True),
+    ('ix_order_items_order_id', 'order_items', ['order_id'], {}, False),
+    ('ix_kots_order_id', 'kots', ['order_id'], {}, False),
+    ('ix_kots_kot_number_pattern', 'kots', ['kot_number'],
+     {'postgresql_ops': {'kot_number': 'varchar_pattern_ops'}}, True),
+    ('ix_kot_items_kot_id', 'kot_items', ['kot_id'], {}, False),
+    ('ix_inventory_txn_product_type', 'inventory_transactions', ['product_id', 'transaction_type'],
+     {'postgresql_include': ['quantity']}, False),
+    ('ix_inventory_txn_branch_created_at', 'inventory_transactions', ['branch_id', 'created_at'], {}, False),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns, options, postgres_only in INDEXES:
+            if postgres_only and not is_postgres:
+                continue
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True, **options)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns, options, postgres_only in reversed(INDEXES):
+            if postgres_only and not is_postgres:
+                continue
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
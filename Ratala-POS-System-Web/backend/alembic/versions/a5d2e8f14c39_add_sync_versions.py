@@ -0,0 +1,46 @@
+"""add_sync_versions
+
+Change version of every catalogue row a POS terminal mirrors (categories,
+menu groups, menu items, floors), for GET /pos/sync?since=<cursor>. Existing
+rows get 0, so the first delta sync after the upgrade sends only what changed
+since. Columns init_db() already added are skipped; the (branch_id,
+sync_version) indexes are built CONCURRENTLY on PostgreSQL.
+
+Revision ID: a5d2e8f14c39
+Revises: f3a8d61c2b07
+Create Date: 2026-10-17 21:40:12.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5d2e8f14c39'
+down_revision: Union[str, Sequence[str], None] = 'f3a8d61c2b07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ['categories', 'menu_groups', 'menu_items', 'floors']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        if 'sync_version' not in {column['name'] for column in inspector.get_columns(table)}:
+            op.add_column(table, sa.Column('sync_version', sa.BigInteger(), nullable=False, server_default='0'))
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.create_index(f'ix_{table}_branch_sync_version', table, ['branch_id', 'sync_version'],
+                            if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_branch_sync_version', table_name=table, if_exists=True)
+        op.drop_column(table, 'sync_version')
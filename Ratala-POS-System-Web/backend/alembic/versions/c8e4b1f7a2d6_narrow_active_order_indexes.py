@@ -0,0 +1,68 @@
+"""narrow_active_order_indexes
+
+Completed orders are settled, like Paid ones: the partial indexes over open
+orders (ix_orders_active_table, ix_orders_active_branch) no longer cover
+them, so they stay the size of the open orders instead of growing with the
+order history.
+
+On PostgreSQL each index is built CONCURRENTLY under a temporary name, the
+old one dropped and the new one renamed, so lookups never go without it.
+Partitioned orders tables cannot build or drop indexes concurrently; there
+the indexes are rebuilt in the migration's transaction. SQLite drops and
+recreates them.
+
+Revision ID: c8e4b1f7a2d6
+Revises: a5d2e8f14c39
+Create Date: 2026-10-18 09:14:52.270431
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.partitioning import is_partitioned
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e4b1f7a2d6'
+down_revision: Union[str, Sequence[str], None] = 'a5d2e8f14c39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPEN_STATUSES = "'Pending', 'In Progress', 'BillRequested', 'Draft'"
+
+# (name, columns)
+ACTIVE_INDEXES = [
+    ('ix_orders_active_table', ['table_id']),
+    ('ix_orders_active_branch', ['branch_id', 'created_at']),
+]
+
+
+def _rebuild(statuses: str) -> None:
+    bind = op.get_bind()
+    predicate = sa.text(f"status IN ({statuses})")
+    where = {'postgresql_where': predicate, 'sqlite_where': predicate}
+
+    if bind.dialect.name != 'postgresql' or is_partitioned(bind):
+        for name, columns in ACTIVE_INDEXES:
+            op.drop_index(name, table_name='orders', if_exists=True)
+            op.create_index(name, 'orders', columns, **where)
+        return
+
+    with op.get_context().autocommit_block():
+        for name, columns in ACTIVE_INDEXES:
+            op.drop_index(f'{name}_new', table_name='orders', if_exists=True, postgresql_concurrently=True)
+            op.create_index(f'{name}_new', 'orders', columns, postgresql_concurrently=True, **where)
+            op.drop_index(name, table_name='orders', if_exists=True, postgresql_concurrently=True)
+            op.execute(f'ALTER INDEX {name}_new RENAME TO {name}')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _rebuild(OPEN_STATUSES)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _rebuild(OPEN_STATUSES + ", 'Completed'")
@@ -0,0 +1,73 @@
+"""add_document_sequences
+
+Counter table behind app.services.sequence_service, and KOT / production
+numbers made unique per branch instead of across all branches: each branch
+now has its own daily KOT-, BOT-, PROD- and AUTO- sequence.
+
+Existing counters are not backfilled; the first number of a day is seeded
+from the highest one already stored. Both steps are skipped when init_db()
+already created the new schema. Downgrading fails if two branches have since
+used the same KOT or production number.
+
+Revision ID: d41a7b3c5e92
+Revises: 8c1f4e2d9a37
+Create Date: 2026-10-17 14:26:09.530871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41a7b3c5e92'
+down_revision: Union[str, Sequence[str], None] = '8c1f4e2d9a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# PostgreSQL's default name for a single-column unique constraint; batch mode on
+# SQLite gives the reflected (unnamed) constraints the same name
+NAMING_CONVENTION = {"uq": "%(table_name)s_%(column_0_name)s_key"}
+
+# (table, number column, per-branch constraint)
+NUMBERED_TABLES = [
+    ('kots', 'kot_number', 'uq_kot_number_branch'),
+    ('batch_productions', 'production_number', 'uq_production_number_branch'),
+]
+
+
+def _unique_constraints(table):
+    return sa.inspect(op.get_bind()).get_unique_constraints(table)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'document_sequences',
+        sa.Column('branch_id', sa.Integer(), sa.ForeignKey('branches.id'), primary_key=True),
+        sa.Column('doc_type', sa.String(), primary_key=True),
+        sa.Column('business_date', sa.Date(), primary_key=True),
+        sa.Column('last_value', sa.Integer(), nullable=False),
+        if_not_exists=True
+    )
+
+    for table, column, constraint in NUMBERED_TABLES:
+        existing = _unique_constraints(table)
+        if any(uc['name'] == constraint for uc in existing):
+            continue
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            for uc in existing:
+                if uc['column_names'] == [column]:
+                    batch_op.drop_constraint(uc['name'] or f"{table}_{column}_key", type_='unique')
+            batch_op.create_unique_constraint(constraint, ['branch_id', column])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column, constraint in reversed(NUMBERED_TABLES):
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(constraint, type_='unique')
+            batch_op.create_unique_constraint(f"{table}_{column}_key", [column])
+
+    op.drop_table('document_sequences')
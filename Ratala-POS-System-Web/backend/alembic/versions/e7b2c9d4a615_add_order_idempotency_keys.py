@@ -0,0 +1,40 @@
+"""add_order_idempotency_keys
+
+Keys of orders ingested through POST /orders/bulk, one row per (branch,
+client key). The row is claimed before the order is written, so a replayed
+or concurrently retried key never creates a second order. Skipped when
+init_db() already created the table.
+
+Revision ID: e7b2c9d4a615
+Revises: d41a7b3c5e92
+Create Date: 2026-10-17 18:02:44.117392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2c9d4a615'
+down_revision: Union[str, Sequence[str], None] = 'd41a7b3c5e92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'order_idempotency_keys',
+        sa.Column('branch_id', sa.Integer(), sa.ForeignKey('branches.id'), primary_key=True),
+        sa.Column('idempotency_key', sa.String(), primary_key=True),
+        sa.Column('order_id', sa.Integer(), sa.ForeignKey('orders.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('order_idempotency_keys')
@@ -0,0 +1,42 @@
+"""partition_order_tables
+
+PostgreSQL only: orders becomes a table partitioned by month on created_at,
+and order_items, kots and kot_items partitions that follow their order (see
+app.db.partitioning). The tables are copied into their partitioned form in
+this transaction and stay locked until it commits, so run it in a quiet
+hour. archive_orders.py then splits closed months off the hot partitions of
+the lines and moves them to cold storage. A no-op on other databases, and
+on databases that are already partitioned.
+
+Revision ID: f3a8d61c2b07
+Revises: e7b2c9d4a615
+Create Date: 2026-10-17 21:40:12.508213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.core.config import settings
+from app.db.partitioning import partition_order_tables, unpartition_order_tables
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8d61c2b07'
+down_revision: Union[str, Sequence[str], None] = 'e7b2c9d4a615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        partition_order_tables(bind, settings.ORDER_PARTITION_MONTHS_AHEAD)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        unpartition_order_tables(bind)
@@ -9,7 +9,7 @@ api_router = APIRouter()
 try:
     from . import (
         auth, users, customers, menu, inventory, purchase, orders, reports, 
-        delivery, tables, kots, settings, organizations, branches, roles, floors, sessions, otp, qr_codes, printers, pos
+        delivery, tables, kots, settings, organizations, branches, roles, floors, sessions, otp, qr_codes, printers, pos, diagnostics
     )
     
     # Include all route modules
@@ -43,6 +43,7 @@ try:
     api_router.include_router(qr_codes.router)  # prefix already set in router
     api_router.include_router(printers.router, prefix="/printers", tags=["Printers"])
     api_router.include_router(pos.router, prefix="/pos", tags=["POS"])
+    api_router.include_router(diagnostics.router)  # prefix already set in router
     
     from . import images
     api_router.include_router(images.router)
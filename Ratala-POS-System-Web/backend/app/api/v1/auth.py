@@ -4,15 +4,20 @@ Authentication routes
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.database import get_db
+from app.db.database import get_db, get_async_db
 from app.core.dependencies import (
-    verify_password, get_password_hash, create_access_token, get_current_user
+    get_password_hash, create_access_token, get_current_user, get_current_db_user
 )
 from app.models import User as DBUser
 from app.schemas import Token, UserCreate, UserResponse, BranchSelectionRequest, UserProfileUpdate
 from app.core.config import settings
+from app.core.password_hasher import password_hasher, PasswordHasherBusy
+from app.core.permissions import permission_registry
+from app.core.principal_cache import principal_cache
 import os
 import uuid
 from typing import Optional
@@ -22,7 +27,7 @@ router = APIRouter()
 
 
 @router.post("/signup", response_model=dict)
-async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+def signup(user_data: UserCreate, db: Session = Depends(get_db)):
     print(f"DEBUG: Received signup request for {user_data.email}")
     """
     User registration endpoint - creates user and organization
@@ -119,9 +124,13 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Login endpoint - returns JWT token with organization and branch info"""
+    """
+    Login endpoint - returns JWT token with organization and branch info.
+    Stays on the event loop: queries use the async session and bcrypt runs
+    in the password hasher pool, so a burst of logins holds no threads.
+    """
     print(f"DEBUG: Received login request for {form_data.username}")
     from app.services import branch_service
     
@@ -147,9 +156,11 @@ async def login_for_access_token(
             "accessible_branches": []
         }
 
-    user = db.query(DBUser).filter(
-        (DBUser.username == form_data.username) | (DBUser.email == form_data.username)
-    ).first()
+    user = (await db.execute(
+        select(DBUser).filter(
+            (DBUser.username == form_data.username) | (DBUser.email == form_data.username)
+        )
+    )).scalars().first()
     
     if not user:
         print(f"❌ Login failed: User {form_data.username} not found.")
@@ -167,7 +178,15 @@ async def login_for_access_token(
             detail=message,
         )
     
-    if not verify_password(form_data.password, user.hashed_password):
+    try:
+        password_ok, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins at once, please try again.",
+            headers={"Retry-After": "1"},
+        )
+    if not password_ok:
         print(f"❌ Login failed: Incorrect password for user {form_data.username}.")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -175,6 +194,11 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Stored hash uses another bcrypt cost than PASSWORD_BCRYPT_ROUNDS
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    
     print(f"✅ Login successful for {form_data.username}")
     
     # Get user's accessible branches
@@ -183,7 +207,7 @@ async def login_for_access_token(
     
     if user.organization_id:
         # Get all branches the user can access
-        branches = branch_service.get_branches_by_user(db, user.id)
+        branches = await db.run_sync(lambda session: branch_service.get_branches_by_user(session, user.id))
         accessible_branches = [
             {
                 "id": branch.id,
@@ -196,11 +220,12 @@ async def login_for_access_token(
         
         # If user doesn't have a current branch set, use primary branch
         if not current_branch_id and branches:
-            primary_branch = branch_service.get_primary_branch(db, user.id)
+            primary_branch = await db.run_sync(lambda session: branch_service.get_primary_branch(session, user.id))
             if primary_branch:
                 current_branch_id = primary_branch.id
                 user.current_branch_id = current_branch_id
-                db.commit()
+                await db.commit()
+                principal_cache.invalidate_user(user.id)
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -224,43 +249,22 @@ async def login_for_access_token(
 
 
 @router.get("/users/me", response_model=UserResponse)
-async def read_users_me(
-    current_user: DBUser = Depends(get_current_user),
+def read_users_me(
+    current_user: DBUser = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
-    """Get current authenticated user with permissions and robust fallbacks"""
-    from app.models.role import Role
-    from sqlalchemy import func
+    """Get current authenticated user with the permissions of their role in the current branch"""
+    role = permission_registry.get_role(db, current_user.current_branch_id, current_user.role)
+    permissions = list(role.names)
     
-    user_role_name = current_user.role.lower()
-    permissions = []
-    
-    if user_role_name in ['admin', 'platform_admin']:
-        permissions = ["*"]
-    else:
-        # 1. Try to fetch dynamic permissions from roles table for current branch
-        role = db.query(Role).filter(
-            func.lower(Role.name) == user_role_name,
-            Role.branch_id == current_user.current_branch_id
-        ).first()
-        if role and role.permissions:
-            permissions = role.permissions
-            
-        # 2. Fallback to standard permissions for legacy or default roles if no dynamic perms found
-        if not permissions:
-            if user_role_name == 'manager':
-                permissions = ['dashboard.view', 'pos.access']
-            else:
-                permissions = ['pos.access'] # Default to POS only for other staff roles
-
     current_user.permissions = permissions
     return current_user
 
 
 @router.put("/users/me", response_model=UserResponse)
-async def update_user_me(
+def update_user_me(
     user_data: UserProfileUpdate,
-    current_user: DBUser = Depends(get_current_user),
+    current_user: DBUser = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
     """Update current user's profile info"""
@@ -286,14 +290,15 @@ async def update_user_me(
         
     db.commit()
     db.refresh(current_user)
+    principal_cache.invalidate_user(current_user.id)
     return current_user
 
 
 @router.post("/users/me/profile-picture")
 @router.post("/users/me/photo")
-async def update_user_photo(
+def update_user_photo(
     file: UploadFile = File(...),
-    current_user: DBUser = Depends(get_current_user),
+    current_user: DBUser = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
     """Upload and update current user's profile photo"""
@@ -315,12 +320,13 @@ async def update_user_photo(
         raise HTTPException(status_code=400, detail=f"File must be an image. Received: {file.content_type}")
     
     try:
-        content = await file.read()
+        content = file.file.read()
         current_user.profile_image_data = content
         current_user.profile_image_url = f"/api/v1/images/users/{current_user.id}/profile"
         db.add(current_user)
         db.commit()
         db.refresh(current_user)
+        principal_cache.invalidate_user(current_user.id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not save image: {str(e)}")
         
@@ -328,10 +334,10 @@ async def update_user_photo(
 
 
 @router.post("/select-branch", response_model=Token)
-async def select_branch(
+def select_branch(
     branch_selection: BranchSelectionRequest,
     db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_user)
+    current_user: DBUser = Depends(get_current_db_user)
 ):
     """Select a branch for the current session"""
     from app.services import branch_service
@@ -349,6 +355,7 @@ async def select_branch(
     # Update user's current branch
     current_user.current_branch_id = branch_selection.branch_id
     db.commit()
+    principal_cache.invalidate_user(current_user.id)
     
     # Generate new token with updated branch ID
     accessible_branches = [
@@ -15,7 +15,7 @@ router = APIRouter()
 
 
 @router.get("", response_model=list[CustomerResponse])
-async def get_customers(
+def get_customers(
     search: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -34,7 +34,7 @@ async def get_customers(
 
 
 @router.post("", response_model=CustomerResponse)
-async def create_customer(
+def create_customer(
     customer_data: CustomerCreate = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -52,7 +52,7 @@ async def create_customer(
 
 
 @router.get("/{customer_id}", response_model=CustomerResponse)
-async def get_customer(
+def get_customer(
     customer_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -71,7 +71,7 @@ async def get_customer(
 
 @router.put("/{customer_id}", response_model=CustomerResponse)
 @router.patch("/{customer_id}", response_model=CustomerResponse)
-async def update_customer(
+def update_customer(
     customer_id: int,
     customer_data: CustomerUpdate = Body(...),
     db: Session = Depends(get_db),
@@ -98,7 +98,7 @@ async def update_customer(
 
 
 @router.delete("/{customer_id}")
-async def delete_customer(
+def delete_customer(
     customer_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -19,7 +19,7 @@ def apply_branch_filter_delivery(query, branch_id):
 
 
 @router.get("")
-async def get_delivery_partners(
+def get_delivery_partners(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -33,7 +33,7 @@ async def get_delivery_partners(
 
 
 @router.post("")
-async def create_delivery_partner(
+def create_delivery_partner(
     partner_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -54,7 +54,7 @@ async def create_delivery_partner(
 
 
 @router.put("/{partner_id}")
-async def update_delivery_partner(
+def update_delivery_partner(
     partner_id: int,
     partner_data: dict = Body(...),
     db: Session = Depends(get_db),
@@ -80,7 +80,7 @@ async def update_delivery_partner(
 
 
 @router.delete("/{partner_id}")
-async def delete_delivery_partner(
+def delete_delivery_partner(
     partner_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
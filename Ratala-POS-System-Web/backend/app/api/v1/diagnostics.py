@@ -0,0 +1,67 @@
+"""
+Runtime diagnostics routes (platform admin only)
+
+The figures are worker-wide - event loop, pools and caches shared by every
+organization - so organization admins cannot read them.
+"""
+from fastapi import APIRouter, Depends
+
+from app.core.dependencies import check_platform_admin
+from app.core.loop_monitor import loop_monitor
+from app.core.password_hasher import password_hasher
+from app.core.permissions import permission_registry
+from app.core.menu_snapshot import menu_snapshots
+from app.core.pricing import pricing_profiles
+from app.core.principal_cache import principal_cache
+from app.db.database import get_pool_status
+
+router = APIRouter(prefix="/diagnostics", tags=["Diagnostics"])
+
+
+@router.get("/event-loop")
+async def get_event_loop_stats(
+    reset: bool = False,
+    top_call_sites: int = 5,
+    current_user = Depends(check_platform_admin)
+):
+    """
+    Event loop lag and per-route blocking histograms.
+    Enable with LOOP_MONITOR_ENABLED=true; pass reset=true to start a fresh window.
+    """
+    snapshot = loop_monitor.snapshot(top_call_sites=top_call_sites)
+    if reset:
+        loop_monitor.reset()
+    return snapshot
+
+
+@router.get("/db-pool")
+async def get_db_pool_stats(current_user = Depends(check_platform_admin)):
+    """
+    Connection pool checkout latency, waits, timeouts and overflow per engine,
+    plus how many connections all workers may open at most.
+    """
+    return get_pool_status()
+
+
+@router.get("/auth-cache")
+async def get_auth_cache_stats(current_user = Depends(check_platform_admin)):
+    """Hit rate and size of this worker's user / branch-access / role-permission caches"""
+    return {**principal_cache.to_dict(), "permissions": permission_registry.to_dict()}
+
+
+@router.get("/password-hasher")
+async def get_password_hasher_stats(current_user = Depends(check_platform_admin)):
+    """bcrypt pool queue depth, wait / hash time histograms, rejections and rehashes"""
+    return password_hasher.to_dict()
+
+
+@router.get("/pricing-cache")
+async def get_pricing_cache_stats(current_user = Depends(check_platform_admin)):
+    """Hit rate and size of this worker's branch pricing profile cache"""
+    return pricing_profiles.to_dict()
+
+
+@router.get("/menu-snapshot")
+async def get_menu_snapshot_stats(current_user = Depends(check_platform_admin)):
+    """Hit rate, full loads and patched rows of this worker's per-branch menu snapshots"""
+    return menu_snapshots.to_dict()
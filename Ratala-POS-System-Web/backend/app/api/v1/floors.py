@@ -20,7 +20,7 @@ def apply_branch_filter(db: Session, query, branch_id):
 
 
 @router.get("")
-async def get_floors(
+def get_floors(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -34,7 +34,7 @@ async def get_floors(
 
 
 @router.get("/{floor_id}")
-async def get_floor(
+def get_floor(
     floor_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -51,7 +51,7 @@ async def get_floor(
 
 
 @router.post("")
-async def create_floor(
+def create_floor(
     floor_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(check_admin_role),
@@ -83,7 +83,7 @@ async def create_floor(
 
 @router.put("/{floor_id}")
 @router.patch("/{floor_id}")
-async def update_floor(
+def update_floor(
     floor_id: int,
     floor_data: dict = Body(...),
     db: Session = Depends(get_db),
@@ -117,7 +117,7 @@ async def update_floor(
 
 
 @router.delete("/{floor_id}")
-async def delete_floor(
+def delete_floor(
     floor_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(check_admin_role),
@@ -139,7 +139,7 @@ async def delete_floor(
 
 
 @router.put("/{floor_id}/reorder")
-async def reorder_floor(
+def reorder_floor(
     floor_id: int,
     new_order: int = Body(..., embed=True),
     db: Session = Depends(get_db),
@@ -10,11 +10,14 @@ import random
 
 from app.db.database import get_db
 from app.core.dependencies import get_current_user, get_branch_id
+from app.core.menu_snapshot import menu_snapshots
+from app.core.serialization import ORJSONResponse
 from app.models import (
     Product, UnitOfMeasurement, InventoryTransaction,
     BillOfMaterials, BOMItem, BatchProduction, POSSession, Branch, MenuItem
 )
 from app.services.inventory_service import InventoryService
+from app.services import sequence_service
 
 router = APIRouter()
 
@@ -71,7 +74,7 @@ def get_product_status(stock: float, min_stock: float) -> str:
 # ============================================================================
 
 @router.get("/products")
-async def get_products(
+def get_products(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -102,7 +105,7 @@ async def get_products(
 
 
 @router.post("/products")
-async def create_product(
+def create_product(
     product_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -164,7 +167,7 @@ async def create_product(
 
 @router.put("/products/{product_id}")
 @router.patch("/products/{product_id}")
-async def update_product(
+def update_product(
     product_id: int,
     product_data: dict = Body(...),
     db: Session = Depends(get_db),
@@ -233,7 +236,7 @@ async def update_product(
 
 
 @router.delete("/products/{product_id}")
-async def delete_product(
+def delete_product(
     product_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -267,7 +270,7 @@ async def delete_product(
 # ============================================================================
 
 @router.get("/units")
-async def get_units(
+def get_units(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -293,7 +296,7 @@ async def get_units(
 
 
 @router.post("/units")
-async def create_unit(
+def create_unit(
     unit_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -327,7 +330,7 @@ async def create_unit(
 
 @router.put("/units/{unit_id}")
 @router.patch("/units/{unit_id}")
-async def update_unit(
+def update_unit(
     unit_id: int,
     unit_data: dict = Body(...),
     db: Session = Depends(get_db),
@@ -350,7 +353,7 @@ async def update_unit(
 
 
 @router.delete("/units/{unit_id}")
-async def delete_unit(
+def delete_unit(
     unit_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -376,7 +379,7 @@ async def delete_unit(
 # ============================================================================
 
 @router.post("/transactions")
-async def create_transaction(
+def create_transaction(
     txn_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -417,7 +420,7 @@ async def create_transaction(
 
 
 @router.get("/transactions")
-async def get_transactions(
+def get_transactions(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -435,7 +438,7 @@ async def get_transactions(
 # ============================================================================
 
 @router.post("/adjustments")
-async def create_adjustment(
+def create_adjustment(
     adj_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -507,7 +510,7 @@ async def create_adjustment(
 
 
 @router.get("/adjustments")
-async def get_adjustments(
+def get_adjustments(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -529,7 +532,7 @@ async def get_adjustments(
 # ============================================================================
 
 @router.get("/boms")
-async def get_boms(
+def get_boms(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -598,11 +601,12 @@ async def get_boms(
             ]
         })
         
-    return result
+    # Plain dicts: dumped as they are, without jsonable_encoder
+    return ORJSONResponse(result)
 
 
 @router.post("/boms")
-async def create_bom(
+def create_bom(
     bom_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -644,12 +648,14 @@ async def create_bom(
         
     db.commit()
     db.refresh(new_bom)
+    if menu_item_ids:
+        menu_snapshots.refresh(db, branch_id, MenuItem.id.in_(menu_item_ids))
     return new_bom
 
 
 @router.put("/boms/{bom_id}")
 @router.patch("/boms/{bom_id}")
-async def update_bom(
+def update_bom(
     bom_id: int,
     bom_data: dict = Body(...),
     db: Session = Depends(get_db),
@@ -697,11 +703,13 @@ async def update_bom(
             
     db.commit()
     db.refresh(db_bom)
+    if menu_item_ids is not None:
+        menu_snapshots.invalidate(branch_id)
     return db_bom
 
 
 @router.delete("/boms/{bom_id}")
-async def delete_bom(
+def delete_bom(
     bom_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -731,6 +739,7 @@ async def delete_bom(
     
     db.delete(db_bom)
     db.commit()
+    menu_snapshots.invalidate(branch_id)
     return {"message": "Recipe deleted successfully"}
 
 
@@ -739,7 +748,7 @@ async def delete_bom(
 # ============================================================================
 
 @router.post("/productions")
-async def create_production(
+def create_production(
     prod_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -790,21 +799,7 @@ async def create_production(
     if insufficient:
         raise HTTPException(status_code=400, detail={"msg": "Insufficient materials", "items": insufficient})
         
-    today_date = datetime.now(timezone.utc).strftime('%Y%m%d')
-    while True:
-        # Count productions for today for daily sequence
-        daily_count = db.query(BatchProduction).filter(
-            func.date(BatchProduction.created_at) == datetime.utcnow().date()
-        ).count()
-        prod_num = f"PROD-{today_date}-{str(daily_count + 1).zfill(4)}"
-        
-        # Double check uniqueness (in case of race conditions)
-        if not db.query(BatchProduction).filter(BatchProduction.production_number == prod_num).first():
-            break
-        # If exists (race condition), the loop will try count+1 again but count might have updated
-        # However, .count() won't update in the same transaction unless refreshed
-        # For simplicity in this context:
-        daily_count += 1 
+    prod_num = sequence_service.next_number(db, "PROD", branch_id, business_date=datetime.now(timezone.utc).date())
     
     # Find active session
     active_session = db.query(POSSession).filter(
@@ -893,7 +888,7 @@ async def create_production(
 
 
 @router.get("/productions")
-async def get_productions(
+def get_productions(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -972,10 +967,10 @@ async def get_productions(
     # Sort back to descending order for the UI
     final_result = [result_map[p.id] for p in productions]
     final_result.reverse()
-    return final_result
+    return ORJSONResponse(final_result)
 
 @router.get("/productions/counts")
-async def get_productions_counts(
+def get_productions_counts(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
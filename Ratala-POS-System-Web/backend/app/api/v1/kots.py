@@ -2,40 +2,60 @@
 KOT (Kitchen Order Ticket) and BOT (Bar Order Ticket) management routes with branch isolation
 """
 from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy import func
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from typing import Optional, List
-from datetime import datetime, timezone
-import random
 
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.core.dependencies import get_current_user, get_branch_id
+from app.core.query_counter import query_budget
+from app.core.serialization import ResponseSerializer
 from app.models import KOT, Order, KOTItem, MenuItem
-from sqlalchemy.orm import joinedload
 from fastapi import BackgroundTasks
 from app.services.printing_service import PrintingService
+from app.services import sequence_service
 
 from app.schemas.orders_customers import KOTResponse
 
 router = APIRouter()
 
+KOT_LIST = ResponseSerializer(List[KOTResponse])
+
+
+def kot_response_options():
+    """Eager-load everything KOTResponse serializes (AsyncSession cannot lazy load)"""
+    return (
+        joinedload(KOT.order).joinedload(Order.table),
+        selectinload(KOT.items).joinedload(KOTItem.menu_item),
+        joinedload(KOT.user)
+    )
+
+
+async def load_kot_for_response(db: AsyncSession, kot_id: int, *extra_options):
+    """Reload a KOT with its full response graph, refreshing any stale state"""
+    result = await db.execute(
+        select(KOT)
+        .options(*kot_response_options(), *extra_options)
+        .filter(KOT.id == kot_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
 
 @router.get("", response_model=List[KOTResponse])
+@query_budget(10)
 async def get_kots(
     kot_type: Optional[str] = None,  # KOT or BOT
     status: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Get all KOTs/BOTs for the branch, optionally filtered by type and status"""
     # branch_id is now provided by dependency
     
-    query = db.query(KOT).options(
-        joinedload(KOT.order).joinedload(Order.table),
-        joinedload(KOT.items).joinedload(KOTItem.menu_item),
-        joinedload(KOT.user)
-    ).join(Order)
+    query = select(KOT).options(*kot_response_options()).join(KOT.order)
     
     # Filter by branch_id for data isolation
     if branch_id:
@@ -46,31 +66,28 @@ async def get_kots(
     if status:
         query = query.filter(KOT.status == status)
     
-    kots = query.order_by(KOT.created_at.desc()).all()
-    return kots
+    result = await db.execute(query.order_by(KOT.created_at.desc()))
+    kots = result.scalars().all()
+    return KOT_LIST.response(kots)
 
 
 @router.get("/{kot_id}", response_model=KOTResponse)
 async def get_kot(
     kot_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Get KOT by ID, filtered by branch"""
     # branch_id is now provided by dependency
     
-    query = db.query(KOT).options(
-        joinedload(KOT.order).joinedload(Order.table),
-        joinedload(KOT.items).joinedload(KOTItem.menu_item),
-        joinedload(KOT.user)
-    ).filter(KOT.id == kot_id)
+    query = select(KOT).options(*kot_response_options()).filter(KOT.id == kot_id)
     
     # Filter by branch_id for data isolation
     if branch_id:
-        query = query.join(Order).filter(Order.branch_id == branch_id)
+        query = query.join(KOT.order).filter(Order.branch_id == branch_id)
     
-    kot = query.first()
+    kot = (await db.execute(query)).scalars().first()
     
     if not kot:
         raise HTTPException(status_code=404, detail="KOT not found or access denied")
@@ -81,53 +98,28 @@ async def get_kot(
 async def create_kot(
     background_tasks: BackgroundTasks,
     kot_data: dict = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Create a new KOT or BOT"""
     items_data = kot_data.pop('items', [])
     
+    kot_data['branch_id'] = branch_id
+    
     # Generate KOT number if not provided
     if 'kot_number' not in kot_data:
         kot_type = kot_data.get('kot_type', 'KOT')
-        prefix = 'KOT' if kot_type == 'KOT' else 'BOT'
-        
-        # Get today's start
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_str = datetime.now().strftime('%Y%m%d')
-        kot_prefix = f"{prefix}-{today_str}-"
-        
-        while True:
-            # Check globally across all branches for uniqueness if we've removed branch code
-            last_kot = db.query(KOT).filter(
-                KOT.kot_number.like(f"{kot_prefix}%")
-            ).order_by(KOT.kot_number.desc()).first()
-            
-            seq = 1
-            if last_kot:
-                try:
-                    parts = last_kot.kot_number.split('-')
-                    if len(parts) >= 3:
-                        seq = int(parts[-1]) + 1
-                except (ValueError, IndexError):
-                    pass
-            
-            kot_number = f"{kot_prefix}{seq:04d}"
-            
-            # Check if this number already exists
-            existing = db.query(KOT).filter(KOT.kot_number == kot_number).first()
-            if not existing:
-                kot_data['kot_number'] = kot_number
-                break
-            
-            # If exists, we continue loop which will find the new last_kot
+        doc_type = 'KOT' if kot_type == 'KOT' else 'BOT'
+        kot_data['kot_number'] = await db.run_sync(
+            lambda session: sequence_service.next_number(session, doc_type, branch_id)
+        )
     
     kot_data['created_by'] = current_user.id
     
     new_kot = KOT(**kot_data)
     db.add(new_kot)
-    db.flush()
+    await db.flush()
     
     # Add items
     for item in items_data:
@@ -139,15 +131,13 @@ async def create_kot(
         )
         db.add(kot_item)
         
-    db.commit()
-    db.refresh(new_kot)
+    await db.commit()
     
     # Reload with relationships for printing
-    kot = db.query(KOT).options(
-        joinedload(KOT.order).joinedload(Order.table),
-        joinedload(KOT.items).joinedload(KOTItem.menu_item).joinedload(MenuItem.bom),
-        joinedload(KOT.user)
-    ).filter(KOT.id == new_kot.id).first()
+    kot = await load_kot_for_response(
+        db, new_kot.id,
+        selectinload(KOT.items).joinedload(KOTItem.menu_item).joinedload(MenuItem.bom)
+    )
 
     # Background printing
     printing_service = PrintingService(db)
@@ -163,17 +153,17 @@ async def create_kot(
 async def update_kot(
     kot_id: int,
     kot_data: dict = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Update a KOT/BOT in the branch"""
     # branch_id is now provided by dependency
     
-    query = db.query(KOT).filter(KOT.id == kot_id)
+    query = select(KOT).filter(KOT.id == kot_id)
     if branch_id:
-        query = query.join(Order).filter(Order.branch_id == branch_id)
-    kot = query.first()
+        query = query.join(KOT.order).filter(Order.branch_id == branch_id)
+    kot = (await db.execute(query)).scalars().first()
     
     if not kot:
         raise HTTPException(status_code=404, detail="KOT not found or access denied")
@@ -181,28 +171,25 @@ async def update_kot(
     for key, value in kot_data.items():
         setattr(kot, key, value)
     
-    db.commit()
-    db.refresh(kot)
-    return kot
+    await db.commit()
+    return await load_kot_for_response(db, kot.id)
 
 
 @router.put("/{kot_id}/status", response_model=KOTResponse)
 async def update_kot_status(
     kot_id: int,
     status: str = Body(..., embed=True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Update KOT/BOT status in the branch"""
     # branch_id is now provided by dependency
     
-    query = db.query(KOT).options(
-        joinedload(KOT.items).joinedload(KOTItem.menu_item)
-    ).filter(KOT.id == kot_id)
+    query = select(KOT).filter(KOT.id == kot_id)
     if branch_id:
-        query = query.join(Order).filter(Order.branch_id == branch_id)
-    kot = query.first()
+        query = query.join(KOT.order).filter(Order.branch_id == branch_id)
+    kot = (await db.execute(query)).scalars().first()
     
     if not kot:
         raise HTTPException(status_code=404, detail="KOT not found or access denied")
@@ -213,36 +200,38 @@ async def update_kot_status(
     # Deduct inventory when KOT is marked as Served
     if status == "Served" and old_status != "Served":
         from app.services.inventory_service import InventoryService
-        # Get the order to pass to inventory service
-        order = db.query(Order).filter(Order.id == kot.order_id).first()
-        if order:
-            InventoryService.deduct_inventory_for_order(db, order, current_user.id)
+        order_id = kot.order_id
+        user_id = current_user.id
+
+        # InventoryService walks BOM relationships lazily, so run it against the sync facade
+        def deduct(sync_db):
+            # Get the order to pass to inventory service
+            order = sync_db.get(Order, order_id)
+            if order:
+                InventoryService.deduct_inventory_for_order(sync_db, order, user_id)
+
+        await db.run_sync(deduct)
     
-    db.commit()
-    db.refresh(kot)
-    return kot
+    await db.commit()
+    return await load_kot_for_response(db, kot.id)
 
 @router.post("/{kot_id}/print")
 async def print_kot(
     kot_id: int,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Manually trigger KOT/BOT printing"""
     # branch_id is now provided by dependency
     
-    query = db.query(KOT).options(
-        joinedload(KOT.order).joinedload(Order.table),
-        joinedload(KOT.items).joinedload(KOTItem.menu_item),
-        joinedload(KOT.user)
-    ).filter(KOT.id == kot_id)
+    query = select(KOT).options(*kot_response_options()).filter(KOT.id == kot_id)
     
     if branch_id:
-        query = query.join(Order).filter(Order.branch_id == branch_id)
+        query = query.join(KOT.order).filter(Order.branch_id == branch_id)
     
-    kot = query.first()
+    kot = (await db.execute(query)).scalars().first()
     if not kot:
         raise HTTPException(status_code=404, detail="KOT not found")
     
@@ -9,6 +9,7 @@ import shutil
 
 from app.db.database import get_db
 from app.core.dependencies import get_current_user, get_branch_id
+from app.core.menu_snapshot import menu_snapshots
 from app.models import MenuItem, Category, MenuGroup, Branch
 from typing import List
 from app.schemas import (
@@ -28,7 +29,7 @@ def apply_branch_filter_menu(query, model, branch_id):
 
 
 @router.get("/public-items", response_model=List[MenuItemResponse])
-async def get_public_menu_items(
+def get_public_menu_items(
     branch_id: int | None = None,
     db: Session = Depends(get_db)
 ):
@@ -42,7 +43,7 @@ async def get_public_menu_items(
 
 
 @router.get("/public-categories", response_model=List[CategoryResponse])
-async def get_public_categories(
+def get_public_categories(
     branch_id: int | None = None,
     db: Session = Depends(get_db)
 ):
@@ -56,7 +57,7 @@ async def get_public_categories(
 
 
 @router.get("/items", response_model=List[MenuItemResponse])
-async def get_menu_items(
+def get_menu_items(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -69,7 +70,7 @@ async def get_menu_items(
 
 
 @router.post("/items")
-async def create_menu_item(
+def create_menu_item(
     item_data: MenuItemCreate,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -83,11 +84,12 @@ async def create_menu_item(
     db.add(new_item)
     db.commit()
     db.refresh(new_item)
+    menu_snapshots.refresh(db, branch_id, MenuItem.id == new_item.id)
     return new_item
 
 
 @router.get("/categories")
-async def get_categories(
+def get_categories(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -99,7 +101,7 @@ async def get_categories(
 
 
 @router.post("/categories")
-async def create_category(
+def create_category(
     category_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -116,7 +118,7 @@ async def create_category(
 
 
 @router.get("/groups")
-async def get_groups(
+def get_groups(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -128,7 +130,7 @@ async def get_groups(
 
 
 @router.post("/groups")
-async def create_group(
+def create_group(
     group_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -145,7 +147,7 @@ async def create_group(
 
 
 @router.put("/items/bulk-update", response_model=BulkMenuItemUpdateResponse)
-async def bulk_update_menu_items(
+def bulk_update_menu_items(
     updates: list[dict] = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -180,13 +182,15 @@ async def bulk_update_menu_items(
     
     for item in updated_items:
         db.refresh(item)
+    if updated_items:
+        menu_snapshots.refresh(db, branch_id, MenuItem.id.in_([item.id for item in updated_items]))
     
     return {"updated_count": len(updated_items), "items": updated_items}
 
 
 @router.put("/items/{item_id}", response_model=MenuItemResponse)
 @router.patch("/items/{item_id}", response_model=MenuItemResponse)
-async def update_menu_item(
+def update_menu_item(
     item_id: int,
     item_data: dict = Body(...),
     db: Session = Depends(get_db),
@@ -206,11 +210,12 @@ async def update_menu_item(
     
     db.commit()
     db.refresh(item)
+    menu_snapshots.refresh(db, branch_id, MenuItem.id == item.id)
     return item
 
 
 @router.delete("/items/{item_id}")
-async def delete_menu_item(
+def delete_menu_item(
     item_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -225,11 +230,12 @@ async def delete_menu_item(
     
     item.is_active = False
     db.commit()
+    menu_snapshots.refresh(db, branch_id, MenuItem.id == item_id)
     return {"message": "Menu item deleted"}
 
 
 @router.post("/items/{item_id}/image", response_model=MenuItemResponse)
-async def upload_menu_item_image(
+def upload_menu_item_image(
     item_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
@@ -245,7 +251,7 @@ async def upload_menu_item_image(
         
     # Save to database (Binary)
     try:
-        content = await file.read()
+        content = file.file.read()
         item.image_data = content
         item.image = f"/api/v1/images/menu-items/{item_id}"
     except Exception as e:
@@ -258,7 +264,7 @@ async def upload_menu_item_image(
 
 
 @router.post("/categories/{category_id}/image", response_model=CategoryResponse)
-async def upload_category_image(
+def upload_category_image(
     category_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
@@ -276,7 +282,7 @@ async def upload_category_image(
         raise HTTPException(status_code=400, detail="File must be an image")
         
     try:
-        content = await file.read()
+        content = file.file.read()
         category.image_data = content
         category.image = f"/api/v1/images/categories/{category_id}"
     except Exception as e:
@@ -288,7 +294,7 @@ async def upload_category_image(
 
 
 @router.post("/groups/{group_id}/image", response_model=MenuGroupResponse)
-async def upload_group_image(
+def upload_group_image(
     group_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
@@ -308,7 +314,7 @@ async def upload_group_image(
         raise HTTPException(status_code=400, detail="File must be an image")
         
     try:
-        content = await file.read()
+        content = file.file.read()
         group.image_data = content
         group.image = f"/api/v1/images/groups/{group_id}"
     except Exception as e:
@@ -321,7 +327,7 @@ async def upload_group_image(
 
 @router.put("/categories/{category_id}", response_model=CategoryResponse)
 @router.patch("/categories/{category_id}", response_model=CategoryResponse)
-async def update_category(
+def update_category(
     category_id: int,
     category_data: dict = Body(...),
     db: Session = Depends(get_db),
@@ -341,11 +347,13 @@ async def update_category(
     
     db.commit()
     db.refresh(category)
+    # The category's type routes its items to the kitchen or the bar
+    menu_snapshots.refresh(db, branch_id, MenuItem.category_id == category_id)
     return category
 
 
 @router.delete("/categories/{category_id}")
-async def delete_category(
+def delete_category(
     category_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -365,12 +373,13 @@ async def delete_category(
     db.query(MenuItem).filter(MenuItem.category_id == category_id).update({"is_active": False})
     
     db.commit()
+    menu_snapshots.refresh(db, branch_id, MenuItem.category_id == category_id)
     return {"message": "Category and associated items deleted"}
 
 
 @router.put("/groups/{group_id}", response_model=MenuGroupResponse)
 @router.patch("/groups/{group_id}", response_model=MenuGroupResponse)
-async def update_group(
+def update_group(
     group_id: int,
     group_data: dict = Body(...),
     db: Session = Depends(get_db),
@@ -394,7 +403,7 @@ async def update_group(
 
 
 @router.delete("/groups/{group_id}")
-async def delete_group(
+def delete_group(
     group_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -413,5 +422,6 @@ async def delete_group(
     db.query(MenuItem).filter(MenuItem.group_id == group_id).update({"is_active": False})
     
     db.commit()
+    menu_snapshots.refresh(db, branch_id, MenuItem.group_id == group_id)
     return {"message": "Menu group and associated items deleted"}
 
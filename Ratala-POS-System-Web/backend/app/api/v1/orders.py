@@ -1,45 +1,146 @@
 """
 Order management routes
 """
-from fastapi import APIRouter, Depends, Body, HTTPException, BackgroundTasks, Header
-from sqlalchemy import func
-from sqlalchemy.orm import Session, joinedload
-from typing import Optional, List
-import random
+from fastapi import APIRouter, Depends, Body, HTTPException, BackgroundTasks, Header, Query
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import Optional, List, Literal
 from datetime import datetime, timezone
+import base64
 from app.services.printing_service import PrintingService
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.core.serialization import ResponseSerializer
+from app.db.database import get_async_db
 from app.core.dependencies import get_current_user, get_branch_id
-from app.models import Order, OrderItem, KOT, KOTItem, Table, Customer, POSSession, CompanySettings, MenuItem, Branch
+from app.core.query_counter import query_budget
+from app.models import Order, OrderItem, KOT, KOTItem, Table, Customer, POSSession
+from app.models.orders import ACTIVE_ORDER_STATUSES
 
-from app.schemas import OrderResponse
+from app.schemas import OrderResponse, OrderSummaryResponse
 from app.services.inventory_service import InventoryService
+from app.services.order_calculation import OrderCalculationService, OrderTotals
+from app.services.order_item_diff import diff_order_items, apply_order_item_diff
+from app.services import sequence_service, order_ingest_service
+from app.services.table_reconciler import table_reconciler
 
 router = APIRouter()
 
+ORDER_LIST = ResponseSerializer(List[OrderResponse])
+ORDER_SUMMARY_LIST = ResponseSerializer(List[OrderSummaryResponse])
+
+
+def order_response_options():
+    """Eager-load everything OrderResponse serializes (AsyncSession cannot lazy load)"""
+    return (
+        joinedload(Order.table),
+        joinedload(Order.customer),
+        joinedload(Order.delivery_partner),
+        selectinload(Order.items).joinedload(OrderItem.menu_item),
+        selectinload(Order.kots).selectinload(KOT.items).joinedload(KOTItem.menu_item),
+        selectinload(Order.kots).joinedload(KOT.user),
+    )
+
+
+async def load_order_for_response(db: AsyncSession, order_id: int):
+    """Reload an order with its full response graph, refreshing any stale state"""
+    result = await db.execute(
+        select(Order)
+        .options(*order_response_options())
+        .filter(Order.id == order_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().unique().first()
+
+
+def order_summary_options():
+    """Eager-load what OrderSummaryResponse serializes (no item / KOT graphs)"""
+    return (
+        joinedload(Order.table),
+        joinedload(Order.customer),
+        joinedload(Order.delivery_partner),
+    )
+
+
+def encode_order_cursor(order: Order) -> str:
+    """Opaque keyset cursor: the (created_at, id) of the last order of a page"""
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_order_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, order_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(order_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def list_orders(
+    db: AsyncSession,
+    query,
+    fields: str,
+    limit: Optional[int],
+    cursor: Optional[str]
+):
+    """
+    Newest orders first, one page at a time when limit is given
+
+    Pages are cut on (created_at, id) rather than OFFSET, so a page costs the
+    same however deep it is and orders created meanwhile do not shift it.
+    The cursor for the next page goes out in the X-Next-Cursor header.
+    """
+    summary = fields == "summary"
+    query = query.options(*(order_summary_options() if summary else order_response_options()))
+    if cursor:
+        created_at, order_id = decode_order_cursor(cursor)
+        query = query.filter(or_(
+            Order.created_at < created_at,
+            and_(Order.created_at == created_at, Order.id < order_id)
+        ))
+    query = query.order_by(Order.created_at.desc(), Order.id.desc())
+    if limit:
+        query = query.limit(limit + 1)
+
+    orders = (await db.execute(query)).scalars().unique().all()
+    headers = {}
+    if limit and len(orders) > limit:
+        orders = orders[:limit]
+        headers["X-Next-Cursor"] = encode_order_cursor(orders[-1])
+
+    # Serialized here rather than through the route's response_model: one pass
+    # over the rows, and summaries do not get the empty items / kots of OrderResponse
+    serializer = ORDER_SUMMARY_LIST if summary else ORDER_LIST
+    return serializer.response(orders, headers=headers)
+
 
 @router.get("", response_model=List[OrderResponse])
+@query_budget(10)
 async def get_orders(
     order_type: Optional[str] = None,
     status: Optional[str] = None,
     customer_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    fields: Literal["full", "summary"] = "full",
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
-    """Get all orders, optionally filtered by order_type, status, and customer_id"""
+    """
+    Get orders, optionally filtered by order_type, status, and customer_id
+
+    Without limit every matching order is returned (kept for older clients);
+    pass limit and then the X-Next-Cursor of each page as cursor to page
+    through them. fields=summary leaves out items and KOTs.
+    """
     # branch_id is now provided by dependency
     
-    query = db.query(Order).options(
-        joinedload(Order.table),
-        joinedload(Order.customer), joinedload(Order.delivery_partner),
-        joinedload(Order.items).joinedload(OrderItem.menu_item),
-        joinedload(Order.kots).joinedload(KOT.items).joinedload(KOTItem.menu_item)
-    )
-    
     # Filter by branch_id for data isolation
-    query = query.filter(Order.branch_id == branch_id)
+    query = select(Order).filter(Order.branch_id == branch_id)
     
     if order_type:
         query = query.filter(Order.order_type == order_type)
@@ -50,73 +151,70 @@ async def get_orders(
     if customer_id:
         query = query.filter(Order.customer_id == customer_id)
     
-    orders = query.order_by(Order.created_at.desc()).all()
-    return orders
+    return await list_orders(db, query, fields, limit, cursor)
+
+
+@router.get("/open", response_model=List[OrderResponse])
+@query_budget(10)
+async def get_open_orders(
+    order_type: Optional[str] = None,
+    table_id: Optional[int] = None,
+    fields: Literal["full", "summary"] = "full",
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user),
+    branch_id: int = Depends(get_branch_id)
+):
+    """
+    Orders still open in the branch (not Paid / Completed / Cancelled), newest first
+
+    Meant for POS terminals to poll: the status filter is the predicate of the
+    partial index ix_orders_active_branch, so the cost follows the number of
+    open orders rather than the branch's order history.
+    """
+    query = select(Order).filter(
+        Order.branch_id == branch_id,
+        Order.status.in_(ACTIVE_ORDER_STATUSES)
+    )
+    if order_type:
+        query = query.filter(Order.order_type == order_type)
+    if table_id:
+        query = query.filter(Order.table_id == table_id)
+    
+    return await list_orders(db, query, fields, limit, cursor)
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Get order by ID with items"""
     # branch_id is now provided by dependency
     
-    query = db.query(Order).options(
-        joinedload(Order.table),
-        joinedload(Order.customer), joinedload(Order.delivery_partner),
-        joinedload(Order.items).joinedload(OrderItem.menu_item),
-        joinedload(Order.kots).joinedload(KOT.items).joinedload(KOTItem.menu_item)
-    ).filter(Order.id == order_id)
+    query = select(Order).options(*order_response_options()).filter(Order.id == order_id)
     
     # Filter by branch_id for data isolation
     if branch_id:
         query = query.filter(Order.branch_id == branch_id)
     
-    order = query.first()
+    order = (await db.execute(query)).scalars().unique().first()
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    # Recalculate totals if gross_amount doesn't match sum of items
-    # This handles cases where items were added incrementally through multiple KOTs
-    if order.items:
-        calculated_gross = sum(item.subtotal for item in order.items)
-        
-        # If there's a mismatch, recalculate all amounts
-        if abs(calculated_gross - (order.gross_amount or 0)) > 0.01:
-            settings = db.query(CompanySettings).first()
-            branch = db.query(Branch).filter(Branch.id == order.branch_id).first()
-            
-            sc_rate = branch.service_charge_rate if branch and branch.service_charge_rate is not None else (settings.service_charge_rate if settings else 10.0)
-            tax_rate = branch.tax_rate if branch and branch.tax_rate is not None else (settings.tax_rate if settings else 13.0)
-            
-            discount = order.discount or 0
-            delivery = order.delivery_charge or 0
-            
-            # Consistent with Frontend: SC and Tax on Net of Discount
-            base_amount = max(0, calculated_gross - discount)
-            sc_amount = round(base_amount * (sc_rate / 100), 2)
-            tax_amount = round((base_amount + sc_amount) * (tax_rate / 100), 2)
-            
-            order.gross_amount = calculated_gross
-            order.service_charge_amount = sc_amount
-            order.tax_amount = tax_amount
-            order.net_amount = round(base_amount + sc_amount + tax_amount + delivery, 2)
-            order.total_amount = order.net_amount
-            
-            db.commit()
-            db.refresh(order)
-    
+    # Read-only: totals are kept up to date when lines are written (OrderTotals);
+    # check_order_totals.py finds and repairs orders that drifted anyway
     return order
 
 
 @router.post("", response_model=OrderResponse)
 async def create_order(
     order_data: dict = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id),
     x_branch_code: str = Header(..., alias="X-Branch-Code")
@@ -124,45 +222,17 @@ async def create_order(
     """Create a new order"""
     items_data = order_data.pop('items', [])
     
-    if 'order_number' not in order_data:
-        # Generate branch-specific order number (format: BRANCH-ORD-YYYYMMDD-SEQ)
-        today_str = datetime.now().strftime('%Y%m%d')
-        prefix = f"{x_branch_code}-ORD-{today_str}-"
-        
-        while True:
-            last_order = db.query(Order).filter(
-                Order.branch_id == branch_id,
-                Order.order_number.like(f"{prefix}%")
-            ).order_by(Order.order_number.desc()).first()
-            
-            if last_order:
-                try:
-                    parts = last_order.order_number.split('-')
-                    if len(parts) >= 3:
-                        last_seq = int(parts[-1])
-                        seq = last_seq + 1
-                    else:
-                        seq = 1
-                except (ValueError, IndexError):
-                    seq = 1
-            else:
-                seq = 1
-                
-            order_number = f"{prefix}{seq:04d}"
-            # Double check uniqueness within branch
-            if not db.query(Order).filter(Order.order_number == order_number, Order.branch_id == branch_id).first():
-                order_data['order_number'] = order_number
-                break
-            # If exists, loop will run again and last_order will find the one we just detected
     order_data['created_by'] = current_user.id
     order_data['branch_id'] = branch_id
     
     # Tie to active POS Session
-    active_session = db.query(POSSession).filter(
-        POSSession.user_id == current_user.id,
-        POSSession.branch_id == branch_id,
-        POSSession.status == "Open"
-    ).first()
+    active_session = (await db.execute(
+        select(POSSession).filter(
+            POSSession.user_id == current_user.id,
+            POSSession.branch_id == branch_id,
+            POSSession.status == "Open"
+        )
+    )).scalars().first()
     if active_session:
         order_data['pos_session_id'] = active_session.id
     
@@ -170,10 +240,12 @@ async def create_order(
     customer_name = order_data.pop('customer_name', None)
     if not order_data.get('customer_id') and customer_name:
         # Try to find existing customer by name in this branch
-        customer = db.query(Customer).filter(
-            Customer.name == customer_name,
-            Customer.branch_id == branch_id
-        ).first()
+        customer = (await db.execute(
+            select(Customer).filter(
+                Customer.name == customer_name,
+                Customer.branch_id == branch_id
+            )
+        )).scalars().first()
 
         if not customer:
             # Create a basic customer profile
@@ -183,40 +255,25 @@ async def create_order(
                 customer_type="Regular"
             )
             db.add(customer)
-            db.flush()
+            await db.flush()
 
         order_data['customer_id'] = customer.id
 
     # Calculate accurate amounts based on business rules
-    # 1. Gross - sum of items
-    gross = 0
-    for item in items_data:
-        price = item.get('price')
-        if price is None or price == 0:
-            mi = db.query(MenuItem).filter(MenuItem.id == item.get('menu_item_id')).first()
-            price = mi.price if mi else 0
-        gross += (item.get('quantity', 0) * price)
-    
-    # 2. Charges from settings (Branch specific first)
-    settings = db.query(CompanySettings).first()
-    branch = db.query(Branch).filter(Branch.id == branch_id).first()
-    
-    sc_rate = branch.service_charge_rate if branch and branch.service_charge_rate is not None else (settings.service_charge_rate if settings else 10.0)
-    tax_rate = branch.tax_rate if branch and branch.tax_rate is not None else (settings.tax_rate if settings else 13.0)
-    
-    discount = order_data.get('discount', 0)
-    delivery_charge = order_data.get('delivery_charge', 0)
-    
-    # Consistent with Frontend: SC and Tax on Net of Discount
-    base_amount = max(0, gross - discount)
-    sc_amount = round(base_amount * (sc_rate / 100), 2)
-    tax_amount = round((base_amount + sc_amount) * (tax_rate / 100), 2)
+    menu = await OrderCalculationService.get_menu_async(db, branch_id, items_data)
+    OrderCalculationService.resolve_item_prices(menu, items_data)
+    gross = OrderCalculationService.items_gross(items_data)
+    profile = await OrderCalculationService.get_profile_async(db, branch_id)
+    
+    discount_rule_id = order_data.pop('discount_rule_id', None)
+    if discount_rule_id:
+        order_data['discount'] = OrderCalculationService.rule_discount(
+            profile, discount_rule_id, gross, order_data.get('order_type')
+        )
     
-    order_data['gross_amount'] = gross
-    order_data['service_charge_amount'] = sc_amount
-    order_data['tax_amount'] = tax_amount
-    order_data['net_amount'] = round(base_amount + sc_amount + tax_amount + delivery_charge, 2)
-    order_data['total_amount'] = order_data['net_amount']
+    order_data.update(OrderCalculationService.calculate_order_amounts(
+        profile, gross, order_data.get('discount', 0), order_data.get('delivery_charge', 0)
+    ))
     
     # Set branch_id for data isolation
     order_data['branch_id'] = branch_id
@@ -225,133 +282,66 @@ async def create_order(
     order_data.pop('tax', None)
     order_data.pop('service_charge', None)
     
+    # The order, its lines and tickets are only added to the session at the
+    # end, once they have their numbers (see below)
     new_order = Order(**order_data)
-    db.add(new_order)
-    db.flush() # Get ID before adding items
     
     # Add items
     for item in items_data:
         order_item = OrderItem(
-            order_id=new_order.id,
             menu_item_id=item['menu_item_id'],
             quantity=item['quantity'],
             price=item.get('price', 0),
             subtotal=item.get('subtotal', item.get('price', 0) * item['quantity']),
             notes=item.get('notes', '')
         )
-        db.add(order_item)
+        new_order.items.append(order_item)
     
     # --- Generate KOT/BOT logic ---
+    kot = bot = None
     if new_order.status != 'Draft':
-        item_ids = [item['menu_item_id'] for item in items_data]
-        menu_items = db.query(MenuItem).options(joinedload(MenuItem.category)).filter(MenuItem.id.in_(item_ids)).all()
-        # Map item ID -> MenuItem object
-        menu_items_map = {m.id: m for m in menu_items}
-        
-        kot_items = []
-        bot_items = []
-        
-        for item in items_data:
-            m_item = menu_items_map.get(item['menu_item_id'])
-            if m_item:
-                # Prioritize Category type, fallback to MenuItem.kot_bot
-                category_type = m_item.category.type if m_item.category else m_item.kot_bot
-                if category_type == 'BOT':
-                    bot_items.append(item)
-                else:
-                    kot_items.append(item)
-
-        today_str = datetime.now().strftime('%Y%m%d')
+        # Category type, falling back to MenuItem.kot_bot, picks the station
+        kot_items, bot_items = menu.split_by_station(items_data)
 
         # Create KOT
         if kot_items:
-            kot_prefix = f"KOT-{today_str}-"
-            
-            while True:
-                # Check globally across all branches for uniqueness if we've removed branch code
-                last_kot = db.query(KOT).filter(
-                    KOT.kot_number.like(f"{kot_prefix}%")
-                ).order_by(KOT.kot_number.desc()).first()
-                
-                kot_seq = 1
-                if last_kot:
-                    try:
-                        parts = last_kot.kot_number.split('-')
-                        if len(parts) >= 3:
-                            kot_seq = int(parts[-1]) + 1
-                    except (ValueError, IndexError):
-                        pass
-                
-                new_kot_num = f"{kot_prefix}{kot_seq:04d}"
-                if not db.query(KOT).filter(KOT.kot_number == new_kot_num).first():
-                    break
-            
             kot = KOT(
-                kot_number=new_kot_num,
-                order_id=new_order.id,
                 branch_id=branch_id,
                 kot_type='KOT',
                 status='Pending',
                 created_by=current_user.id
             )
-            db.add(kot)
-            db.flush()
+            new_order.kots.append(kot)
             
             for item in kot_items:
                 k_item = KOTItem(
-                    kot_id=kot.id,
                     menu_item_id=item['menu_item_id'],
                     quantity=item['quantity'],
                     notes=item.get('notes', '')
                 )
-                db.add(k_item)
+                kot.items.append(k_item)
                 
         # Create BOT
         if bot_items:
-            bot_prefix = f"BOT-{today_str}-"
-            
-            while True:
-                # Check globally across all branches for uniqueness
-                last_bot = db.query(KOT).filter(
-                    KOT.kot_number.like(f"{bot_prefix}%")
-                ).order_by(KOT.kot_number.desc()).first()
-                
-                bot_seq = 1
-                if last_bot:
-                    try:
-                        parts = last_bot.kot_number.split('-')
-                        if len(parts) >= 3:
-                            bot_seq = int(parts[-1]) + 1
-                    except (ValueError, IndexError):
-                        pass
-                
-                new_bot_num = f"{bot_prefix}{bot_seq:04d}"
-                if not db.query(KOT).filter(KOT.kot_number == new_bot_num).first():
-                    break
-            
             bot = KOT(
-                kot_number=new_bot_num,
-                order_id=new_order.id,
                 branch_id=branch_id,
                 kot_type='BOT',
                 status='Pending',
                 created_by=current_user.id
             )
-            db.add(bot)
-            db.flush()
+            new_order.kots.append(bot)
             
             for item in bot_items:
                 b_item = KOTItem(
-                    kot_id=bot.id,
                     menu_item_id=item['menu_item_id'],
                     quantity=item['quantity'],
                     notes=item.get('notes', '')
                 )
-                db.add(b_item)
+                bot.items.append(b_item)
     
     # Update table status to Occupied if table order
     if new_order.table_id and new_order.order_type in ['Table', 'Dine-in']:
-        table = db.query(Table).filter(Table.id == new_order.table_id).first()
+        table = await db.get(Table, new_order.table_id)
         if table:
             # Determine target status
             target_status = "Occupied"
@@ -360,57 +350,141 @@ async def create_order(
             
             if table.merge_group_id and str(table.merge_group_id).strip():
                 # Update all tables in merge group
-                db.query(Table).filter(
-                    Table.merge_group_id == table.merge_group_id,
-                    Table.branch_id == new_order.branch_id
-                ).update({"status": target_status})
+                await db.execute(
+                    update(Table).where(
+                        Table.merge_group_id == table.merge_group_id,
+                        Table.branch_id == new_order.branch_id
+                    ).values(status=target_status)
+                )
             else:
                 table.status = target_status
     
     # Update customer stats if Paid
     if new_order.status in ['Paid', 'Completed'] and new_order.customer_id:
-        customer = db.query(Customer).filter(Customer.id == new_order.customer_id).first()
+        customer = await db.get(Customer, new_order.customer_id)
         if customer:
             customer.total_visits += 1
             customer.total_spent += (new_order.net_amount or 0)
             customer.due_amount += (new_order.credit_amount or 0)
             customer.updated_at = datetime.now(timezone.utc)
 
-    db.commit()
-    db.refresh(new_order)
+    # Numbers are allocated right before the commit: each counter row stays
+    # locked only while this order's rows are inserted and committed
+    if 'order_number' not in order_data:
+        # Branch-specific order number (format: BRANCH-ORD-YYYYMMDD-SEQ)
+        new_order.order_number = await db.run_sync(
+            lambda session: sequence_service.next_number(session, "ORD", branch_id, x_branch_code)
+        )
+    if kot:
+        kot.kot_number = await db.run_sync(
+            lambda session: sequence_service.next_number(session, "KOT", branch_id)
+        )
+    if bot:
+        bot.kot_number = await db.run_sync(
+            lambda session: sequence_service.next_number(session, "BOT", branch_id)
+        )
+    db.add(new_order)
+    await db.commit()
     
     # Reload with relationships
-    order = db.query(Order).options(
-        joinedload(Order.table),
-        joinedload(Order.customer),
-        joinedload(Order.items).joinedload(OrderItem.menu_item),
-        joinedload(Order.kots).joinedload(KOT.items).joinedload(KOTItem.menu_item)
-    ).filter(Order.id == new_order.id).first()
+    order = await load_order_for_response(db, new_order.id)
     
     return order
 
 
+@router.post("/bulk")
+async def ingest_orders(
+    payload: dict = Body(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user),
+    branch_id: int = Depends(get_branch_id),
+    x_branch_code: str = Header(..., alias="X-Branch-Code")
+):
+    """
+    Ingest orders a terminal queued while offline
+
+    Body: {"orders": [...]}, each order shaped like POST /orders plus a
+    client-generated idempotency_key (and optionally its offline created_at).
+    Orders are written ORDER_BULK_CHUNK_SIZE at a time, one transaction per
+    chunk. Each order gets a result, in request order: created, duplicate
+    (the key was ingested before; the earlier order is returned) or error.
+    Replaying the same request is safe.
+    """
+    orders = payload.get('orders')
+    if not isinstance(orders, list) or not orders:
+        raise HTTPException(status_code=400, detail="orders must be a non-empty list")
+    if len(orders) > settings.ORDER_BULK_MAX_ORDERS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.ORDER_BULK_MAX_ORDERS} orders per request"
+        )
+    
+    results = []
+    chunk_size = max(settings.ORDER_BULK_CHUNK_SIZE, 1)
+    for start in range(0, len(orders), chunk_size):
+        chunk = orders[start:start + chunk_size]
+        try:
+            results += await db.run_sync(
+                lambda session: order_ingest_service.ingest_chunk(
+                    session, chunk, branch_id, x_branch_code, current_user.id
+                )
+            )
+            await db.commit()
+        except SQLAlchemyError:
+            await db.rollback()
+            results += [
+                order_ingest_service.result(order, "error", detail="Not saved, retry this order")
+                for order in chunk
+            ]
+    
+    counts = {status: 0 for status in ("created", "duplicate", "error")}
+    for entry in results:
+        counts[entry["status"]] += 1
+    if counts["created"]:
+        table_reconciler.notify(branch_id)
+    return {**counts, "results": results}
+
+
+async def _set_table_status(db: AsyncSession, table_id: int, branch_id: int, status: str):
+    """Set a table's status, propagating to every table in its merge group"""
+    table = await db.get(Table, table_id)
+    if table:
+        if table.merge_group_id and str(table.merge_group_id).strip():
+            # Update all tables in merge group
+            await db.execute(
+                update(Table).where(
+                    Table.merge_group_id == table.merge_group_id,
+                    Table.branch_id == branch_id
+                ).values(status=status)
+            )
+        else:
+            table.status = status
+    return table
+
+
 @router.put("/{order_id}", response_model=OrderResponse)
 @router.patch("/{order_id}", response_model=OrderResponse)
 async def update_order(
     order_id: int,
     order_data: dict = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Update an order"""
-    order = db.query(Order).filter(
-        Order.id == order_id,
-        Order.branch_id == branch_id
-    ).first()
+    # Separate items if they exist
+    items_data = order_data.pop('items', None)
+    
+    query = select(Order).filter(Order.id == order_id, Order.branch_id == branch_id)
+    if items_data is not None:
+        query = query.options(selectinload(Order.items))
+    order = (await db.execute(query)).scalars().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     old_status = order.status
-    
-    # Separate items if they exist
-    items_data = order_data.pop('items', None)
+    # From the stored gross, before the payload can overwrite gross_amount
+    totals = OrderTotals.for_order(order)
     
     for key, value in order_data.items():
         if hasattr(order, key):
@@ -418,55 +492,18 @@ async def update_order(
     
     # Update items if provided
     if items_data is not None:
-        # Simple approach: clear and re-add
-        # For a more robust system, we would diff them.
-        db.query(OrderItem).filter(OrderItem.order_id == order.id).delete()
-        for item_data in items_data:
-            new_order_item = OrderItem(
-                order_id=order.id,
-                menu_item_id=item_data['menu_item_id'],
-                quantity=item_data['quantity'],
-                price=item_data.get('price', 0),
-                subtotal=item_data.get('subtotal', item_data.get('price', 0) * item_data['quantity']),
-                notes=item_data.get('notes', '')
-            )
-            db.add(new_order_item)
+        # Missing prices fall back to the current menu price
+        menu = await OrderCalculationService.get_menu_async(db, order.branch_id, items_data)
+        OrderCalculationService.resolve_item_prices(menu, items_data)
+        # Write only the lines that changed (unchanged lines keep their ids)
+        diff = diff_order_items(order.items, items_data)
+        totals.shift(diff.gross_delta)
+        await apply_order_item_diff(db, order.id, diff)
     
     # Recalculate amounts if items were updated or specific amounts provided
     if items_data is not None or 'gross_amount' in order_data or 'discount' in order_data or 'delivery_charge' in order_data:
-        # Calculate gross - if items_data is provided, use it (it's the source of truth for the update)
-        if items_data is not None:
-             gross = 0
-             for item in items_data:
-                 price = item.get('price')
-                 if price is None or price == 0:
-                     # Fallback to current menu price if missing
-                     mi = db.query(MenuItem).filter(MenuItem.id == item['menu_item_id']).first()
-                     price = mi.price if mi else 0
-                 gross += (item['quantity'] * price)
-        else:
-            # Use existing items if none provided in this update
-            gross = sum(item.quantity * item.price for item in order.items)
-        
-        settings = db.query(CompanySettings).first()
-        branch = db.query(Branch).filter(Branch.id == order.branch_id).first()
-        
-        sc_rate = branch.service_charge_rate if branch and branch.service_charge_rate is not None else (settings.service_charge_rate if settings else 10.0)
-        tax_rate = branch.tax_rate if branch and branch.tax_rate is not None else (settings.tax_rate if settings else 13.0)
-        
-        discount = order.discount or 0
-        delivery = order.delivery_charge or 0
-        
-        # Consistent with Frontend: SC and Tax on Net of Discount
-        base_amount = max(0, gross - discount)
-        sc_amount = round(base_amount * (sc_rate / 100), 2)
-        tax_amount = round((base_amount + sc_amount) * (tax_rate / 100), 2)
-        
-        order.gross_amount = gross
-        order.service_charge_amount = sc_amount
-        order.tax_amount = tax_amount
-        order.net_amount = round(base_amount + sc_amount + tax_amount + delivery, 2)
-        order.total_amount = order.net_amount
+        profile = await OrderCalculationService.get_profile_async(db, order.branch_id)
+        totals.apply(order, profile)
     
     # Handle KOT status when order status changes
     if 'status' in order_data:
@@ -476,24 +513,15 @@ async def update_order(
             # No need to deduct again here
             
             # Mark all associated KOTs as Served when payment is done
-            db.query(KOT).filter(KOT.order_id == order.id).update({"status": "Served"})
+            await db.execute(update(KOT).where(KOT.order_id == order.id).values(status="Served"))
             
             # Update table status if applicable
             if order.table_id and order.order_type in ['Table', 'Dine-in']:
-                table = db.query(Table).filter(Table.id == order.table_id).first()
-                if table:
-                    if table.merge_group_id and str(table.merge_group_id).strip():
-                        # Update all tables in merge group
-                        db.query(Table).filter(
-                            Table.merge_group_id == table.merge_group_id,
-                            Table.branch_id == order.branch_id
-                        ).update({"status": "Available"})
-                    else:
-                        table.status = "Available"
+                await _set_table_status(db, order.table_id, order.branch_id, "Available")
             
             # Update customer stats if applicable
             if order.customer_id:
-                customer = db.query(Customer).filter(Customer.id == order.customer_id).first()
+                customer = await db.get(Customer, order.customer_id)
                 if customer:
                     customer.total_visits += 1
                     customer.total_spent += (order.net_amount or 0)
@@ -502,10 +530,12 @@ async def update_order(
             
             # Update active POS Session for the current user (Real-time tracking)
             if current_user:
-                active_session = db.query(POSSession).filter(
-                    POSSession.user_id == current_user.id,
-                    POSSession.status == "Open"
-                ).first()
+                active_session = (await db.execute(
+                    select(POSSession).filter(
+                        POSSession.user_id == current_user.id,
+                        POSSession.status == "Open"
+                    )
+                )).scalars().first()
                 
                 if active_session:
                     # Update session stats
@@ -515,53 +545,27 @@ async def update_order(
                     
         elif new_status == 'Cancelled':
             if order.table_id and order.order_type in ['Table', 'Dine-in']:
-                table = db.query(Table).filter(Table.id == order.table_id).first()
-                if table:
-                    if table.merge_group_id and str(table.merge_group_id).strip():
-                        db.query(Table).filter(
-                            Table.merge_group_id == table.merge_group_id,
-                            Table.branch_id == order.branch_id
-                        ).update({"status": "Available"})
-                    else:
-                        table.status = "Available"
+                await _set_table_status(db, order.table_id, order.branch_id, "Available")
             
             # If the order was previously Paid/Completed, subtract from customer stats
             if old_status in ['Paid', 'Completed'] and order.customer_id:
-                customer = db.query(Customer).filter(Customer.id == order.customer_id).first()
+                customer = await db.get(Customer, order.customer_id)
                 if customer:
                     customer.total_spent -= (order.net_amount or 0)
                     customer.due_amount -= (order.credit_amount or 0)
                     if customer.total_visits > 0:
                         customer.total_visits -= 1
         elif new_status == 'BillRequested' and order.table_id and order.order_type in ['Table', 'Dine-in']:
-            table = db.query(Table).filter(Table.id == order.table_id).first()
-            if table:
-                if table.merge_group_id and str(table.merge_group_id).strip():
-                    db.query(Table).filter(
-                        Table.merge_group_id == table.merge_group_id,
-                        Table.branch_id == order.branch_id
-                    ).update({"status": "BillRequested"})
-                else:
-                    table.status = "BillRequested"
+            await _set_table_status(db, order.table_id, order.branch_id, "BillRequested")
         elif new_status in ['Pending', 'In Progress'] and order.table_id and order.order_type in ['Table', 'Dine-in']:
-            table = db.query(Table).filter(Table.id == order.table_id).first()
-            if table:
-                if table.merge_group_id and str(table.merge_group_id).strip():
-                    db.query(Table).filter(
-                        Table.merge_group_id == table.merge_group_id,
-                        Table.branch_id == order.branch_id
-                    ).update({"status": "Occupied"})
-                else:
-                    table.status = "Occupied"
+            await _set_table_status(db, order.table_id, order.branch_id, "Occupied")
     
-    db.commit()
+    await db.commit()
+    if 'status' in order_data:
+        table_reconciler.notify(order.branch_id)
     
     # Reload with relationships
-    updated_order = db.query(Order).options(
-        joinedload(Order.table),
-        joinedload(Order.customer),
-        joinedload(Order.items).joinedload(OrderItem.menu_item)
-    ).filter(Order.id == order_id).first()
+    updated_order = await load_order_for_response(db, order_id)
     
     return updated_order
 
@@ -569,50 +573,47 @@ async def update_order(
 @router.delete("/{order_id}")
 async def delete_order(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Delete an order"""
-    order = db.query(Order).filter(
-        Order.id == order_id,
-        Order.branch_id == branch_id
-    ).first()
+    order = (await db.execute(
+        select(Order).filter(
+            Order.id == order_id,
+            Order.branch_id == branch_id
+        )
+    )).scalars().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     # Reset table status if this was a table order
     if order.table_id and order.order_type in ['Table', 'Dine-in']:
-        table = db.query(Table).filter(Table.id == order.table_id).first()
-        if table:
-            if table.merge_group_id and str(table.merge_group_id).strip():
-                db.query(Table).filter(
-                    Table.merge_group_id == table.merge_group_id,
-                    Table.branch_id == order.branch_id
-                ).update({"status": "Available"})
-            else:
-                table.status = "Available"
+        await _set_table_status(db, order.table_id, order.branch_id, "Available")
     
-    db.delete(order)
-    db.commit()
+    await db.delete(order)
+    await db.commit()
+    table_reconciler.notify(order.branch_id)
     return {"message": "Order deleted successfully"}
 
 @router.post("/{order_id}/print")
 async def print_bill(
     order_id: int,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Trigger bill printing for an order"""
     # branch_id is now provided by dependency
     
-    order = db.query(Order).options(
-        joinedload(Order.table),
-        joinedload(Order.customer),
-        joinedload(Order.items).joinedload(OrderItem.menu_item)
-    ).filter(Order.id == order_id).first()
+    order = (await db.execute(
+        select(Order).options(
+            joinedload(Order.table),
+            joinedload(Order.customer),
+            selectinload(Order.items).joinedload(OrderItem.menu_item)
+        ).filter(Order.id == order_id)
+    )).scalars().first()
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -629,15 +630,17 @@ async def print_bill(
 async def change_order_table(
     order_id: int,
     new_table_id: int = Body(..., embed=True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Change order's table and update statuses"""
-    order = db.query(Order).filter(
-        Order.id == order_id,
-        Order.branch_id == branch_id
-    ).first()
+    order = (await db.execute(
+        select(Order).filter(
+            Order.id == order_id,
+            Order.branch_id == branch_id
+        )
+    )).scalars().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
         
@@ -645,21 +648,12 @@ async def change_order_table(
     if old_table_id == new_table_id:
         return {"message": "Table is the same"}
         
-    # 1. Handle Old Table(s)
+    # 1. Handle Old Table(s) - make all tables in the old group available
     if old_table_id and order.order_type in ['Table', 'Dine-in']:
-        old_table = db.query(Table).filter(Table.id == old_table_id).first()
-        if old_table:
-            if old_table.merge_group_id and str(old_table.merge_group_id).strip():
-                # Make all tables in the old group available
-                db.query(Table).filter(
-                    Table.merge_group_id == old_table.merge_group_id,
-                    Table.branch_id == order.branch_id
-                ).update({"status": "Available"})
-            else:
-                old_table.status = "Available"
+        await _set_table_status(db, old_table_id, order.branch_id, "Available")
                 
     # 2. Handle New Table(s)
-    new_table = db.query(Table).filter(Table.id == new_table_id).first()
+    new_table = await db.get(Table, new_table_id)
     if not new_table:
         raise HTTPException(status_code=404, detail="New table not found")
         
@@ -668,16 +662,10 @@ async def change_order_table(
     
     # 3. Update New table status
     if order.order_type in ['Table', 'Dine-in']:
-        if new_table.merge_group_id and str(new_table.merge_group_id).strip():
-            # Update all tables in new merge group
-            db.query(Table).filter(
-                Table.merge_group_id == new_table.merge_group_id,
-                Table.branch_id == order.branch_id
-            ).update({"status": "Occupied"})
-        else:
-            new_table.status = "Occupied"
+        await _set_table_status(db, new_table_id, order.branch_id, "Occupied")
         
-    db.commit()
+    await db.commit()
+    table_reconciler.notify(order.branch_id)
     return {"message": "Table changed successfully", "new_table_id": new_table_id}
 
 
@@ -685,18 +673,18 @@ async def change_order_table(
 async def add_order_items(
     order_id: int,
     payload: dict = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id),
     x_branch_code: str = Header(..., alias="X-Branch-Code")
 ):
     """Add items to an existing order and generate KOTs"""
-    order = db.query(Order).options(
-        joinedload(Order.items)
-    ).filter(
-        Order.id == order_id,
-        Order.branch_id == branch_id
-    ).first()
+    order = (await db.execute(
+        select(Order).filter(
+            Order.id == order_id,
+            Order.branch_id == branch_id
+        )
+    )).scalars().first()
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -706,6 +694,8 @@ async def add_order_items(
         raise HTTPException(status_code=400, detail="No items provided")
     
     # 1. Add Items
+    menu = await OrderCalculationService.get_menu_async(db, order.branch_id, items_data)
+    OrderCalculationService.resolve_item_prices(menu, items_data)
     for item in items_data:
         order_item = OrderItem(
             order_id=order.id,
@@ -717,82 +707,20 @@ async def add_order_items(
         )
         db.add(order_item)
         
-    # 2. Recalculate Totals
-    # Get current items + new items for calculation
-    current_gross = order.gross_amount or 0
-    new_items_gross = 0
-    for item in items_data:
-        price = item.get('price')
-        if price is None or price == 0:
-            mi = db.query(MenuItem).filter(MenuItem.id == item.get('menu_item_id')).first()
-            price = mi.price if mi else 0
-        new_items_gross += (item.get('quantity', 0) * price)
-    
-    total_gross = current_gross + new_items_gross
-    
-    settings = db.query(CompanySettings).first()
-    branch = db.query(Branch).filter(Branch.id == order.branch_id).first()
-    
-    sc_rate = branch.service_charge_rate if branch and branch.service_charge_rate is not None else (settings.service_charge_rate if settings else 10.0)
-    tax_rate = branch.tax_rate if branch and branch.tax_rate is not None else (settings.tax_rate if settings else 13.0)
-    
-    discount = order.discount or 0
-    delivery = order.delivery_charge or 0
-    
-    # Consistent with Frontend: SC and Tax on Net of Discount
-    base_amount = max(0, total_gross - discount)
-    sc_amount = round(base_amount * (sc_rate / 100), 2)
-    tax_amount = round((base_amount + sc_amount) * (tax_rate / 100), 2)
-    
-    order.gross_amount = total_gross
-    order.service_charge_amount = sc_amount
-    order.tax_amount = tax_amount
-    order.net_amount = round(base_amount + sc_amount + tax_amount + delivery, 2)
-    order.total_amount = order.net_amount
+    # 2. Recalculate Totals (current gross + new items)
+    profile = await OrderCalculationService.get_profile_async(db, order.branch_id)
+    OrderTotals.for_order(order).add(items_data).apply(order, profile)
     
     # 3. Generate KOT/BOT (Copy logic from create_order)
     if order.status != 'Draft':
-        item_ids = [item['menu_item_id'] for item in items_data]
-        menu_items = db.query(MenuItem).options(joinedload(MenuItem.category)).filter(MenuItem.id.in_(item_ids)).all()
-        menu_items_map = {m.id: m for m in menu_items}
-        
-        kot_items = []
-        bot_items = []
-        
-        for item in items_data:
-            m_item = menu_items_map.get(item['menu_item_id'])
-            if m_item:
-                # Prioritize Category type
-                category_type = m_item.category.type if m_item.category else m_item.kot_bot
-                if category_type == 'BOT':
-                    bot_items.append(item)
-                else:
-                    kot_items.append(item)
-
-        today_str = datetime.now().strftime('%Y%m%d')
+        # Category type, falling back to MenuItem.kot_bot, picks the station
+        kot_items, bot_items = menu.split_by_station(items_data)
 
         # Create KOT
         if kot_items:
-            kot_prefix = f"KOT-{today_str}-"
-            
-            while True:
-                # Check globally for uniqueness
-                last_kot = db.query(KOT).filter(
-                    KOT.kot_number.like(f"{kot_prefix}%")
-                ).order_by(KOT.kot_number.desc()).first()
-                
-                kot_seq = 1
-                if last_kot:
-                    try:
-                        parts = last_kot.kot_number.split('-')
-                        if len(parts) >= 3:
-                            kot_seq = int(parts[-1]) + 1
-                    except (ValueError, IndexError):
-                        pass
-                
-                new_kot_num = f"{kot_prefix}{kot_seq:04d}"
-                if not db.query(KOT).filter(KOT.kot_number == new_kot_num).first():
-                    break
+            new_kot_num = await db.run_sync(
+                lambda session: sequence_service.next_number(session, "KOT", branch_id)
+            )
             
             kot = KOT(
                 kot_number=new_kot_num,
@@ -803,7 +731,7 @@ async def add_order_items(
                 created_by=current_user.id
             )
             db.add(kot)
-            db.flush()
+            await db.flush()
             
             for item in kot_items:
                 k_item = KOTItem(
@@ -816,26 +744,9 @@ async def add_order_items(
                 
         # Create BOT
         if bot_items:
-            bot_prefix = f"BOT-{today_str}-"
-            
-            while True:
-                # Check globally for uniqueness
-                last_bot = db.query(KOT).filter(
-                    KOT.kot_number.like(f"{bot_prefix}%")
-                ).order_by(KOT.kot_number.desc()).first()
-                
-                bot_seq = 1
-                if last_bot:
-                    try:
-                        parts = last_bot.kot_number.split('-')
-                        if len(parts) >= 3:
-                            bot_seq = int(parts[-1]) + 1
-                    except (ValueError, IndexError):
-                        pass
-                
-                new_bot_num = f"{bot_prefix}{bot_seq:04d}"
-                if not db.query(KOT).filter(KOT.kot_number == new_bot_num).first():
-                    break
+            new_bot_num = await db.run_sync(
+                lambda session: sequence_service.next_number(session, "BOT", branch_id)
+            )
             
             bot = KOT(
                 kot_number=new_bot_num,
@@ -846,7 +757,7 @@ async def add_order_items(
                 created_by=current_user.id
             )
             db.add(bot)
-            db.flush()
+            await db.flush()
             
             for item in bot_items:
                 b_item = KOTItem(
@@ -857,15 +768,9 @@ async def add_order_items(
                 )
                 db.add(b_item)
             
-    db.commit()
-    db.refresh(order)
+    await db.commit()
     
     # Return updated order
-    updated_order = db.query(Order).options(
-        joinedload(Order.table),
-        joinedload(Order.customer),
-        joinedload(Order.items).joinedload(OrderItem.menu_item),
-        joinedload(Order.kots).joinedload(KOT.items).joinedload(KOTItem.menu_item)
-    ).filter(Order.id == order.id).first()
+    updated_order = await load_order_for_response(db, order.id)
     
     return updated_order
@@ -33,7 +33,7 @@ class CompletePasswordResetRequest(BaseModel):
 
 
 @router.post("/send-otp")
-async def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
+def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
     """
     Send OTP to email
     
@@ -77,7 +77,7 @@ async def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/verify-otp")
-async def verify_otp(request: VerifyOTPRequest):
+def verify_otp(request: VerifyOTPRequest):
     """Verify OTP code"""
     success, message = otp_service.verify_otp(
         request.email, 
@@ -98,7 +98,7 @@ async def verify_otp(request: VerifyOTPRequest):
 
 
 @router.post("/complete-password-reset")
-async def complete_password_reset(
+def complete_password_reset(
     request: CompletePasswordResetRequest,
     db: Session = Depends(get_db)
 ):
@@ -149,7 +149,7 @@ async def complete_password_reset(
 
 
 @router.get("/health")
-async def health_check():
+def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
@@ -1,57 +1,140 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session, joinedload
+import base64
+import hashlib
+import time
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import Response
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
 from typing import List, Optional
 
-from app.db.database import get_db
+from app.db.database import get_async_db
+from app.db.sync_version import sync_version_at
+from app.core.config import settings
 from app.core.dependencies import get_current_user, get_branch_id
-from app.models import Category, MenuGroup, MenuItem, Floor, Table, Order, KOT
+from app.core.query_counter import query_budget
+from app.core.serialization import ResponseSerializer
+from app.models import Category, MenuGroup, MenuItem, Floor, Table
 from app.schemas.pos import POSSyncResponse, TableSyncInfo
+from app.services.table_status import table_status_query
 
 router = APIRouter()
 
+POS_SYNC = ResponseSerializer(POSSyncResponse)
+
+# Catalogue tables a terminal mirrors, in response order
+SYNCED_MODELS = (Category, MenuGroup, MenuItem, Floor)
+
+
+def encode_sync_cursor(branch_id: Optional[int], version: int) -> str:
+    """Opaque delta sync cursor: the branch and the change version synced up to"""
+    raw = f"{branch_id or 0}|{version}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_sync_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        branch_id, version = raw.split("|")
+        return int(branch_id) or None, int(version)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def changed_rows_query(model, branch_id: Optional[int], since: Optional[int]):
+    """Active rows (full sync) or every row written after since, active or not (delta)"""
+    query = select(model)
+    if hasattr(model, "image_data"):
+        query = query.options(defer(model.image_data))  # served by the image routes
+    if branch_id:
+        query = query.filter(model.branch_id == branch_id)
+    if since is None:
+        return query.filter(model.is_active == True)
+    return query.filter(model.sync_version > since)
+
+
+def high_water_query(branch_id: Optional[int], upto: int):
+    """Latest change version at or below upto across the synced catalogue tables, in one statement"""
+    parts = []
+    for model in SYNCED_MODELS:
+        part = (
+            select(func.coalesce(func.max(model.sync_version), literal(0)).label("version"))
+            .filter(model.sync_version <= upto)
+        )
+        if branch_id:
+            part = part.filter(model.branch_id == branch_id)
+        parts.append(part)
+    versions = union_all(*parts).subquery()
+    return select(func.max(versions.c.version))
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
 @router.get("/sync", response_model=POSSyncResponse)
+@query_budget(10)
 async def get_pos_sync(
-    db: Session = Depends(get_db),
+    since: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """
     Consolidated sync endpoint for POS startup.
     Reduces 6-7 calls into 1.
+
+    Without since the whole active catalogue is sent (full=true). With the
+    cursor of the previous response, categories / groups / items / floors hold
+    only the rows changed since, and deleted the ids deactivated since
+    (full=false); a cursor of another branch gets a full sync. Tables and the
+    session are live state and always come complete. Every response carries an
+    ETag: a matching If-None-Match gets 304 Not Modified.
     """
     # branch_id is now provided by dependency
+    since_version = None
+    if since:
+        cursor_branch_id, since_version = decode_sync_cursor(since)
+        if cursor_branch_id != (branch_id or None):
+            since_version = None
     
-    # 1. Fetch Menu Data
-    categories = db.query(Category).filter(Category.is_active == True)
-    if branch_id:
-        categories = categories.filter(Category.branch_id == branch_id)
-    categories = categories.all()
-    
-    groups = db.query(MenuGroup).filter(MenuGroup.is_active == True)
-    if branch_id:
-        groups = groups.filter(MenuGroup.branch_id == branch_id)
-    groups = groups.all()
+    # 1. Fetch Menu Data (image blobs stay behind; the image URL is enough)
+    catalogue = {}
+    deleted = {}
+    for key, model, order_by in (
+        ("categories", Category, (Category.id,)),
+        ("groups", MenuGroup, (MenuGroup.id,)),
+        ("items", MenuItem, (MenuItem.id,)),
+        ("floors", Floor, (Floor.display_order, Floor.id)),
+    ):
+        rows = (await db.execute(
+            changed_rows_query(model, branch_id, since_version).order_by(*order_by)
+        )).scalars().all()
+        catalogue[key] = [row for row in rows if row.is_active]
+        deleted[key] = [row.id for row in rows if not row.is_active]
     
-    items = db.query(MenuItem).filter(MenuItem.is_active == True)
-    if branch_id:
-        items = items.filter(MenuItem.branch_id == branch_id)
-    items = items.all()
+    # Cursor: the newest change older than the lag (see app/db/sync_version.py), so
+    # it only moves when the catalogue does, and never older than the cursor passed in
+    settled = sync_version_at(time.time() - settings.POS_SYNC_CURSOR_LAG_SECONDS)
+    high_water = (await db.execute(high_water_query(branch_id, settled))).scalar() or 0
+    cursor_version = max(high_water, since_version or 0)
     
     # 2. Fetch Floor/Table Data
-    floors = db.query(Floor).filter(Floor.is_active == True)
-    if branch_id:
-        floors = floors.filter(Floor.branch_id == branch_id)
-    floors = floors.order_by(Floor.display_order).all()
-    
-    tables_query = db.query(Table).filter(Table.is_active == True)
+    tables_query = table_status_query(branch_id or None).filter(Table.is_active == True)
     if branch_id:
         tables_query = tables_query.filter(Table.branch_id == branch_id)
-    tables = tables_query.order_by(Table.display_order).all()
+    rows = (await db.execute(tables_query.order_by(Table.display_order, Table.id))).all()
     
-    # 3. Process Tables (Add status/order info)
+    # 3. Process Tables (status / active order info come with each row)
     processed_tables = []
-    for table in tables:
-        table_info = {
+    for row in rows:
+        table = row.Table
+        processed_tables.append({
             "id": table.id,
             "table_id": table.table_id,
             "floor": table.floor,
@@ -63,38 +146,20 @@ async def get_pos_sync(
             "hold_table_name": getattr(table, 'hold_table_name', None),
             "merge_group_id": getattr(table, 'merge_group_id', None),
             "merged_to_id": getattr(table, 'merged_to_id', None),
-            "kot_count": 0,
-            "bot_count": 0,
-            "active_order_id": None,
-            "total_amount": 0.0
-        }
-        
-        # Get active order for this table
-        active_order = db.query(Order).filter(
-            Order.table_id == table.id,
-            Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft"])
-        ).first()
-        
-        if active_order:
-            table_info["active_order_id"] = active_order.id
-            table_info["total_amount"] = active_order.net_amount
-            
-            # Count KOTs/BOTs
-            kots = db.query(KOT).filter(KOT.order_id == active_order.id).all()
-            for kot in kots:
-                if kot.kot_type == "KOT":
-                    table_info["kot_count"] += 1
-                else:
-                    table_info["bot_count"] += 1
-                    
-        processed_tables.append(table_info)
+            "kot_count": row.kot_count,
+            "bot_count": row.bot_count,
+            "active_order_id": row.active_order_id,
+            "total_amount": row.net_amount if row.active_order_id is not None else 0.0
+        })
     
     # 4. Get active session
     from app.models.pos_session import POSSession
-    active_session_obj = db.query(POSSession).filter(
-        POSSession.user_id == current_user.id,
-        POSSession.status == "Open"
-    ).first()
+    active_session_obj = (await db.execute(
+        select(POSSession).filter(
+            POSSession.user_id == current_user.id,
+            POSSession.status == "Open"
+        )
+    )).scalars().first()
     
     active_session = None
     if active_session_obj:
@@ -105,14 +170,21 @@ async def get_pos_sync(
             "status": active_session_obj.status
         }
         
-    return {
-        "categories": categories,
-        "groups": groups,
-        "items": items,
+    body = POS_SYNC.dump_json({
+        "full": since_version is None,
+        "cursor": encode_sync_cursor(branch_id, cursor_version),
+        "categories": catalogue["categories"],
+        "groups": catalogue["groups"],
+        "items": catalogue["items"],
         "floors": [
             {"id": f.id, "name": f.name, "display_order": f.display_order, "is_active": f.is_active} 
-            for f in floors
+            for f in catalogue["floors"]
         ],
+        "deleted": deleted,
         "active_session": active_session,
         "tables": processed_tables
-    }
+    })
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    if etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
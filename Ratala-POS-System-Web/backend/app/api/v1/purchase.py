@@ -9,6 +9,7 @@ from datetime import datetime, timezone
 from app.db.database import get_db
 from app.core.dependencies import get_current_user, get_branch_id
 from app.models import Supplier, PurchaseBill, PurchaseReturn, PurchaseBillItem, InventoryTransaction, Product, Branch
+from app.services import sequence_service
 
 router = APIRouter()
 
@@ -21,7 +22,7 @@ def apply_branch_filter_purchase(query, model, branch_id):
 
 
 @router.get("/suppliers")
-async def get_suppliers(
+def get_suppliers(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -32,7 +33,7 @@ async def get_suppliers(
 
 
 @router.get("/suppliers/{supplier_id}")
-async def get_supplier(
+def get_supplier(
     supplier_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -50,7 +51,7 @@ async def get_supplier(
 
 
 @router.post("/suppliers")
-async def create_supplier(
+def create_supplier(
     supplier_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -68,7 +69,7 @@ async def create_supplier(
 
 @router.put("/suppliers/{supplier_id}")
 @router.patch("/suppliers/{supplier_id}")
-async def update_supplier(
+def update_supplier(
     supplier_id: int,
     supplier_data: dict = Body(...),
     db: Session = Depends(get_db),
@@ -95,7 +96,7 @@ async def update_supplier(
 
 
 @router.delete("/suppliers/{supplier_id}")
-async def delete_supplier(
+def delete_supplier(
     supplier_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -123,7 +124,7 @@ async def delete_supplier(
 
 
 @router.get("/bills")
-async def get_bills(
+def get_bills(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -139,7 +140,7 @@ async def get_bills(
 
 
 @router.get("/bills/{bill_id}")
-async def get_bill(
+def get_bill(
     bill_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -160,7 +161,7 @@ async def get_bill(
 
 
 @router.post("/bills")
-async def create_bill(
+def create_bill(
     bill_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -183,31 +184,8 @@ async def create_bill(
 
     bill_data['branch_id'] = branch_id
     
-    # Generate sequential bill number: BRANCH-PO-YYYYMMDD-XXXX
-    today_str = datetime.now().strftime('%Y%m%d')
-    prefix = f"{x_branch_code}-PO-{today_str}-"
-    
-    while True:
-        last_bill = db.query(PurchaseBill).filter(
-            PurchaseBill.branch_id == branch_id,
-            PurchaseBill.bill_number.like(f"{prefix}%")
-        ).order_by(PurchaseBill.bill_number.desc()).first()
-        
-        if last_bill:
-            try:
-                last_seq = int(last_bill.bill_number.split('-')[-1])
-                new_seq = last_seq + 1
-            except:
-                new_seq = 1
-        else:
-            new_seq = 1
-            
-        bill_number = f"{prefix}{new_seq:04d}"
-        
-        # Double check uniqueness within branch
-        if not db.query(PurchaseBill).filter(PurchaseBill.bill_number == bill_number, PurchaseBill.branch_id == branch_id).first():
-            bill_data['bill_number'] = bill_number
-            break
+    # Sequential bill number: BRANCH-PO-YYYYMMDD-XXXX
+    bill_data['bill_number'] = sequence_service.next_number(db, "PO", branch_id, x_branch_code)
     
     # Create the bill
     new_bill = PurchaseBill(**bill_data)
@@ -271,7 +249,7 @@ async def create_bill(
 
 @router.put("/bills/{bill_id}")
 @router.patch("/bills/{bill_id}")
-async def update_bill(
+def update_bill(
     bill_id: int,
     bill_data: dict = Body(...),
     db: Session = Depends(get_db),
@@ -309,7 +287,7 @@ async def update_bill(
 
 
 @router.delete("/bills/{bill_id}")
-async def delete_bill(
+def delete_bill(
     bill_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -336,7 +314,7 @@ async def delete_bill(
 
 
 @router.get("/returns")
-async def get_returns(
+def get_returns(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -352,7 +330,7 @@ async def get_returns(
 
 
 @router.post("/returns")
-async def create_return(
+def create_return(
     return_data: dict = Body(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -371,28 +349,8 @@ async def create_return(
 
     return_data['branch_id'] = branch_id
     
-    # Generate sequential return number: BRANCH-RET-YYYYMMDD-XXXX
-    today_str = datetime.now().strftime('%Y%m%d')
-    prefix = f"{x_branch_code}-RET-{today_str}-"
-    while True:
-        last_return = db.query(PurchaseReturn).filter(
-            PurchaseReturn.branch_id == branch_id,
-            PurchaseReturn.return_number.like(f"{prefix}%")
-        ).order_by(PurchaseReturn.return_number.desc()).first()
-        
-        if last_return:
-            try:
-                last_seq = int(last_return.return_number.split('-')[-1])
-                new_seq = last_seq + 1
-            except:
-                new_seq = 1
-        else:
-            new_seq = 1
-            
-        return_number = f"{prefix}{new_seq:04d}"
-        if not db.query(PurchaseReturn).filter(PurchaseReturn.return_number == return_number, PurchaseReturn.branch_id == branch_id).first():
-            return_data['return_number'] = return_number
-            break
+    # Sequential return number: BRANCH-RET-YYYYMMDD-XXXX
+    return_data['return_number'] = sequence_service.next_number(db, "RET", branch_id, x_branch_code)
     new_return = PurchaseReturn(**return_data)
     db.add(new_return)
     db.commit()
@@ -401,7 +359,7 @@ async def create_return(
 
 
 @router.delete("/returns/{return_id}")
-async def delete_return(
+def delete_return(
     return_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
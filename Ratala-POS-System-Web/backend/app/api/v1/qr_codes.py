@@ -4,7 +4,6 @@ from typing import List, Optional
 import os
 import uuid
 from datetime import datetime
-import qrcode
 from io import BytesIO
 
 from app.db.database import get_db
@@ -21,7 +20,7 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
 @router.get("/", response_model=List[QRCodeResponse])
-async def get_qr_codes(
+def get_qr_codes(
     branch_id: int = Depends(get_branch_id),
     is_active: Optional[bool] = None,
     db: Session = Depends(get_db),
@@ -38,7 +37,7 @@ async def get_qr_codes(
 
 
 @router.get("/generate-menu-qr")
-async def generate_menu_qr(
+def generate_menu_qr(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     branch_id: int = Depends(get_branch_id)
@@ -53,7 +52,8 @@ async def generate_menu_qr(
     # URL that the customer scans
     menu_url = f"{frontend_url}/digital-menu/{branch_id}"
     
-    # Generate QR Code
+    # Generate QR Code (qrcode/PIL imported lazily - only this route needs them)
+    import qrcode
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -87,7 +87,7 @@ def get_qr_code(
 
 
 @router.post("/", response_model=QRCodeResponse)
-async def create_qr_code(
+def create_qr_code(
     name: str = Form(...),
     image: UploadFile = File(...),
     is_active: bool = Form(True),
@@ -112,7 +112,7 @@ async def create_qr_code(
     # Save the uploaded file
     try:
         with open(file_path, "wb") as buffer:
-            content = await image.read()
+            content = image.file.read()
             buffer.write(content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save image: {str(e)}")
@@ -135,7 +135,7 @@ async def create_qr_code(
 
 
 @router.put("/{qr_id}", response_model=QRCodeResponse)
-async def update_qr_code(
+def update_qr_code(
     qr_id: int,
     name: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
@@ -180,7 +180,7 @@ async def update_qr_code(
         
         try:
             with open(file_path, "wb") as buffer:
-                content = await image.read()
+                content = image.file.read()
                 buffer.write(content)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to save image: {str(e)}")
@@ -9,15 +9,13 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from sqlalchemy import func
-from app.db.database import get_db
-from app.core.dependencies import get_current_user, get_branch_id
+from app.db.database import get_read_db
+from app.core.dependencies import get_current_user, get_branch_id, require_permission
 from app.models import Order, Product, Customer, User, Branch, Table, Floor, MenuItem, OrderItem
 from app.models.purchase import PurchaseBill, PurchaseReturn, Supplier, PurchaseBillItem
 
-
-from app.utils.pdf_generator import generate_pdf_report, generate_invoice_pdf, generate_multi_table_pdf_report
-
-from app.utils.excel_generator import generate_excel_report
+# The PDF (reportlab) and Excel (pandas/openpyxl) generators are imported inside
+# the export routes: loading them at startup costs every worker time and memory
 
 def get_branch_metadata(branch_id, db):
     """Helper to get branch info for current session"""
@@ -61,12 +59,15 @@ def apply_branch_filter_floor(query, branch_id):
 
 router = APIRouter()
 
+# Dashboard analytics; invoices, shift reports and exports stay open to POS roles
+dashboard_view = [Depends(require_permission("dashboard.view"))]
+
 
-@router.get("/dashboard-summary")
-async def get_dashboard_summary(
+@router.get("/dashboard-summary", dependencies=dashboard_view)
+def get_dashboard_summary(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
@@ -229,9 +230,9 @@ async def get_dashboard_summary(
 
 
 
-@router.get("/sales-summary")
-async def get_sales_summary(
-    db: Session = Depends(get_db),
+@router.get("/sales-summary", dependencies=dashboard_view)
+def get_sales_summary(
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
@@ -250,11 +251,11 @@ async def get_sales_summary(
     }
 
 
-@router.get("/day-book")
-async def get_day_book(
+@router.get("/day-book", dependencies=dashboard_view)
+def get_day_book(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
@@ -299,11 +300,11 @@ async def get_day_book(
         }
     }
 
-@router.get("/daily-sales")
-async def get_daily_sales_report(
+@router.get("/daily-sales", dependencies=dashboard_view)
+def get_daily_sales_report(
     start_date: str,
     end_date: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
@@ -400,10 +401,10 @@ async def get_daily_sales_report(
         }
     }
 
-@router.get("/monthly-sales")
-async def get_monthly_sales_report(
+@router.get("/monthly-sales", dependencies=dashboard_view)
+def get_monthly_sales_report(
     year: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
@@ -474,12 +475,12 @@ async def get_monthly_sales_report(
         
     return final_data
 
-@router.get("/purchase-report")
-async def get_purchase_report(
+@router.get("/purchase-report", dependencies=dashboard_view)
+def get_purchase_report(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     supplier_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
@@ -531,17 +532,18 @@ async def get_purchase_report(
 
 
 @router.get("/export/pdf/{report_type}")
-async def export_pdf(
+def export_pdf(
     report_type: str,
     date: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Export report as PDF with optional date filtering"""
     from datetime import datetime, time as dtime
+    from app.utils.pdf_generator import generate_pdf_report, generate_multi_table_pdf_report
     
     # Helper for date filtering
     query_start = None
@@ -555,16 +557,16 @@ async def export_pdf(
         query_start = datetime.combine(datetime.strptime(start_date, '%Y-%m-%d').date(), dtime.min)
         query_end = datetime.combine(datetime.strptime(end_date, '%Y-%m-%d').date(), dtime.max)
     if report_type == "session":
-        return await export_sessions_pdf(db, current_user, branch_id)
+        return export_sessions_pdf(db, current_user, branch_id)
     elif report_type == "user":
         report_type = "staff"
 
     if report_type == "sales-summary":
-        result = await get_sales_summary(db, current_user, branch_id)
+        result = get_sales_summary(db, current_user, branch_id)
         data = [{"Metric": k, "Value": v} for k, v in result.items()]
         title = "Sales Summary"
     elif report_type == "day-book":
-        orders_res = await get_day_book(None, None, db, current_user, branch_id)
+        orders_res = get_day_book(None, None, db, current_user, branch_id)
         data = [{"Order Number": o.get("order_number"), "Total": o.get("received"), "Date": o.get("date")} for o in orders_res.get("items", [])]
         title = "Day Book"
     elif report_type == "sales":
@@ -738,17 +740,18 @@ async def export_pdf(
 
 
 @router.get("/export/excel/{report_type}")
-async def export_excel(
+def export_excel(
     report_type: str,
     date: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Export report as Excel with optional date filtering"""
     from datetime import datetime, time as dtime
+    from app.utils.excel_generator import generate_excel_report
     from app.models import User, MenuItem, Order, Customer # Keep these as they are used
     from app.models.inventory import InventoryTransaction, BatchProduction, BillOfMaterials
     from app.models.pos_session import POSSession
@@ -767,11 +770,11 @@ async def export_excel(
     metadata['period'] = "Full Summary"
     
     if report_type == "sales-summary":
-        result = await get_sales_summary(db, current_user, branch_id)
+        result = get_sales_summary(db, current_user, branch_id)
         data = [{"Metric": k, "Value": v} for k, v in result.items()]
         excel_buffer = generate_excel_report(data, "Sales Summary", metadata=metadata)
     elif report_type == "day-book":
-        orders_res = await get_day_book(None, None, db, current_user, branch_id)
+        orders_res = get_day_book(None, None, db, current_user, branch_id)
         data = [{"Order Number": o.get("order_number"), "Total": o.get("received"), "Date": o.get("date")} for o in orders_res.get("items", [])]
         excel_buffer = generate_excel_report(data, "Day Book", metadata=metadata)
     elif report_type == "sales":
@@ -1193,13 +1196,14 @@ async def export_excel(
 
 
 @router.get("/orders/{order_id}/invoice")
-async def get_order_invoice(
+def get_order_invoice(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Generate invoice PDF for an order"""
+    from app.utils.pdf_generator import generate_invoice_pdf
     order = db.query(Order).filter(Order.id == order_id, Order.branch_id == branch_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -1221,8 +1225,8 @@ async def get_order_invoice(
 
 
 @router.get("/export/all/excel")
-async def export_all_excel(
-    db: Session = Depends(get_db),
+def export_all_excel(
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
@@ -1341,7 +1345,7 @@ async def export_all_excel(
 
 @router.get("/sessions")
 def get_sessions_report(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
@@ -1376,13 +1380,14 @@ def get_sessions_report(
 
 
 @router.get("/export/sessions/pdf")
-async def export_sessions_pdf(
-    db: Session = Depends(get_db),
+def export_sessions_pdf(
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Export all sessions as a PDF report"""
     from app.models.pos_session import POSSession
+    from app.utils.pdf_generator import generate_pdf_report
     sessions = db.query(POSSession).filter(POSSession.branch_id == branch_id).order_by(POSSession.start_time.desc()).all()
     
     data = []
@@ -1421,9 +1426,9 @@ async def export_sessions_pdf(
 
 
 @router.get("/export/shift/{session_id}")
-async def export_shift_report(
+def export_shift_report(
     session_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
@@ -1506,10 +1511,10 @@ async def export_shift_report(
 
 
 @router.get("/export/master/excel")
-async def export_master_excel(
+def export_master_excel(
     start_date: str,
     end_date: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
@@ -8,6 +8,7 @@ from app.db.database import get_db
 from app.core.dependencies import get_current_user, get_branch_id
 from app.models import User, CompanySettings, PaymentMode, StorageArea, DiscountRule
 from app.models.branch import Branch
+from app.core.pricing import pricing_profiles
 from pydantic import BaseModel
 from datetime import datetime
 import os
@@ -24,7 +25,7 @@ def apply_branch_filter_settings(query, model, branch_id):
 
 
 @router.get("/public-company")
-async def get_public_company_settings(
+def get_public_company_settings(
     branch_id: int | None = None,
     branch_code: str | None = None,
     branch_slug: str | None = None,
@@ -143,7 +144,7 @@ class DiscountRuleResponse(DiscountRuleBase):
 
 # Company Settings Endpoints
 @router.get("/company", response_model=CompanySettingsResponse)
-async def get_company_settings(
+def get_company_settings(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -167,7 +168,7 @@ async def get_company_settings(
 
 
 @router.put("/company", response_model=CompanySettingsResponse)
-async def update_company_settings(
+def update_company_settings(
     settings_data: CompanySettingsBase,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -189,11 +190,12 @@ async def update_company_settings(
     
     db.commit()
     db.refresh(settings)
+    pricing_profiles.invalidate_all()
     return settings
 
 
 @router.post("/company/logo")
-async def update_company_logo(
+def update_company_logo(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -212,7 +214,7 @@ async def update_company_logo(
         
     # Save to database
     try:
-        content = await file.read()
+        content = file.file.read()
         settings.logo_data = content
         settings.logo_url = "/api/v1/images/company/logo" # Point to DB-serving endpoint
     except Exception as e:
@@ -226,7 +228,7 @@ async def update_company_logo(
 
 # General Settings Endpoints (aliases/shorthands for mobile app)
 @router.get("", response_model=CompanySettingsBase)
-async def get_all_settings(
+def get_all_settings(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -249,17 +251,17 @@ async def get_all_settings(
 
 
 @router.put("", response_model=CompanySettingsResponse)
-async def update_all_settings(
+def update_all_settings(
     settings_data: CompanySettingsBase,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Update all settings"""
-    return await update_company_settings(settings_data, db, current_user)
+    return update_company_settings(settings_data, db, current_user)
 
 
 @router.get("/currency")
-async def get_currency_settings(
+def get_currency_settings(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -269,7 +271,7 @@ async def get_currency_settings(
 
 
 @router.put("/currency")
-async def update_currency_settings(
+def update_currency_settings(
     data: dict,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -283,7 +285,7 @@ async def update_currency_settings(
 
 
 @router.get("/taxes")
-async def get_tax_settings(
+def get_tax_settings(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -293,7 +295,7 @@ async def get_tax_settings(
 
 
 @router.put("/taxes")
-async def update_tax_settings(
+def update_tax_settings(
     data: dict,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -303,11 +305,12 @@ async def update_tax_settings(
     if settings:
         settings.tax_rate = data.get("tax_rate", settings.tax_rate)
         db.commit()
+        pricing_profiles.invalidate_all()
     return {"success": True}
 
 
 @router.get("/printer")
-async def get_printer_settings(
+def get_printer_settings(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -317,7 +320,7 @@ async def get_printer_settings(
 
 
 @router.put("/printer")
-async def update_printer_settings(
+def update_printer_settings(
     data: dict,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -331,7 +334,7 @@ async def update_printer_settings(
 
 
 @router.get("/notifications")
-async def get_notification_settings(
+def get_notification_settings(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -347,7 +350,7 @@ async def get_notification_settings(
 
 
 @router.put("/notifications")
-async def update_notification_settings(
+def update_notification_settings(
     data: dict,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -363,20 +366,20 @@ async def update_notification_settings(
 
 
 @router.get("/receipt")
-async def get_receipt_settings():
+def get_receipt_settings():
     """Get receipt settings (placeholder)"""
     return {"header_text": "Welcome to Ratala Hospitality", "footer_text": "Thank you for visiting!"}
 
 
 @router.put("/receipt")
-async def update_receipt_settings():
+def update_receipt_settings():
     """Update receipt settings (placeholder)"""
     return {"success": True}
 
 
 # Payment Modes Endpoints
 @router.get("/payment-modes", response_model=List[PaymentModeResponse])
-async def get_payment_modes(
+def get_payment_modes(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -405,7 +408,7 @@ async def get_payment_modes(
 
 
 @router.post("/payment-modes", response_model=PaymentModeResponse)
-async def create_payment_mode(
+def create_payment_mode(
     payment_mode: PaymentModeBase,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -443,7 +446,7 @@ async def create_payment_mode(
 
 
 @router.put("/payment-modes/{payment_mode_id}", response_model=PaymentModeResponse)
-async def update_payment_mode(
+def update_payment_mode(
     payment_mode_id: int,
     payment_mode_data: PaymentModeBase,
     db: Session = Depends(get_db),
@@ -474,7 +477,7 @@ async def update_payment_mode(
 
 
 @router.delete("/payment-modes/{payment_mode_id}")
-async def delete_payment_mode(
+def delete_payment_mode(
     payment_mode_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -502,7 +505,7 @@ async def delete_payment_mode(
 
 # Storage Areas Endpoints
 @router.get("/storage-areas", response_model=List[StorageAreaResponse])
-async def get_storage_areas(
+def get_storage_areas(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -512,7 +515,7 @@ async def get_storage_areas(
 
 
 @router.post("/storage-areas", response_model=StorageAreaResponse)
-async def create_storage_area(
+def create_storage_area(
     storage_area: StorageAreaBase,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -539,7 +542,7 @@ async def create_storage_area(
 
 
 @router.put("/storage-areas/{storage_area_id}", response_model=StorageAreaResponse)
-async def update_storage_area(
+def update_storage_area(
     storage_area_id: int,
     storage_area_data: StorageAreaBase,
     db: Session = Depends(get_db),
@@ -570,7 +573,7 @@ async def update_storage_area(
 
 
 @router.delete("/storage-areas/{storage_area_id}")
-async def delete_storage_area(
+def delete_storage_area(
     storage_area_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -598,7 +601,7 @@ async def delete_storage_area(
 
 # Discount Rules Endpoints
 @router.get("/discounts", response_model=List[DiscountRuleResponse])
-async def get_discount_rules(
+def get_discount_rules(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -608,7 +611,7 @@ async def get_discount_rules(
 
 
 @router.post("/discounts", response_model=DiscountRuleResponse)
-async def create_discount_rule(
+def create_discount_rule(
     discount: DiscountRuleBase,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -631,11 +634,12 @@ async def create_discount_rule(
     db.add(new_discount)
     db.commit()
     db.refresh(new_discount)
+    pricing_profiles.invalidate(new_discount.branch_id)
     return new_discount
 
 
 @router.put("/discounts/{discount_id}", response_model=DiscountRuleResponse)
-async def update_discount_rule(
+def update_discount_rule(
     discount_id: int,
     discount_data: DiscountRuleBase,
     db: Session = Depends(get_db),
@@ -663,11 +667,12 @@ async def update_discount_rule(
     
     db.commit()
     db.refresh(discount)
+    pricing_profiles.invalidate(discount.branch_id)
     return discount
 
 
 @router.delete("/discounts/{discount_id}")
-async def delete_discount_rule(
+def delete_discount_rule(
     discount_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -690,4 +695,5 @@ async def delete_discount_rule(
     
     db.delete(discount)
     db.commit()
+    pricing_profiles.invalidate(branch_id)
     return {"message": "Discount rule deleted successfully"}
@@ -2,41 +2,59 @@
 Table management routes with branch isolation
 """
 from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.core.dependencies import get_current_user, check_admin_role, get_branch_id
+from app.core.query_counter import query_budget
 from app.models import Table, Floor, Order, KOT, Branch
+from app.services.table_status import table_status_query
 
 router = APIRouter()
 
 
-def apply_branch_filter_table(db: Session, query, branch_id):
+def apply_branch_filter_table(db: AsyncSession, query, branch_id):
     """Apply branch_id filter if branch_id is set and model has branch_id column"""
     if branch_id is not None:
         query = query.filter(Table.branch_id == branch_id)
     return query
 
 
-def apply_branch_filter_floor(db: Session, query, branch_id):
+def apply_branch_filter_floor(db: AsyncSession, query, branch_id):
     """Apply branch_id filter to floor queries"""
     if branch_id is not None:
         query = query.filter(Floor.branch_id == branch_id)
     return query
 
 
+def is_stale(row) -> bool:
+    """
+    Occupied / bill requested, but no active order (merged tables keep their status)
+
+    Shown as Available; the row itself is fixed by the table reconciler.
+    """
+    table = row.Table
+    return (
+        row.active_order_id is None
+        and table.status in ["Occupied", "BillRequested"]
+        and not table.merge_group_id
+    )
+
+
 @router.get("")
+@query_budget(4)
 async def get_tables(
     floor: Optional[str] = None,
     floor_id: Optional[int] = None,
     include_inactive: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Get all tables for the branch with KOT/BOT counts, optionally filtered by floor"""
-    query = db.query(Table).filter(Table.branch_id == branch_id)
+    query = table_status_query(branch_id).filter(Table.branch_id == branch_id)
     
     if not include_inactive:
         query = query.filter(Table.is_active == True)
@@ -46,11 +64,11 @@ async def get_tables(
     elif floor:
         query = query.filter(Table.floor == floor)
     
-    tables = query.order_by(Table.display_order).all()
+    rows = (await db.execute(query.order_by(Table.display_order))).all()
     
-    # Get KOT/BOT counts for each table
     result = []
-    for table in tables:
+    for row in rows:
+        table = row.Table
         table_dict = {
             "id": table.id,
             "table_id": table.table_id,
@@ -65,37 +83,17 @@ async def get_tables(
             "hold_table_name": table.hold_table_name,
             "merge_group_id": table.merge_group_id,
             "merged_to_id": table.merged_to_id,
-            "kot_count": 0,
-            "bot_count": 0,
-            "active_order_id": None,
+            "kot_count": row.kot_count,
+            "bot_count": row.bot_count,
+            "active_order_id": row.active_order_id,
             "total_amount": 0
         }
         
-        # Get active order for this table
-        active_order = db.query(Order).filter(
-            Order.table_id == table.id,
-            Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft", "Completed"])
-        ).first()
-        
-        if active_order:
-            table_dict["active_order_id"] = active_order.id
-            table_dict["total_amount"] = active_order.net_amount
-            table_dict["order_start_time"] = active_order.created_at
-
-            
-            # Count KOTs and BOTs
-            kots = db.query(KOT).filter(KOT.order_id == active_order.id).all()
-            for kot in kots:
-                if kot.kot_type == "KOT":
-                    table_dict["kot_count"] += 1
-                else:
-                    table_dict["bot_count"] += 1
-        elif table.status in ["Occupied", "BillRequested"] and not table.merge_group_id:
-            # Self-healing: Table is marked occupied but has no active order -> Reset to Available
-            table.status = "Available"
+        if row.active_order_id is not None:
+            table_dict["total_amount"] = row.net_amount
+            table_dict["order_start_time"] = row.order_start_time
+        elif is_stale(row):
             table_dict["status"] = "Available"
-            db.add(table)
-            db.commit()
         
         result.append(table_dict)
     
@@ -103,82 +101,63 @@ async def get_tables(
 
 
 @router.get("/with-stats")
+@query_budget(5)
 async def get_tables_with_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Get tables with order statistics grouped by floor for the branch"""
     # Get floors filtered by branch
-    floors = db.query(Floor).filter(
-        Floor.is_active == True,
-        Floor.branch_id == branch_id
-    ).order_by(Floor.display_order).all()
+    floors = (await db.execute(
+        select(Floor).filter(
+            Floor.is_active == True,
+            Floor.branch_id == branch_id
+        ).order_by(Floor.display_order)
+    )).scalars().all()
     
-    result = []
-    for floor in floors:
-        tables = db.query(Table).filter(
-            Table.floor_id == floor.id,
+    rows = (await db.execute(
+        table_status_query(branch_id).filter(
+            Table.floor_id.in_([floor.id for floor in floors]),
             Table.branch_id == branch_id,
             Table.is_active == True
-        ).order_by(Table.display_order).all()
-        
-        floor_data = {
-            "floor_id": floor.id,
-            "floor_name": floor.name,
-            "tables": []
+        ).order_by(Table.display_order)
+    )).all()
+    
+    tables_by_floor = {floor.id: [] for floor in floors}
+    for row in rows:
+        table = row.Table
+        table_data = {
+            "id": table.id,
+            "table_id": table.table_id,
+            "table_type": table.table_type,
+            "status": table.status,
+            "capacity": table.capacity,
+            "merge_group_id": table.merge_group_id,
+            "merged_to_id": table.merged_to_id,
+            "kot_count": row.kot_count,
+            "bot_count": row.bot_count,
+            "total_amount": 0,
+            "active_order_id": row.active_order_id
         }
         
-        for table in tables:
-            table_data = {
-                "id": table.id,
-                "table_id": table.table_id,
-                "table_type": table.table_type,
-                "status": table.status,
-                "capacity": table.capacity,
-                "merge_group_id": table.merge_group_id,
-                "merged_to_id": table.merged_to_id,
-                "kot_count": 0,
-                "bot_count": 0,
-                "total_amount": 0,
-                "active_order_id": None
-            }
-            
-            # Get active order (Filtered by branch_id for safety)
-            active_order = db.query(Order).filter(
-                Order.table_id == table.id,
-                Order.branch_id == branch_id,
-                Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft", "Completed"])
-            ).first()
-            
-            if active_order:
-                table_data["active_order_id"] = active_order.id
-                table_data["total_amount"] = active_order.net_amount
-                
-                kots = db.query(KOT).filter(KOT.order_id == active_order.id).all()
-                for kot in kots:
-                    if kot.kot_type == "KOT":
-                        table_data["kot_count"] += 1
-                    else:
-                        table_data["bot_count"] += 1
-            elif table.status in ["Occupied", "BillRequested"] and not table.merge_group_id:
-                # Self-healing
-                table.status = "Available"
-                table_data["status"] = "Available"
-                db.add(table)
-                db.commit()
-            
-            floor_data["tables"].append(table_data)
+        if row.active_order_id is not None:
+            table_data["total_amount"] = row.net_amount
+        elif is_stale(row):
+            table_data["status"] = "Available"
         
-        result.append(floor_data)
+        tables_by_floor[table.floor_id].append(table_data)
     
-    return result
+    return [
+        {"floor_id": floor.id, "floor_name": floor.name, "tables": tables_by_floor[floor.id]}
+        for floor in floors
+    ]
 
 
 @router.post("/merge")
 async def merge_tables_bulk(
     payload: dict = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
@@ -197,7 +176,9 @@ async def merge_tables_bulk(
     merge_group_id = int(time.time())
     
     # Check if primary table already has a group
-    primary = db.query(Table).filter(Table.id == primary_table_id, Table.branch_id == branch_id).first()
+    primary = (await db.execute(
+        select(Table).filter(Table.id == primary_table_id, Table.branch_id == branch_id)
+    )).scalars().first()
     if not primary:
         raise HTTPException(status_code=404, detail="Primary table not found")
         
@@ -219,7 +200,9 @@ async def merge_tables_bulk(
     # Update all participating tables
     all_ids = [primary_table_id] + table_ids
     for tid in all_ids:
-        t = db.query(Table).filter(Table.id == tid, Table.branch_id == branch_id).first()
+        t = (await db.execute(
+            select(Table).filter(Table.id == tid, Table.branch_id == branch_id)
+        )).scalars().first()
         if t:
             t.merge_group_id = str(merge_group_id)
             t.merged_to_id = primary_table_id if tid != primary_table_id else None
@@ -229,7 +212,7 @@ async def merge_tables_bulk(
             # For now, keep as is or just let status be.
             t.status = "Occupied"
             
-    db.commit()
+    await db.commit()
     print(f"DEBUG: Tables {all_ids} merged into group {merge_group_id} for branch {branch_id}")
     return {"message": "Merged", "merge_group_id": str(merge_group_id)}
 
@@ -237,7 +220,7 @@ async def merge_tables_bulk(
 @router.post("/unmerge")
 async def unmerge_tables_bulk(
     payload: dict = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
@@ -251,25 +234,29 @@ async def unmerge_tables_bulk(
     # Stringify in case it comes as int from frontend
     mg_id = str(merge_group_id)
     
-    tables = db.query(Table).filter(
-        Table.merge_group_id == mg_id, 
-        Table.branch_id == branch_id
-    ).all()
+    tables = (await db.execute(
+        select(Table).filter(
+            Table.merge_group_id == mg_id, 
+            Table.branch_id == branch_id
+        )
+    )).scalars().all()
     
     for t in tables:
         t.merge_group_id = None
         t.merged_to_id = None
         
         # Check if table has active order
-        active_order = db.query(Order).filter(
-            Order.table_id == t.id,
-            Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft"])
-        ).first()
+        active_order = (await db.execute(
+            select(Order.id).filter(
+                Order.table_id == t.id,
+                Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft"])
+            ).limit(1)
+        )).first()
         
         if not active_order:
             t.status = "Available"
         
-    db.commit()
+    await db.commit()
     print(f"DEBUG: Merge group {mg_id} unmerged for branch {branch_id}")
     return {"message": "Unmerged"}
 
@@ -278,24 +265,28 @@ async def unmerge_tables_bulk(
 async def merge_tables(
     table_id: int,
     target_table_id: int = Body(..., embed=True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Merge two tables into a merge group"""
     # Get source table
-    source_table = db.query(Table).filter(
-        Table.id == table_id,
-        Table.branch_id == branch_id
-    ).first()
+    source_table = (await db.execute(
+        select(Table).filter(
+            Table.id == table_id,
+            Table.branch_id == branch_id
+        )
+    )).scalars().first()
     if not source_table:
         raise HTTPException(status_code=404, detail="Source table not found or access denied")
     
     # Get target table
-    target_table = db.query(Table).filter(
-        Table.id == target_table_id,
-        Table.branch_id == branch_id
-    ).first()
+    target_table = (await db.execute(
+        select(Table).filter(
+            Table.id == target_table_id,
+            Table.branch_id == branch_id
+        )
+    )).scalars().first()
     if not target_table:
         raise HTTPException(status_code=404, detail="Target table not found or access denied")
     
@@ -304,10 +295,12 @@ async def merge_tables(
         merge_group_id = source_table.merge_group_id or target_table.merge_group_id
     else:
         # Create new merge group - find next available number
-        existing_groups = db.query(Table).filter(
-            Table.merge_group_id.isnot(None),
-            Table.branch_id == branch_id
-        ).all()
+        existing_groups = (await db.execute(
+            select(Table).filter(
+                Table.merge_group_id.isnot(None),
+                Table.branch_id == branch_id
+            )
+        )).scalars().all()
         
         group_numbers = []
         for t in existing_groups:
@@ -326,9 +319,9 @@ async def merge_tables(
     source_table.merged_to_id = target_table_id
     target_table.merge_group_id = merge_group_id
     
-    db.commit()
-    db.refresh(source_table)
-    db.refresh(target_table)
+    await db.commit()
+    await db.refresh(source_table)
+    await db.refresh(target_table)
     
     return {
         "message": f"Tables merged successfully into {merge_group_id}",
@@ -341,16 +334,18 @@ async def merge_tables(
 @router.post("/{table_id}/unmerge")
 async def unmerge_table(
     table_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Remove a table from its merge group"""
     # Get table
-    table = db.query(Table).filter(
-        Table.id == table_id,
-        Table.branch_id == branch_id
-    ).first()
+    table = (await db.execute(
+        select(Table).filter(
+            Table.id == table_id,
+            Table.branch_id == branch_id
+        )
+    )).scalars().first()
     if not table:
         raise HTTPException(status_code=404, detail="Table not found or access denied")
     
@@ -364,20 +359,24 @@ async def unmerge_table(
     table.merged_to_id = None
     
     # Check if table has active order
-    active_order = db.query(Order).filter(
-        Order.table_id == table.id,
-        Order.branch_id == branch_id,
-        Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft"])
-    ).first()
+    active_order = (await db.execute(
+        select(Order.id).filter(
+            Order.table_id == table.id,
+            Order.branch_id == branch_id,
+            Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft"])
+        ).limit(1)
+    )).first()
     
     if not active_order:
         table.status = "Available"
     
     # Check if any other tables are still in this group
-    remaining_tables = db.query(Table).filter(
-        Table.merge_group_id == merge_group_id,
-        Table.branch_id == branch_id
-    ).all()
+    remaining_tables = (await db.execute(
+        select(Table).filter(
+            Table.merge_group_id == merge_group_id,
+            Table.branch_id == branch_id
+        )
+    )).scalars().all()
     
     # If only one table left, remove it from the group too
     if len(remaining_tables) == 1:
@@ -386,15 +385,17 @@ async def unmerge_table(
         rem_t.merged_to_id = None
         
         # Check if remaining table has active order
-        rem_order = db.query(Order).filter(
-            Order.table_id == rem_t.id,
-            Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft"])
-        ).first()
+        rem_order = (await db.execute(
+            select(Order.id).filter(
+                Order.table_id == rem_t.id,
+                Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft"])
+            ).limit(1)
+        )).first()
         if not rem_order:
             rem_t.status = "Available"
     
-    db.commit()
-    db.refresh(table)
+    await db.commit()
+    await db.refresh(table)
     
     return {"message": "Table unmerged successfully", "table": table}
 
@@ -402,15 +403,17 @@ async def unmerge_table(
 @router.get("/{table_id}")
 async def get_table(
     table_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Get table by ID with active order info, filtered by branch"""
-    table = db.query(Table).filter(
-        Table.id == table_id,
-        Table.branch_id == branch_id
-    ).first()
+    table = (await db.execute(
+        select(Table).filter(
+            Table.id == table_id,
+            Table.branch_id == branch_id
+        )
+    )).scalars().first()
     if not table:
         raise HTTPException(status_code=404, detail="Table not found or access denied")
     
@@ -430,10 +433,12 @@ async def get_table(
     }
     
     # Get active order
-    active_order = db.query(Order).filter(
-        Order.table_id == table.id,
-        Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft", "Completed"])
-    ).first()
+    active_order = (await db.execute(
+        select(Order).filter(
+            Order.table_id == table.id,
+            Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft", "Completed"])
+        ).limit(1)
+    )).scalars().first()
     
     if active_order:
         result["active_order"] = {
@@ -449,34 +454,40 @@ async def get_table(
 @router.post("")
 async def create_table(
     table_data: dict = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),  # Allow managers too
     branch_id: int = Depends(get_branch_id)
 ):
     """Create a new table in the branch"""
     # Check if table_id already exists in the branch
-    existing = db.query(Table).filter(
-        Table.table_id == table_data.get('table_id'),
-        Table.branch_id == branch_id
-    ).first()
+    existing = (await db.execute(
+        select(Table.id).filter(
+            Table.table_id == table_data.get('table_id'),
+            Table.branch_id == branch_id
+        )
+    )).first()
     if existing:
         raise HTTPException(status_code=400, detail="Table ID already exists in this branch")
     
     # 1. Handle Display Order
     floor_id = table_data.get('floor_id')
-    max_order = db.query(Table).filter(
-        Table.floor_id == floor_id,
-        Table.branch_id == branch_id
-    ).order_by(Table.display_order.desc()).first()
+    max_order = (await db.execute(
+        select(Table).filter(
+            Table.floor_id == floor_id,
+            Table.branch_id == branch_id
+        ).order_by(Table.display_order.desc()).limit(1)
+    )).scalars().first()
     
     table_data['display_order'] = (max_order.display_order + 1) if max_order else 0
     
     # 2. Set Floor Name if missing but ID provided
     if floor_id and 'floor' not in table_data:
-        floor_obj = db.query(Floor).filter(
-            Floor.id == floor_id,
-            Floor.branch_id == branch_id
-        ).first()
+        floor_obj = (await db.execute(
+            select(Floor).filter(
+                Floor.id == floor_id,
+                Floor.branch_id == branch_id
+            )
+        )).scalars().first()
         if floor_obj:
             table_data['floor'] = floor_obj.name
             
@@ -497,11 +508,11 @@ async def create_table(
             is_active=True
         )
         db.add(new_table)
-        db.commit()
-        db.refresh(new_table)
+        await db.commit()
+        await db.refresh(new_table)
         return new_table
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error creating table: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to create table: {str(e)}")
 
@@ -511,34 +522,40 @@ async def create_table(
 async def update_table(
     table_id: int,
     table_data: dict = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Update a table in the branch"""
     # Get table filtered by branch
-    table = db.query(Table).filter(
-        Table.id == table_id,
-        Table.branch_id == branch_id
-    ).first()
+    table = (await db.execute(
+        select(Table).filter(
+            Table.id == table_id,
+            Table.branch_id == branch_id
+        )
+    )).scalars().first()
     if not table:
         raise HTTPException(status_code=404, detail="Table not found or access denied")
     
     # Check if new table_id conflicts with existing in the branch
     if 'table_id' in table_data and table_data['table_id'] != table.table_id:
-        existing = db.query(Table).filter(
-            Table.table_id == table_data['table_id'],
-            Table.branch_id == branch_id
-        ).first()
+        existing = (await db.execute(
+            select(Table.id).filter(
+                Table.table_id == table_data['table_id'],
+                Table.branch_id == branch_id
+            )
+        )).first()
         if existing:
             raise HTTPException(status_code=400, detail="Table ID already exists in this branch")
     
     # Update floor name if floor_id changed
     if 'floor_id' in table_data and table_data['floor_id'] != table.floor_id:
-        floor = db.query(Floor).filter(
-            Floor.id == table_data['floor_id'],
-            Floor.branch_id == branch_id
-        ).first()
+        floor = (await db.execute(
+            select(Floor).filter(
+                Floor.id == table_data['floor_id'],
+                Floor.branch_id == branch_id
+            )
+        )).scalars().first()
         if floor:
             table_data['floor'] = floor.name
     
@@ -546,8 +563,8 @@ async def update_table(
         if hasattr(table, key):
             setattr(table, key, value)
     
-    db.commit()
-    db.refresh(table)
+    await db.commit()
+    await db.refresh(table)
     return table
 
 
@@ -556,16 +573,16 @@ async def update_table(
 async def update_table_status(
     table_id: int,
     status: str = Body(..., embed=True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
 ):
     """Update table status in the branch"""
     # branch_id is now provided by dependency
     
-    query = db.query(Table).filter(Table.id == table_id)
+    query = select(Table).filter(Table.id == table_id)
     query = apply_branch_filter_table(db, query, branch_id)
-    table = query.first()
+    table = (await db.execute(query)).scalars().first()
     if not table:
         raise HTTPException(status_code=404, detail="Table not found or access denied")
     
@@ -574,44 +591,50 @@ async def update_table_status(
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
     
     table.status = status
-    db.commit()
-    db.refresh(table)
+    await db.commit()
+    await db.refresh(table)
     return table
 
 
 @router.delete("/{table_id}")
 async def delete_table(
     table_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(check_admin_role),
     branch_id: int = Depends(get_branch_id)
 ):
     """Delete a table in the branch (Admin only)"""
     # Get table filtered by branch
-    table = db.query(Table).filter(
-        Table.id == table_id,
-        Table.branch_id == branch_id
-    ).first()
+    table = (await db.execute(
+        select(Table).filter(
+            Table.id == table_id,
+            Table.branch_id == branch_id
+        )
+    )).scalars().first()
     if not table:
         raise HTTPException(status_code=404, detail="Table not found or access denied")
     
     # Hard Delete Logic
     
     # 1. Check for active orders
-    active_orders = db.query(Order).filter(
-        Order.table_id == table.id,
-        Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft"])
-    ).count()
+    active_orders = (await db.execute(
+        select(func.count(Order.id)).filter(
+            Order.table_id == table.id,
+            Order.status.in_(["Pending", "In Progress", "BillRequested", "Draft"])
+        )
+    )).scalar()
     
     if active_orders > 0:
         raise HTTPException(status_code=400, detail="Cannot delete table with active orders. Please complete or cancel them first.")
         
     # 2. Nullify table_id for past orders (preserve history)
-    db.query(Order).filter(Order.table_id == table.id).update({Order.table_id: None}, synchronize_session=False)
+    await db.execute(
+        update(Order).where(Order.table_id == table.id).values(table_id=None).execution_options(synchronize_session=False)
+    )
     
     # 3. Delete table
-    db.delete(table)
-    db.commit()
+    await db.delete(table)
+    await db.commit()
     return {"message": "Table deleted permanently"}
 
 
@@ -620,20 +643,22 @@ async def delete_table(
 async def reorder_table(
     table_id: int,
     new_order: int = Body(..., embed=True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(check_admin_role),
     branch_id: int = Depends(get_branch_id)
 ):
     """Reorder a table in the branch (Admin only)"""
     # Get table filtered by branch
-    table = db.query(Table).filter(
-        Table.id == table_id,
-        Table.branch_id == branch_id
-    ).first()
+    table = (await db.execute(
+        select(Table).filter(
+            Table.id == table_id,
+            Table.branch_id == branch_id
+        )
+    )).scalars().first()
     if not table:
         raise HTTPException(status_code=404, detail="Table not found or access denied")
     
     table.display_order = new_order
-    db.commit()
-    db.refresh(table)
+    await db.commit()
+    await db.refresh(table)
     return table
@@ -9,12 +9,13 @@ from app.core.dependencies import get_current_user, check_admin_role, get_passwo
 from app.models import User as DBUser, Role, UserBranchAssignment
 from app.schemas import UserResponse, UserCreateByAdmin, UserUpdate
 from app.core.config import settings
+from app.core.principal_cache import principal_cache
 
 router = APIRouter()
 
 
 @router.get("", response_model=list[UserResponse])
-async def get_users(
+def get_users(
     db: Session = Depends(get_db),
     current_user: DBUser = Depends(get_current_user),
     branch_id: int = Depends(get_branch_id)
@@ -38,7 +39,7 @@ async def get_users(
 
 
 @router.get("/all", response_model=list[UserResponse])
-async def get_all_organization_users(
+def get_all_organization_users(
     db: Session = Depends(get_db),
     current_user: DBUser = Depends(check_admin_role)
 ):
@@ -61,7 +62,7 @@ async def get_all_organization_users(
 
 
 @router.post("", response_model=UserResponse)
-async def create_user(
+def create_user(
     user_data: UserCreateByAdmin = Body(...),
     db: Session = Depends(get_db),
     current_user: DBUser = Depends(check_admin_role)
@@ -134,7 +135,7 @@ async def create_user(
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(
+def get_user(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: DBUser = Depends(check_admin_role)
@@ -148,7 +149,7 @@ async def get_user(
 
 @router.put("/{user_id}", response_model=UserResponse)
 @router.patch("/{user_id}", response_model=UserResponse)
-async def update_user(
+def update_user(
     user_id: int,
     user_data: UserUpdate = Body(...),
     db: Session = Depends(get_db),
@@ -193,11 +194,12 @@ async def update_user(
     
     db.commit()
     db.refresh(user)
+    principal_cache.invalidate_user(user.id)
     return user
 
 
 @router.delete("/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: DBUser = Depends(check_admin_role)
@@ -212,7 +214,8 @@ async def delete_user(
         raise HTTPException(status_code=403, detail="Cannot delete admin user")
     
     # If user is an organization owner, delete the entire organization
-    if user.is_organization_owner and user.owned_organization:
+    deleting_organization = bool(user.is_organization_owner and user.owned_organization)
+    if deleting_organization:
         org = user.owned_organization
         all_members = db.query(DBUser).filter(DBUser.organization_id == org.id).all()
         member_ids = [m.id for m in all_members]
@@ -224,7 +227,7 @@ async def delete_user(
         
         if branch_ids:
             # 1. Get all related IDs for deep cleanup
-            from app.models.orders import Order, KOT, OrderItem, KOTItem, Table, Floor, Session
+            from app.models.orders import Order, KOT, OrderItem, KOTItem, Table, Floor, Session, OrderIdempotencyKey
             from app.models.pos_session import POSSession
             from app.models.inventory import InventoryTransaction, BatchProduction, UnitOfMeasurement, Product, BillOfMaterials, BOMItem
             from app.models.role import Role
@@ -235,6 +238,7 @@ async def delete_user(
             from app.models.settings import PaymentMode, StorageArea, DiscountRule
             from app.models.purchase import Supplier, PurchaseBill, PurchaseReturn, PurchaseBillItem
             from app.models.delivery import DeliveryPartner
+            from app.models.sequence import DocumentSequence
             
             product_ids = [r[0] for r in db.query(Product.id).filter(Product.branch_id.in_(branch_ids)).all()]
             order_ids = [r[0] for r in db.query(Order.id).filter(Order.branch_id.in_(branch_ids)).all()]
@@ -330,6 +334,8 @@ async def delete_user(
             db.query(PaymentMode).filter(PaymentMode.branch_id.in_(branch_ids)).delete(synchronize_session=False)
             db.query(StorageArea).filter(StorageArea.branch_id.in_(branch_ids)).delete(synchronize_session=False)
             db.query(DiscountRule).filter(DiscountRule.branch_id.in_(branch_ids)).delete(synchronize_session=False)
+            db.query(DocumentSequence).filter(DocumentSequence.branch_id.in_(branch_ids)).delete(synchronize_session=False)
+            db.query(OrderIdempotencyKey).filter(OrderIdempotencyKey.branch_id.in_(branch_ids)).delete(synchronize_session=False)
             db.flush()
 
         # 3. Detach users from Org and Branches BEFORE deleting branches (CRITICAL for FKs)
@@ -400,11 +406,16 @@ async def delete_user(
 
         
     db.commit()
+    if deleting_organization:
+        # Members and branches of the whole organization are gone
+        principal_cache.clear()
+    else:
+        principal_cache.invalidate_user(user_id)
     return {"message": "User deleted successfully"}
 
 
 @router.post("/{user_id}/image")
-async def upload_user_profile_image(
+def upload_user_profile_image(
     user_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
@@ -419,7 +430,7 @@ async def upload_user_profile_image(
         raise HTTPException(status_code=400, detail="File must be an image")
         
     try:
-        content = await file.read()
+        content = file.file.read()
         user.profile_image_data = content
         user.profile_image_url = f"/api/v1/images/users/{user_id}/profile"
     except Exception as e:
@@ -427,4 +438,5 @@ async def upload_user_profile_image(
         
     db.commit()
     db.refresh(user)
+    principal_cache.invalidate_user(user_id)
     return user
@@ -1,20 +1,22 @@
 """
 Dependencies for FastAPI routes (authentication, authorization, etc.)
 """
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status, Header
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.password_hasher import password_hasher
+from app.core.principal_cache import principal_cache, UserSnapshot
 from app.db.database import get_db
 from app.models import User as DBUser
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing (bcrypt runs in a dedicated pool, see app.core.password_hasher)
+pwd_context = password_hasher.context
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -23,12 +25,12 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 # ============ Password Utilities ============
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 
 # ============ JWT Utilities ============
@@ -54,11 +56,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 # ============ Authentication Dependencies ============
-async def get_current_user(
+def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> DBUser:
-    """Get the current authenticated user from JWT token"""
+) -> UserSnapshot:
+    """
+    Get the current authenticated user from JWT token.
+    Returns a detached snapshot, cached per token (see app.core.principal_cache).
+    Declared sync so FastAPI resolves it in the threadpool instead of blocking the event loop.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -67,7 +73,6 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
-        role: str = payload.get("role")
         if username is None:
             raise credentials_exception
     except JWTError:
@@ -75,23 +80,44 @@ async def get_current_user(
     
     # Handle platform admin specifically
     if username == "platform_admin":
-        # Create a synthetic user object that mimics DBUser
-        class SyntheticUser:
-            def __init__(self):
-                self.id = 0
-                self.username = "platform_admin"
-                self.email = "admin@panel"
-                self.full_name = "Platform Administrator"
-                self.role = "platform_admin"
-                self.disabled = False
-                self.organization_id = None
-                self.current_branch_id = None
-                self.is_organization_owner = False
-        return SyntheticUser()
+        return UserSnapshot(
+            id=0,
+            username="platform_admin",
+            email="admin@panel",
+            full_name="Platform Administrator",
+            role="platform_admin",
+            disabled=False,
+            is_organization_owner=False,
+        )
+    
+    jti = payload.get("jti")
+    if jti:
+        cached = principal_cache.get_user(jti)
+        if cached is not None:
+            return cached
     
     user = db.query(DBUser).filter(DBUser.username == username).first()
     if user is None:
         raise credentials_exception
+    snapshot = UserSnapshot.from_user(user)
+    if jti and payload.get("exp"):
+        principal_cache.set_user(jti, snapshot, expires_in=payload["exp"] - time.time())
+    return snapshot
+
+
+def get_current_db_user(
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> DBUser:
+    """The current user as a row of this request's session, for routes that modify it"""
+    user = db.query(DBUser).filter(DBUser.id == current_user.id).first()
+    if user is None:
+        principal_cache.invalidate_user(current_user.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
@@ -110,6 +136,32 @@ def check_role(required_role: str):
     return role_checker
 
 
+def require_permission(*permissions: str):
+    """
+    Dependency factory: the user's role in the branch of the request
+    (X-Branch-Code, see get_branch_id) must grant at least one of the given
+    permissions. Checked against the compiled bitset (see
+    app.core.permissions); the role is only loaded when not cached.
+    """
+    from app.core.permissions import permission_registry
+
+    required = permission_registry.compile(permissions)
+
+    def permission_checker(
+        current_user: UserSnapshot = Depends(get_current_user),
+        branch_id: int = Depends(get_branch_id),
+        db: Session = Depends(get_db)
+    ) -> UserSnapshot:
+        role = permission_registry.get_role(db, branch_id, current_user.role)
+        if not role.mask & required:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Operation not permitted"
+            )
+        return current_user
+    return permission_checker
+
+
 def check_admin_role(current_user: DBUser = Depends(get_current_user)) -> DBUser:
     """Dependency to ensure user is admin (organization level)"""
     if current_user.role != "admin" and current_user.role != "platform_admin":
@@ -130,7 +182,7 @@ def check_platform_admin(current_user: DBUser = Depends(get_current_user)) -> DB
     return current_user
 
 
-async def get_branch_id(
+def get_branch_id(
     x_branch_code: str = Header(..., alias="X-Branch-Code"),
     db: Session = Depends(get_db),
     current_user: DBUser = Depends(get_current_user)
@@ -138,10 +190,15 @@ async def get_branch_id(
     """
     Get the current branch ID based on the X-Branch-Code header.
     Verifies that the user has access to this branch.
+    Declared sync so FastAPI resolves it in the threadpool.
     """
     from app.models.branch import Branch
     from app.models.user_branch import UserBranchAssignment
 
+    cached_branch_id = principal_cache.get_branch_id(current_user.id, x_branch_code)
+    if cached_branch_id is not None:
+        return cached_branch_id
+
     # Resolve branch code or slug to ID
     branch = db.query(Branch).filter(
         (Branch.code == x_branch_code) | (Branch.slug == x_branch_code)
@@ -154,6 +211,7 @@ async def get_branch_id(
 
     # Platform Admin bypass
     if current_user.role == "platform_admin":
+        principal_cache.set_branch_id(current_user.id, x_branch_code, branch.id)
         return branch.id
 
     # Check if user belongs to the same organization
@@ -175,4 +233,5 @@ async def get_branch_id(
             detail="You do not have access to this branch."
          )
 
+    principal_cache.set_branch_id(current_user.id, x_branch_code, branch.id)
     return branch.id
@@ -0,0 +1,260 @@
+"""
+Event loop lag and blocking-call detection
+
+Opt-in diagnostics (LOOP_MONITOR_ENABLED=true) made of three parts:
+- a heartbeat task on the event loop that measures how late each tick wakes up
+- a watchdog thread that notices when the heartbeat stalls and samples which
+  request task and which call site is holding the loop
+- an ASGI middleware that maps asyncio tasks to the route they are serving
+
+Stalls above the threshold are recorded in per-route histograms, exposed by
+GET /api/v1/diagnostics/event-loop.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+from app.core.config import settings
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.dirname(APP_DIR)
+
+UNATTRIBUTED = "<unattributed>"
+
+
+class LagHistogram:
+    """Fixed-bucket latency histogram (milliseconds)"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float):
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+        for i, bound in enumerate(BUCKETS_MS):
+            if value_ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def to_dict(self) -> dict:
+        labels = [f"le_{bound}ms" for bound in BUCKETS_MS] + ["+inf"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+def route_label(scope: dict) -> str:
+    """
+    Build a low-cardinality label such as 'POST /api/v1/orders/{order_id}/items'
+    by putting path parameter names back into the concrete request path.
+    """
+    path = scope.get("path", "")
+    params = scope.get("path_params") or {}
+    if params:
+        names = {str(value): name for name, value in params.items()}
+        path = "/".join("{%s}" % names[seg] if seg in names else seg for seg in path.split("/"))
+    return f"{scope.get('method', '')} {path}"
+
+
+def _describe_frame(frame) -> str:
+    filename = frame.f_code.co_filename
+    if filename.startswith(BACKEND_DIR):
+        filename = os.path.relpath(filename, BACKEND_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+def _blocking_call_site(frame) -> Optional[str]:
+    """
+    Describe where a blocked thread is stuck: the innermost frame in our own
+    code (e.g. PrintingService._send_network), plus the innermost frame overall
+    when that is in a library (e.g. socket.connect).
+    """
+    if frame is None:
+        return None
+
+    innermost = frame
+    app_frame = None
+    while frame is not None:
+        if frame.f_code.co_filename.startswith(APP_DIR) and "loop_monitor" not in frame.f_code.co_filename:
+            app_frame = frame
+            break
+        frame = frame.f_back
+
+    if app_frame is None:
+        return _describe_frame(innermost)
+    if app_frame is innermost:
+        return _describe_frame(app_frame)
+    return f"{_describe_frame(app_frame)} -> {_describe_frame(innermost)}"
+
+
+class LoopMonitor:
+    """Measures event loop lag and attributes blocking time to routes"""
+
+    def __init__(self, interval_ms: int = 50, threshold_ms: int = 100):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.running = False
+
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog_thread: Optional[threading.Thread] = None
+        self._last_beat = time.perf_counter()
+
+        # asyncio.Task -> ASGI scope of the request it is serving
+        self._task_scopes = {}
+        # (scope, call site) sampled by the watchdog during the current stall
+        self._stall = None
+
+        self.reset()
+
+    def reset(self):
+        """Clear all collected statistics"""
+        with self._lock:
+            self.loop_lag = LagHistogram()
+            self.routes = defaultdict(LagHistogram)
+            self.call_sites = defaultdict(Counter)
+            self.started_at = time.time()
+
+    # ============ Lifecycle ============
+    def start(self):
+        """Start the heartbeat on the running loop and the watchdog thread"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self.running = True
+
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        self._watchdog_thread = threading.Thread(target=self._watchdog, name="loop-monitor", daemon=True)
+        self._watchdog_thread.start()
+
+    async def stop(self):
+        self.running = False
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+
+    # ============ Request tracking (used by the middleware) ============
+    def track(self, task: asyncio.Task, scope: dict):
+        self._task_scopes[task] = scope
+
+    def untrack(self, task: asyncio.Task):
+        self._task_scopes.pop(task, None)
+
+    # ============ Probes ============
+    async def _heartbeat(self):
+        """Sleep for one interval and record how late the loop woke us up"""
+        while self.running:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._last_beat = now
+            lag = max(0.0, now - started - self.interval)
+
+            with self._lock:
+                stall, self._stall = self._stall, None
+                self.loop_lag.observe(lag * 1000)
+                if lag >= self.threshold:
+                    # Label the route only now: routing may not have filled
+                    # path_params yet when the watchdog sampled the scope
+                    scope, site = stall if stall else (None, None)
+                    route = route_label(scope) if scope else UNATTRIBUTED
+                    self.routes[route].observe(lag * 1000)
+                    if site:
+                        self.call_sites[route][site] += 1
+
+    def _watchdog(self):
+        """Sample the loop thread while the heartbeat is overdue"""
+        poll = max(self.interval / 2, 0.005)
+        while self.running:
+            time.sleep(poll)
+            overdue = time.perf_counter() - self._last_beat - self.interval
+            if overdue < self.threshold or self._stall is not None:
+                continue
+
+            # The task holding the loop right now is the one blocking it
+            task = asyncio.current_task(self._loop)
+            scope = self._task_scopes.get(task) if task else None
+            frame = sys._current_frames().get(self._loop_thread_id)
+
+            with self._lock:
+                self._stall = (scope, _blocking_call_site(frame))
+
+    # ============ Reporting ============
+    def snapshot(self, top_call_sites: int = 5) -> dict:
+        with self._lock:
+            routes = sorted(self.routes.items(), key=lambda kv: kv[1].total_ms, reverse=True)
+            return {
+                "enabled": settings.LOOP_MONITOR_ENABLED,
+                "running": self.running,
+                "interval_ms": round(self.interval * 1000),
+                "threshold_ms": round(self.threshold * 1000),
+                "collecting_for_s": round(time.time() - self.started_at, 1),
+                "in_flight_requests": len(self._task_scopes),
+                "loop_lag": self.loop_lag.to_dict(),
+                "routes": [
+                    {
+                        "route": route,
+                        "blocking": histogram.to_dict(),
+                        "call_sites": [
+                            {"site": site, "count": count}
+                            for site, count in self.call_sites[route].most_common(top_call_sites)
+                        ],
+                    }
+                    for route, histogram in routes
+                ],
+            }
+
+
+class LoopMonitorMiddleware:
+    """
+    Pure ASGI middleware that records which route each request task is serving.
+    (BaseHTTPMiddleware would run the endpoint in a different task.)
+    """
+
+    def __init__(self, app, monitor: "LoopMonitor"):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        task = asyncio.current_task()
+        self.monitor.track(task, scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.untrack(task)
+
+
+loop_monitor = LoopMonitor(
+    interval_ms=settings.LOOP_MONITOR_INTERVAL_MS,
+    threshold_ms=settings.LOOP_MONITOR_THRESHOLD_MS,
+)
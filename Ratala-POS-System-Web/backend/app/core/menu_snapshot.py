@@ -0,0 +1,186 @@
+"""
+Per-branch menu snapshots
+
+To price an order line and route it to the kitchen (KOT) or the bar (BOT),
+an order needs only four facts about a menu item: its price, its station, its
+BOM and whether it is active. Order routes used to query menu_items (joined to
+categories) for them on every request. Each worker now keeps those facts per
+branch, in flat arrays indexed by menu_item_id - base_id:
+
+- menu write endpoints call refresh() after they commit; only the rows they
+  touched are read again and patched into a new snapshot
+- an id the snapshot does not know yet (e.g. an item created through another
+  worker) is read the first time an order uses it and patched in the same way
+
+Snapshots are never mutated, only replaced, so readers need no lock. Edits
+made through other workers show up once MENU_SNAPSHOT_TTL_SECONDS have passed
+since the snapshot was loaded (patching does not extend it).
+"""
+import threading
+import time
+from array import array
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.principal_cache import TTLCache
+
+# stations[] code -> station; 0 means there is no menu item at that id
+STATIONS = (None, "KOT", "BOT")
+
+
+class MenuSnapshot:
+    """Price, station, BOM and active flag of every menu item of one branch"""
+
+    __slots__ = ("branch_id", "version", "loaded_at", "base_id", "prices", "stations", "bom_ids", "active")
+
+    def __init__(self, branch_id: Optional[int], version: int, loaded_at: float, rows: dict):
+        # rows: menu_item_id -> (price, station, bom_id, is_active)
+        self.branch_id = branch_id
+        self.version = version
+        self.loaded_at = loaded_at
+        self.base_id = min(rows) if rows else 0
+        size = max(rows) - self.base_id + 1 if rows else 0
+        self.prices = array("d", bytes(8 * size))
+        self.stations = bytearray(size)
+        self.bom_ids = array("q", bytes(8 * size))
+        self.active = bytearray(size)
+        for item_id, (price, station, bom_id, is_active) in rows.items():
+            slot = item_id - self.base_id
+            self.prices[slot] = price or 0
+            self.stations[slot] = 2 if station == "BOT" else 1
+            self.bom_ids[slot] = bom_id or 0
+            self.active[slot] = 1 if is_active else 0
+
+    def _slot(self, menu_item_id) -> int:
+        if not isinstance(menu_item_id, int):
+            return -1
+        slot = menu_item_id - self.base_id
+        if 0 <= slot < len(self.stations) and self.stations[slot]:
+            return slot
+        return -1
+
+    def __contains__(self, menu_item_id) -> bool:
+        return self._slot(menu_item_id) >= 0
+
+    def __len__(self) -> int:
+        return len(self.stations) - self.stations.count(0)
+
+    def price(self, menu_item_id) -> Optional[float]:
+        slot = self._slot(menu_item_id)
+        return self.prices[slot] if slot >= 0 else None
+
+    def station(self, menu_item_id) -> Optional[str]:
+        """KOT or BOT: the category's type, else the item's own kot_bot"""
+        slot = self._slot(menu_item_id)
+        return STATIONS[self.stations[slot]] if slot >= 0 else None
+
+    def bom_id(self, menu_item_id) -> Optional[int]:
+        slot = self._slot(menu_item_id)
+        return (self.bom_ids[slot] or None) if slot >= 0 else None
+
+    def is_active(self, menu_item_id) -> bool:
+        slot = self._slot(menu_item_id)
+        return slot >= 0 and bool(self.active[slot])
+
+    def split_by_station(self, items: list) -> Tuple[list, list]:
+        """(KOT lines, BOT lines) of order item dicts; lines of unknown items are left out"""
+        kot_items, bot_items = [], []
+        for item in items:
+            station = self.station(item.get('menu_item_id'))
+            if station == "BOT":
+                bot_items.append(item)
+            elif station == "KOT":
+                kot_items.append(item)
+        return kot_items, bot_items
+
+    def rows(self) -> dict:
+        return {
+            self.base_id + slot: (self.prices[slot], STATIONS[code], self.bom_ids[slot] or None, bool(self.active[slot]))
+            for slot, code in enumerate(self.stations) if code
+        }
+
+    def patched(self, rows: dict, version: int) -> "MenuSnapshot":
+        return MenuSnapshot(self.branch_id, version, self.loaded_at, {**self.rows(), **rows})
+
+
+def _load_rows(db, condition) -> dict:
+    from app.models.menu import Category, MenuItem
+
+    return {
+        item_id: (price, station, bom_id, is_active)
+        for item_id, price, station, bom_id, is_active in db.execute(
+            select(
+                MenuItem.id,
+                MenuItem.price,
+                func.coalesce(Category.type, MenuItem.kot_bot),
+                MenuItem.bom_id,
+                MenuItem.is_active
+            ).outerjoin(Category, Category.id == MenuItem.category_id).where(condition)
+        ).all()
+    }
+
+
+class MenuSnapshotCache:
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self._lock = threading.Lock()
+        self._versions = {}  # branch_id -> version, bumped by every refresh
+        self.snapshots = TTLCache(maxsize, ttl)  # branch_id -> MenuSnapshot
+        self.loads = 0
+        self.patched_rows = 0
+
+    def get(self, db, branch_id: Optional[int], item_ids: Iterable = ()) -> MenuSnapshot:
+        """Menu snapshot of a branch that knows every id in item_ids that exists"""
+        from app.models.menu import MenuItem
+
+        snapshot = self.snapshots.get(branch_id)
+        if snapshot is None:
+            version = self._versions.get(branch_id, 0)
+            snapshot = MenuSnapshot(branch_id, version, time.monotonic(), _load_rows(db, MenuItem.branch_id == branch_id))
+            self.loads += 1
+            self._store(snapshot)
+
+        unknown = {item_id for item_id in item_ids if isinstance(item_id, int) and item_id not in snapshot}
+        if unknown:
+            snapshot = self._patch(db, snapshot, MenuItem.id.in_(unknown), snapshot.version)
+        return snapshot
+
+    def refresh(self, db, branch_id: Optional[int], condition):
+        """Re-read the menu items matching condition (after a menu write has committed)"""
+        with self._lock:
+            version = self._versions[branch_id] = self._versions.get(branch_id, 0) + 1
+        snapshot = self.snapshots.get(branch_id)
+        if snapshot is not None:
+            self._patch(db, snapshot, condition, version)
+
+    def invalidate(self, branch_id: Optional[int]):
+        """Drop a branch's snapshot (menu items deleted or changed in bulk)"""
+        with self._lock:
+            self._versions[branch_id] = self._versions.get(branch_id, 0) + 1
+            self.snapshots.discard_where(lambda key, _: key == branch_id)
+
+    def _patch(self, db, snapshot: MenuSnapshot, condition, version: int) -> MenuSnapshot:
+        rows = _load_rows(db, condition)
+        if not rows:
+            return snapshot
+        self.patched_rows += len(rows)
+        snapshot = snapshot.patched(rows, version)
+        self._store(snapshot)
+        return snapshot
+
+    def _store(self, snapshot: MenuSnapshot):
+        with self._lock:
+            if snapshot.version != self._versions.get(snapshot.branch_id, 0):
+                # Another refresh ran meanwhile; its rows may be missing from this copy
+                self.snapshots.discard_where(lambda key, _: key == snapshot.branch_id)
+                return
+            remaining = self.snapshots.ttl - (time.monotonic() - snapshot.loaded_at)
+            if remaining > 0:
+                self.snapshots.set(snapshot.branch_id, snapshot, ttl=remaining)
+
+    def to_dict(self) -> dict:
+        return {**self.snapshots.to_dict(), "full_loads": self.loads, "patched_rows": self.patched_rows}
+
+
+menu_snapshots = MenuSnapshotCache(settings.MENU_SNAPSHOT_TTL_SECONDS)
@@ -0,0 +1,135 @@
+"""
+Password hashing off the request threads
+
+bcrypt takes a few hundred milliseconds per hash by design. At shift start
+dozens of staff log in at once; verifying inline would tie up the event loop
+or the shared threadpool every other request needs. Hashing and verification
+run in a small dedicated thread pool instead (bcrypt releases the GIL, so
+threads use every core), sized PASSWORD_HASH_WORKERS.
+
+Logins await the pool from the event loop. When PASSWORD_HASH_MAX_PENDING
+hashes are already queued for a free worker (the ones running do not count)
+they fail fast with PasswordHasherBusy (503) rather than queueing for tens
+of seconds. Sync callers (admin user management, password reset) block on
+the pool and are never rejected.
+
+PASSWORD_BCRYPT_ROUNDS pins the cost: verify_and_update returns a new hash
+whenever a stored hash uses a different cost, so login upgrades (or
+downgrades) hashes transparently after the setting changes.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.core.loop_monitor import LagHistogram
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashes queued; the caller should retry shortly"""
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int, workers: int, max_pending: int):
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash") if workers > 0 else None
+        )
+        self._lock = threading.Lock()
+        self.pending = 0  # queued or running
+        self.queued = 0  # waiting for a free worker
+        self.max_pending_seen = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.queue_wait = LagHistogram()
+        self.duration = LagHistogram()
+
+    # ============ Pool ============
+    def _submit(self, reject_when_full: bool, fn, *args) -> Future:
+        with self._lock:
+            if reject_when_full and self.queued >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self.pending += 1
+            self.queued += 1
+            self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        submitted = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            with self._lock:
+                self.queued -= 1
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self.pending -= 1
+                    self.completed += 1
+                    self.queue_wait.observe((started - submitted) * 1000)
+                    self.duration.observe((finished - started) * 1000)
+
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(run())
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._executor.submit(run)
+
+    # ============ Async API (event loop callers) ============
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new hash if the stored one should be replaced)"""
+        valid, new_hash = await asyncio.wrap_future(
+            self._submit(True, self.context.verify_and_update, password, hashed)
+        )
+        if new_hash:
+            with self._lock:
+                self.rehashed += 1
+        return valid, new_hash
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(True, self.context.hash, password))
+
+    # ============ Sync API (threadpool callers) ============
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._submit(False, self.context.verify, password, hashed).result()
+
+    def hash(self, password: str) -> str:
+        return self._submit(False, self.context.hash, password).result()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "queued": self.queued,
+                "max_pending_seen": self.max_pending_seen,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "queue_wait": self.queue_wait.to_dict(),
+                "duration": self.duration.to_dict(),
+            }
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
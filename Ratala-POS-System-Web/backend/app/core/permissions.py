@@ -0,0 +1,127 @@
+"""
+Compiled role permissions
+
+Roles store their permissions as a JSON list of strings per branch. Checking
+them used to mean loading the Role row (matched on lower(name)) on every
+call. Here each role's list is compiled once into an int bitset, one bit per
+permission name, and cached under (branch_id, role, role version):
+
+- require_permission(...) checks a bit, no DB access once the role is cached
+- roles_service create/update/delete bumps the role's version in this worker;
+  other workers pick the change up after AUTH_CACHE_TTL_SECONDS
+
+Bits are assigned per process (known permissions first, anything else a role
+contains on first sight) and never stored, so the registry can grow freely.
+Names are normalized the way the frontend PermissionProvider does.
+"""
+import threading
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.core.principal_cache import TTLCache
+
+# Bit order of the permissions the app knows about (roles_service lists these)
+KNOWN_PERMISSIONS = [
+    "dashboard.view",
+    "pos.access",
+]
+
+WILDCARD = "*"
+ALL_PERMISSIONS = -1  # every bit set, including ones assigned later
+
+# Alternative spellings stored by older role editors
+ALIASES = {
+    "session.manage": "sessions.manage",
+}
+
+FULL_ACCESS_ROLES = {"admin", "platform_admin"}
+
+# Used when a role has no (or an empty) Role row in its branch
+DEFAULT_ROLE_PERMISSIONS = {
+    "manager": ["dashboard.view", "pos.access"],
+}
+DEFAULT_PERMISSIONS = ["pos.access"]
+
+
+def normalize_permission(name: str) -> str:
+    name = name.replace(":", ".").lower().strip()
+    return ALIASES.get(name, name)
+
+
+class CompiledRole(NamedTuple):
+    mask: int
+    names: Tuple[str, ...]  # as stored on the role, for /users/me
+
+
+class PermissionRegistry:
+    def __init__(self, ttl: float, maxsize: int):
+        self._lock = threading.Lock()
+        self._bits = {}
+        for name in KNOWN_PERMISSIONS:
+            self.bit(name)
+        self._versions = {}  # (branch_id, role) -> version
+        self.roles = TTLCache(maxsize, ttl)  # (branch_id, role, version) -> CompiledRole
+
+    # ============ Bitsets ============
+    def bit(self, name: str) -> int:
+        name = normalize_permission(name)
+        if name == WILDCARD:
+            return ALL_PERMISSIONS
+        bit = self._bits.get(name)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.setdefault(name, 1 << len(self._bits))
+        return bit
+
+    def compile(self, names: Iterable[str]) -> int:
+        mask = 0
+        for name in names:
+            mask |= self.bit(name)
+        return mask
+
+    def names(self, mask: int) -> list:
+        if mask == ALL_PERMISSIONS:
+            return [WILDCARD]
+        return [name for name, bit in self._bits.items() if mask & bit]
+
+    # ============ Roles ============
+    def version(self, branch_id: Optional[int], role: str) -> int:
+        return self._versions.get((branch_id, role.lower()), 0)
+
+    def invalidate(self, branch_id: Optional[int], role: str):
+        """A role was created, changed or deleted: older compiled entries stop matching"""
+        key = (branch_id, role.lower())
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def get_role(self, db, branch_id: Optional[int], role: str) -> CompiledRole:
+        """Compiled permissions of a role in a branch (loads the Role row on a miss)"""
+        role = role.lower()
+        if role in FULL_ACCESS_ROLES:
+            return CompiledRole(ALL_PERMISSIONS, (WILDCARD,))
+
+        key = (branch_id, role, self.version(branch_id, role))
+        compiled = self.roles.get(key)
+        if compiled is None:
+            compiled = self._load(db, branch_id, role)
+            self.roles.set(key, compiled)
+        return compiled
+
+    def _load(self, db, branch_id: Optional[int], role: str) -> CompiledRole:
+        from sqlalchemy import func
+        from app.models.role import Role
+
+        row = db.query(Role.permissions).filter(
+            func.lower(Role.name) == role,
+            Role.branch_id == branch_id
+        ).first()
+        names = list(row.permissions) if row and row.permissions else (
+            DEFAULT_ROLE_PERMISSIONS.get(role, DEFAULT_PERMISSIONS)
+        )
+        return CompiledRole(self.compile(names), tuple(names))
+
+    def to_dict(self) -> dict:
+        return {"permission_bits": dict(self._bits), "roles": self.roles.to_dict()}
+
+
+permission_registry = PermissionRegistry(settings.AUTH_CACHE_TTL_SECONDS, settings.AUTH_CACHE_MAX_ENTRIES)
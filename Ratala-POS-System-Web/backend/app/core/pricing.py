@@ -0,0 +1,120 @@
+"""
+Branch pricing profiles
+
+Service charge and tax come from the branch, falling back to the company
+settings and then to the defaults below. Every order mutation used to query
+CompanySettings and Branch to work that out. Here the rates, the branch's
+active discount rules and the rounding policy are resolved once per branch
+and cached under (branch_id, settings version, branch version):
+
+- branch updates and discount rule changes bump the branch's version
+- company settings updates bump the settings version (every branch falls back to them)
+
+Both only reach this worker; other workers follow within
+PRICING_CACHE_TTL_SECONDS. The arithmetic itself lives in
+OrderCalculationService.
+"""
+import threading
+from typing import NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.core.principal_cache import TTLCache
+
+DEFAULT_SERVICE_CHARGE_RATE = 10.0
+DEFAULT_TAX_RATE = 13.0
+# Amounts are stored rounded to the currency's minor unit
+DEFAULT_DECIMAL_PLACES = 2
+
+
+class DiscountRuleSnapshot(NamedTuple):
+    id: int
+    name: str
+    discount_type: str  # Percentage, Fixed Amount
+    discount_value: float
+    min_order_amount: float
+    max_discount_amount: Optional[float]
+    applicable_on: str  # All, Dine-In, Takeaway, Delivery
+
+
+class PricingProfile(NamedTuple):
+    branch_id: Optional[int]
+    service_charge_rate: float
+    tax_rate: float
+    discount_rules: Tuple[DiscountRuleSnapshot, ...]
+    decimal_places: int = DEFAULT_DECIMAL_PLACES
+
+
+def _first_rate(*rates) -> float:
+    return next(rate for rate in rates if rate is not None)
+
+
+class PricingProfileCache:
+    def __init__(self, ttl: float, maxsize: int = 4096):
+        self._lock = threading.Lock()
+        self._settings_version = 0
+        self._versions = {}  # branch_id -> version
+        self.profiles = TTLCache(maxsize, ttl)  # (branch_id, settings version, version) -> PricingProfile
+
+    def invalidate(self, branch_id: Optional[int]):
+        """A branch's rates or discount rules changed"""
+        with self._lock:
+            self._versions[branch_id] = self._versions.get(branch_id, 0) + 1
+
+    def invalidate_all(self):
+        """Company settings changed"""
+        with self._lock:
+            self._settings_version += 1
+
+    def get(self, db, branch_id: Optional[int]) -> PricingProfile:
+        """Pricing profile of a branch (loads settings, branch and rules on a miss)"""
+        key = (branch_id, self._settings_version, self._versions.get(branch_id, 0))
+        profile = self.profiles.get(key)
+        if profile is None:
+            profile = self._load(db, branch_id)
+            self.profiles.set(key, profile)
+        return profile
+
+    def _load(self, db, branch_id: Optional[int]) -> PricingProfile:
+        from app.models.branch import Branch
+        from app.models.settings import CompanySettings, DiscountRule
+
+        company = db.query(CompanySettings.service_charge_rate, CompanySettings.tax_rate).first()
+        branch = db.query(Branch.service_charge_rate, Branch.tax_rate).filter(
+            Branch.id == branch_id
+        ).first() if branch_id else None
+        rules = db.query(DiscountRule).filter(
+            DiscountRule.branch_id == branch_id,
+            DiscountRule.is_active == True
+        ).all() if branch_id else []
+
+        return PricingProfile(
+            branch_id=branch_id,
+            service_charge_rate=_first_rate(
+                branch.service_charge_rate if branch else None,
+                company.service_charge_rate if company else None,
+                DEFAULT_SERVICE_CHARGE_RATE
+            ),
+            tax_rate=_first_rate(
+                branch.tax_rate if branch else None,
+                company.tax_rate if company else None,
+                DEFAULT_TAX_RATE
+            ),
+            discount_rules=tuple(
+                DiscountRuleSnapshot(
+                    id=rule.id,
+                    name=rule.name,
+                    discount_type=rule.discount_type,
+                    discount_value=rule.discount_value or 0,
+                    min_order_amount=rule.min_order_amount or 0,
+                    max_discount_amount=rule.max_discount_amount,
+                    applicable_on=rule.applicable_on or "All",
+                )
+                for rule in rules
+            ),
+        )
+
+    def to_dict(self) -> dict:
+        return {"settings_version": self._settings_version, "profiles": self.profiles.to_dict()}
+
+
+pricing_profiles = PricingProfileCache(settings.PRICING_CACHE_TTL_SECONDS)
@@ -0,0 +1,140 @@
+"""
+Authenticated principal and branch-access cache
+
+get_current_user and get_branch_id cost three queries (user by username,
+branch by code/slug, assignment check) before any route logic runs. Both
+answers are cached per worker with a TTL and an LRU bound:
+
+- token jti -> snapshot of the user's columns (never longer than the token lives)
+- (user id, X-Branch-Code) -> branch id, only for successful access checks
+
+Code that changes users, branches or assignments calls invalidate_user /
+invalidate_branch so this worker sees the change immediately; other workers
+see it once AUTH_CACHE_TTL_SECONDS has passed.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries also expire"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        if self.ttl <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard_where(self, predicate: Callable[[Any, Any], bool]) -> int:
+        """Drop every entry for which predicate(key, value) is true"""
+        with self._lock:
+            stale = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def to_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+class UserSnapshot:
+    """
+    Detached copy of the user columns routes read from current_user.
+    Not bound to a session: routes that modify the user itself depend on
+    get_current_db_user instead.
+    """
+
+    FIELDS = (
+        "id", "username", "email", "full_name", "role", "disabled", "organization_id",
+        "current_branch_id", "is_organization_owner", "profile_image_url", "created_at",
+    )
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            setattr(self, field, values.get(field))
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(**{field: getattr(user, field, None) for field in cls.FIELDS})
+
+    def values(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class PrincipalCache:
+    def __init__(self, ttl: float, maxsize: int):
+        self.users = TTLCache(maxsize, ttl)      # jti -> UserSnapshot values
+        self.branches = TTLCache(maxsize, ttl)   # (user_id, branch code) -> branch_id
+
+    def get_user(self, jti: str) -> Optional[UserSnapshot]:
+        values = self.users.get(jti)
+        # A fresh object per request, so routes can't leak attribute changes into the cache
+        return UserSnapshot(**values) if values is not None else None
+
+    def set_user(self, jti: str, user: UserSnapshot, expires_in: float):
+        self.users.set(jti, user.values(), ttl=expires_in)
+
+    def get_branch_id(self, user_id: int, branch_code: str) -> Optional[int]:
+        return self.branches.get((user_id, branch_code))
+
+    def set_branch_id(self, user_id: int, branch_code: str, branch_id: int):
+        self.branches.set((user_id, branch_code), branch_id)
+
+    def invalidate_user(self, user_id: int):
+        """User row or their branch assignments changed"""
+        self.users.discard_where(lambda _, values: values["id"] == user_id)
+        self.branches.discard_where(lambda key, _: key[0] == user_id)
+
+    def invalidate_branch(self, branch_id: int):
+        """Branch code/slug, organization or active state changed"""
+        self.branches.discard_where(lambda _, cached_id: cached_id == branch_id)
+
+    def clear(self):
+        self.users.clear()
+        self.branches.clear()
+
+    def to_dict(self) -> dict:
+        return {"users": self.users.to_dict(), "branches": self.branches.to_dict()}
+
+
+principal_cache = PrincipalCache(settings.AUTH_CACHE_TTL_SECONDS, settings.AUTH_CACHE_MAX_ENTRIES)
@@ -0,0 +1,214 @@
+"""
+Per-request SQL query counter and N+1 detector
+
+Opt-in diagnostics (QUERY_COUNTER_ENABLED=true) built on SQLAlchemy's
+before/after_cursor_execute events. Every statement executed while a request
+is in flight is counted and timed, and the totals are reported on the response:
+
+    X-DB-Queries: 14
+    Server-Timing: db;dur=12.4;desc="14 queries"
+
+Statements are reduced to a "shape" (literals and bind lists collapsed). A
+shape repeated QUERY_N1_THRESHOLD times or more in one request is reported as
+a likely N+1 (X-DB-N1-Suspects header plus a console warning).
+
+Routes can declare a query budget:
+
+    @router.get("/tables")
+    @query_budget(4)
+    async def get_tables(...):
+
+Going over budget prints a warning. With QUERY_BUDGET_STRICT=true the count
+is also checked as soon as the endpoint returns, and the request fails with a
+500 (QueryBudgetExceeded) before any response is sent, so tests and benchmark
+runs see the failure. Statements run after that - lazy loads while the
+response is serialized - are only reported by the middleware.
+``count_queries()`` gives the same numbers around an arbitrary block of code
+(scripts, shells).
+"""
+import functools
+import inspect
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.loop_monitor import route_label
+
+_current_stats: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+_NUMBER = re.compile(r"\b\d+(\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PARAM_LIST = re.compile(r"\((\s*(\?|%\(\w+\)s|\$\d+|:\w+|%s)\s*,?)+\)")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a SQL statement so repeats differing only by values compare equal"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _PARAM_LIST.sub("(...)", shape)
+    return shape
+
+
+class QueryBudgetExceeded(HTTPException):
+    """Raised in strict mode when a route runs more queries than it declared (500)"""
+
+    def __init__(self, message: str):
+        super().__init__(status_code=500, detail=f"Query budget exceeded: {message}")
+
+
+class QueryStats:
+    """Statement count and DB time collected for one request / block"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration_ms = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement: str, duration_ms: float):
+        self.count += 1
+        self.duration_ms += duration_ms
+        self.shapes[statement_shape(statement)] += 1
+
+    def n_plus_one_suspects(self, threshold: int = None) -> list:
+        """Statement shapes repeated at least `threshold` times"""
+        threshold = threshold or settings.QUERY_N1_THRESHOLD
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def to_dict(self) -> dict:
+        return {
+            "queries": self.count,
+            "db_time_ms": round(self.duration_ms, 2),
+            "n_plus_one_suspects": [
+                {"statement": shape, "count": count} for shape, count in self.n_plus_one_suspects()
+            ],
+        }
+
+
+# ============ SQLAlchemy instrumentation ============
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start_time")
+    if not starts:
+        return
+    stats.record(statement, (time.perf_counter() - starts.pop()) * 1000)
+
+
+def install_query_counter():
+    """Register the cursor listeners on every Engine (sync and async)"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def count_queries():
+    """
+    Count queries executed inside the block.
+
+    Usage:
+        with count_queries() as stats:
+            db.query(Order).all()
+        assert stats.count <= 2
+    """
+    install_query_counter()
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+# ============ Query budgets ============
+def _enforce_budget(endpoint):
+    """Strict mode: fail the request if it is over the endpoint's budget so far"""
+    stats = _current_stats.get()
+    budget = endpoint.__query_budget__
+    if settings.QUERY_BUDGET_STRICT and stats is not None and stats.count > budget:
+        message = f"{endpoint.__name__} ran {stats.count} queries (budget {budget})"
+        raise QueryBudgetExceeded(message)
+
+
+def query_budget(max_queries: int):
+    """Declare the maximum number of SQL statements a route may execute"""
+    def decorator(endpoint):
+        if inspect.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def checked(*args, **kwargs):
+                result = await endpoint(*args, **kwargs)
+                _enforce_budget(checked)
+                return result
+        else:
+            @functools.wraps(endpoint)
+            def checked(*args, **kwargs):
+                result = endpoint(*args, **kwargs)
+                _enforce_budget(checked)
+                return result
+        checked.__query_budget__ = max_queries
+        return checked
+    return decorator
+
+
+class QueryCounterMiddleware:
+    """Pure ASGI middleware that scopes a QueryStats to each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.duration_ms:.1f};desc="{stats.count} queries"'.encode(),
+                ))
+                suspects = stats.n_plus_one_suspects()
+                if suspects:
+                    headers.append((b"x-db-n1-suspects", str(len(suspects)).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current_stats.reset(token)
+
+        self._report(scope, stats)
+
+    def _report(self, scope: dict, stats: QueryStats):
+        label = route_label(scope)
+
+        for shape, count in stats.n_plus_one_suspects():
+            print(f"⚠ Possible N+1 in {label}: {count}x {shape[:200]}")
+
+        budget = getattr(scope.get("endpoint"), "__query_budget__", None)
+        if budget is not None and stats.count > budget:
+            # The response is already sent: strict mode failed the request earlier
+            # (see query_budget) unless the extra queries ran during serialization
+            print(f"⚠ Query budget exceeded: {label} ran {stats.count} queries (budget {budget})")
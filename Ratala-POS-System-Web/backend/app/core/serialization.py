@@ -0,0 +1,131 @@
+"""
+Fast JSON serialization for large responses
+
+A route with a response_model validates every ORM row into the Pydantic
+model (from_attributes) before FastAPI dumps it, and a route returning
+hand-built dicts goes through jsonable_encoder, which walks the payload in
+Python. Both are fine for one order and dominate the request for a few
+thousand. Heavy routes therefore build their Response themselves:
+
+- ORJSONResponse dumps plain data (dicts, lists, datetimes, Decimals) with
+  orjson, or with the json module when orjson is not installed
+- ResponseSerializer(List[OrderResponse]) compiles a TypeAdapter once per
+  schema; .response(orders) validates and dumps in one pass. With
+  RESPONSE_TRUST_ORM it skips validation: the rows are read attribute by
+  attribute, in the schema's field order, straight into plain data and
+  dumped with orjson. The response schemas have no validators, so the only
+  coercion needed is int -> float for float fields.
+
+Routes keep their response_model for the OpenAPI schema; returning a Response
+bypasses it.
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import partial
+from types import UnionType
+from typing import Any, Callable, List, Optional, Union, get_args, get_origin
+
+import pydantic_core
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the json module
+    orjson = None
+
+
+def _default(value):
+    """Types orjson does not encode natively"""
+    if isinstance(value, Decimal):
+        return float(value)
+    return pydantic_core.to_jsonable_python(value)
+
+
+def dumps(content: Any) -> bytes:
+    """JSON bytes of plain data, datetimes as Pydantic writes them"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse without jsonable_encoder: return it from routes that build dicts"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# Converter of trusted data for one annotation; None means "use the value as is"
+Converter = Optional[Callable[[Any], Any]]
+
+
+def _optional(convert: Callable) -> Callable:
+    return lambda value: None if value is None else convert(value)
+
+
+def _compile(annotation) -> Converter:
+    if annotation is float:
+        return float
+    if annotation in (int, str, bool, datetime, date, time, Any, dict):
+        return None
+
+    origin = get_origin(annotation)
+    if origin in (Union, UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) != 1:
+            return None
+        inner = _compile(args[0])
+        return inner and _optional(inner)
+    if origin in (list, List):
+        args = get_args(annotation)
+        inner = _compile(args[0]) if args else None
+        if inner is None:
+            return list
+        return lambda values: [inner(value) for value in values]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _compile_model(annotation)
+    return None
+
+
+def _compile_model(model: type) -> Callable:
+    fields = []
+    for name, field in model.model_fields.items():
+        default = None if field.is_required() else field.get_default(call_default_factory=True)
+        convert = _compile(field.annotation)
+        fields.append((name, field.serialization_alias or field.alias or name, default, convert))
+
+    def convert(obj):
+        if isinstance(obj, dict):
+            read = obj.get
+        elif isinstance(obj, BaseModel):
+            obj = obj.__dict__
+            read = obj.get
+        else:
+            read = partial(getattr, obj)
+        data = {}
+        for name, key, default, field_convert in fields:
+            value = read(name, default)
+            data[key] = value if field_convert is None or value is None else field_convert(value)
+        return data
+
+    return convert
+
+
+class ResponseSerializer:
+    """ORM objects -> JSON Response for one response type, compiled once"""
+
+    def __init__(self, response_type):
+        self.adapter = TypeAdapter(response_type)
+        self._trusted = _compile(response_type) or (lambda data: data)
+
+    def dump_json(self, data: Any, trusted: Optional[bool] = None) -> bytes:
+        if settings.RESPONSE_TRUST_ORM if trusted is None else trusted:
+            return dumps(self._trusted(data))
+        return self.adapter.dump_json(self.adapter.validate_python(data, from_attributes=True))
+
+    def response(self, data: Any, headers: Optional[dict] = None) -> Response:
+        return Response(self.dump_json(data), media_type="application/json", headers=headers)
@@ -1,154 +1,15 @@
 """
 Database configuration and session management
-"""
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.exc import OperationalError
-import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-from urllib.parse import urlparse
-from app.config import settings
-
-# Base class for models
-Base = declarative_base()
-
-# Global engine variable
-engine = None
-SessionLocal = None
-
-
-def create_database_if_not_exists():
-    """Create the database if it doesn't exist (PostgreSQL only)"""
-    db_url = settings.DATABASE_URL
-    
-    if 'postgresql://' in db_url or 'postgres://' in db_url:
-        try:
-            # Parse the database URL
-            parsed = urlparse(db_url)
-            db_name = parsed.path[1:] if parsed.path.startswith('/') else parsed.path  # Remove leading /
-            
-            # Get connection parameters
-            host = parsed.hostname or 'localhost'
-            port = parsed.port or 5432
-            user = parsed.username or 'postgres'
-            password = parsed.password or ''
-            
-            # Connect to PostgreSQL server (to default 'postgres' database)
-            conn = psycopg2.connect(
-                host=host,
-                port=port,
-                user=user,
-                password=password,
-                database='postgres'  # Connect to default postgres database
-            )
-            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-            cursor = conn.cursor()
-            
-            # Check if database exists
-            cursor.execute(
-                "SELECT 1 FROM pg_catalog.pg_database WHERE datname = %s",
-                (db_name,)
-            )
-            exists = cursor.fetchone()
-            
-            if not exists:
-                # Create database
-                cursor.execute(f'CREATE DATABASE "{db_name}"')
-                print(f"✅ Database '{db_name}' created successfully")
-            else:
-                print(f"✅ Database '{db_name}' already exists")
-            
-            cursor.close()
-            conn.close()
-            return True
-        except psycopg2.OperationalError as e:
-            print(f"⚠️  Could not connect to PostgreSQL: {e}")
-            print(f"   Please ensure PostgreSQL is running and credentials are correct")
-            return False
-        except Exception as e:
-            print(f"⚠️  Could not create database automatically: {e}")
-            print(f"   Please create the database manually:")
-            print(f"   psql -U {user}")
-            print(f"   CREATE DATABASE {db_name};")
-            return False
-    return True
-
 
-def init_db():
-    """Initialize database - create database if needed, then create all tables"""
-    global engine, SessionLocal
-    
-    # Import all models to ensure they're registered with Base
-    from app.models import (
-        User, Customer, Category, MenuGroup, MenuItem,
-        UnitOfMeasurement, Product, InventoryTransaction,
-        Supplier, PurchaseBill, PurchaseReturn,
-        Table, Session, Order, OrderItem, KOT,
-        DeliveryPartner, BillOfMaterials, BOMItem, BatchProduction,
-        POSSession
-    )
-    
-    # Create database if it doesn't exist (PostgreSQL only)
-    if 'postgresql' in settings.DATABASE_URL or 'postgres' in settings.DATABASE_URL:
-        if not create_database_if_not_exists():
-            raise Exception("Database creation failed. Please create it manually.")
-    
-    # Create database engine with optimized settings
-    engine = create_engine(
-        settings.DATABASE_URL,
-        pool_pre_ping=True,  # Verify connections before using
-        pool_size=5,  # Reduced pool size for better performance
-        max_overflow=10,  # Reduced overflow
-        pool_recycle=3600,  # Recycle connections after 1 hour
-        pool_timeout=30,  # Timeout for getting connection from pool
-        connect_args={
-            "connect_timeout": 10,  # Connection timeout in seconds
-            "options": "-c statement_timeout=30000"  # Query timeout 30 seconds
-        }
-    )
-    
-    # Create session factory
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    
-    # Create all tables
-    try:
-        Base.metadata.create_all(bind=engine)
-        print("✅ Database tables initialized")
-    except OperationalError as e:
-        print(f"❌ Error creating tables: {e}")
-        raise
-
-
-def get_engine():
-    """Get the database engine"""
-    global engine
-    if engine is None:
-        engine = create_engine(
-            settings.DATABASE_URL,
-            pool_pre_ping=True,
-            pool_size=5,
-            max_overflow=10,
-            pool_recycle=3600,
-            pool_timeout=30,
-            connect_args={
-                "connect_timeout": 10,
-                "options": "-c statement_timeout=30000"
-            }
-        )
-    return engine
-
-
-def get_db():
-    """
-    Database dependency for FastAPI routes
-    Yields a database session and closes it after use
-    """
-    global SessionLocal
-    if SessionLocal is None:
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
-    
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+Kept for old imports only: the engine, pool configuration and sessions live in
+app.db.database, so every import path shares a single connection pool.
+"""
+from app.db.database import (
+    Base,
+    create_database_if_not_exists,
+    init_db,
+    get_engine,
+    get_db,
+    get_async_engine,
+    get_async_db,
+)
@@ -1,13 +1,24 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine
+from datetime import datetime, timedelta, timezone
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from urllib.parse import urlparse
+from uuid import uuid4
 from app.core.config import settings
+from app.db.pool_metrics import InstrumentedQueuePool, InstrumentedAsyncQueuePool
+from app.db.replica import wrote_recently, replica_health
+from app.db.schema_fingerprint import (
+    compute_schema_fingerprint, read_schema_fingerprint,
+    write_schema_fingerprint, schema_migration_lock
+)
 
 # Base class for models
 Base = declarative_base()
@@ -16,6 +27,14 @@ Base = declarative_base()
 engine = None
 SessionLocal = None
 
+# Read replica used by reports / exports (optional, see get_read_db)
+replica_engine = None
+ReplicaSessionLocal = None
+
+# Async engine used by routes that have been ported to AsyncSession
+async_engine = None
+AsyncSessionLocal = None
+
 
 def create_database_if_not_exists():
     """Create the database if it doesn't exist (PostgreSQL only)"""
@@ -74,8 +93,92 @@ def create_database_if_not_exists():
     return True
 
 
+# Columns added after tables were first created in production.
+# Changing this list changes the schema fingerprint, so workers re-run the DDL.
+SCHEMA_PATCHES = [
+    ("users", "profile_image_url", "VARCHAR"),
+    ("users", "profile_image_data", "BYTEA"),
+    ("users", "created_at", "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"),
+    ("categories", "image_data", "BYTEA"),
+    ("menu_groups", "image_data", "BYTEA"),
+    ("menu_items", "image_data", "BYTEA"),
+    ("company_settings", "logo_url", "VARCHAR"),
+    ("company_settings", "logo_data", "BYTEA"),
+    ("payment_modes", "branch_id", "INTEGER"),
+    ("storage_areas", "branch_id", "INTEGER"),
+    ("discount_rules", "branch_id", "INTEGER"),
+    ("tables", "merged_to_id", "INTEGER"),
+    ("tables", "merge_group_id", "VARCHAR"),
+    ("branches", "tax_rate", "FLOAT"),
+    ("branches", "service_charge_rate", "FLOAT"),
+    ("branches", "discount_rate", "FLOAT"),
+    ("branches", "slug", "VARCHAR"),
+    ("roles", "branch_id", "INTEGER"),
+    # New columns for KOT/Order branch isolation and other missing branch_ids
+    ("kots", "branch_id", "INTEGER"),
+    ("orders", "branch_id", "INTEGER"),
+    ("tables", "branch_id", "INTEGER"),
+    ("floors", "branch_id", "INTEGER"),
+    ("sessions", "branch_id", "INTEGER"),
+    ("products", "branch_id", "INTEGER"),
+    ("inventory_transactions", "branch_id", "INTEGER"),
+    ("bills_of_materials", "branch_id", "INTEGER"),
+    ("batch_productions", "branch_id", "INTEGER"),
+    ("units_of_measurement", "branch_id", "INTEGER"),
+    ("categories", "branch_id", "INTEGER"),
+    ("menu_groups", "branch_id", "INTEGER"),
+    ("menu_items", "branch_id", "INTEGER"),
+    ("printers", "branch_id", "INTEGER"),
+    ("qr_codes", "branch_id", "INTEGER"),
+    ("pos_sessions", "branch_id", "INTEGER"),
+    # Add finished_product_id if missing
+    ("bills_of_materials", "finished_product_id", "INTEGER"),
+    ("batch_productions", "finished_product_id", "INTEGER"),
+    # Change versions for GET /pos/sync?since=
+    ("categories", "sync_version", "BIGINT NOT NULL DEFAULT 0"),
+    ("menu_groups", "sync_version", "BIGINT NOT NULL DEFAULT 0"),
+    ("menu_items", "sync_version", "BIGINT NOT NULL DEFAULT 0"),
+    ("floors", "sync_version", "BIGINT NOT NULL DEFAULT 0")
+]
+
+# Document numbers unique per branch instead of globally: (table, number column,
+# per-branch constraint). Databases created before keep the column's own UNIQUE
+# constraint until it is swapped for the per-branch one (PostgreSQL)
+UNIQUE_PER_BRANCH_PATCHES = [
+    ("kots", "kot_number", "uq_kot_number_branch"),
+    ("batch_productions", "production_number", "uq_production_number_branch"),
+]
+
+
+def patch_unique_per_branch(conn, table: str, column: str, constraint: str):
+    """Replace single-column UNIQUE constraints on column by constraint (branch_id, column)"""
+    from sqlalchemy import text
+    from app.db.partitioning import is_partitioned
+    if is_partitioned(conn, table):
+        return  # enforced by its lookup table, see app.db.partitioning
+    names = conn.execute(text("""
+        SELECT con.conname FROM pg_constraint con
+        JOIN pg_attribute att ON att.attrelid = con.conrelid AND att.attnum = con.conkey[1]
+        WHERE con.conrelid = CAST(:table AS regclass) AND con.contype = 'u'
+          AND cardinality(con.conkey) = 1 AND att.attname = :column
+    """), {"table": table, "column": column}).scalars().all()
+    exists = conn.execute(text(
+        "SELECT 1 FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND conname = :name"
+    ), {"table": table, "name": constraint}).first() is not None
+
+    actions = [f'DROP CONSTRAINT "{name}"' for name in names]
+    if not exists:
+        actions.append(f"ADD CONSTRAINT {constraint} UNIQUE (branch_id, {column})")
+    if actions:
+        # One statement: the old constraint never goes without the new one
+        conn.execute(text(f"ALTER TABLE {table} {', '.join(actions)}"))
+
+
 def init_db():
-    """Initialize database - create database if needed, then create all tables"""
+    """
+    Initialize database - skip all DDL when the schema fingerprint is current,
+    otherwise create the database if needed, create tables and apply patches.
+    """
     global engine, SessionLocal
     
     # Import all models to ensure they're registered with Base
@@ -85,22 +188,45 @@ def init_db():
         Supplier, PurchaseBill, PurchaseReturn, PurchaseBillItem,
         Table, Session, Order, OrderItem, KOT,
         DeliveryPartner, BillOfMaterials, BOMItem, BatchProduction,
-        POSSession, Printer, QRCode, Organization, Branch, Floor, StorageArea, DiscountRule, PaymentMode
+        POSSession, Printer, QRCode, Organization, Branch, Floor, StorageArea, DiscountRule, PaymentMode,
+        SchemaFingerprint
+    )
+    
+    engine = get_engine()
+    
+    # Create session factory
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    fingerprint_table = SchemaFingerprint.__table__
+    fingerprint = compute_schema_fingerprint(
+        Base.metadata, engine.dialect, SCHEMA_PATCHES + UNIQUE_PER_BRANCH_PATCHES
     )
+    current = read_schema_fingerprint(engine, fingerprint_table)
+    if current == fingerprint:
+        print(f"✓ Schema up to date ({fingerprint[:12]})")
+        return
     
     # Skip automatic DB creation in production (Neon/Render environment)
     is_prod = settings.ENVIRONMENT == "production"
     
     # Create database if it doesn't exist (PostgreSQL only) - skip in production
-    if not is_prod and ('postgresql' in settings.DATABASE_URL or 'postgres' in settings.DATABASE_URL):
+    if current is None and not is_prod and engine.dialect.name == "postgresql":
         if not create_database_if_not_exists():
             print("Warning: Database creation failed or skipped.")
     
-    engine = get_engine()
-    
-    # Create session factory
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    
+    # Only one worker migrates; the others wait and then see the new fingerprint
+    with schema_migration_lock(engine):
+        if read_schema_fingerprint(engine, fingerprint_table) == fingerprint:
+            print(f"✓ Schema migrated by another worker ({fingerprint[:12]})")
+            return
+        
+        if apply_schema(engine):
+            write_schema_fingerprint(engine, fingerprint_table, fingerprint)
+            print(f"✓ Schema fingerprint recorded ({fingerprint[:12]})")
+
+
+def apply_schema(engine) -> bool:
+    """Create all tables, add missing columns and backfill branch slugs"""
     # Create all tables
     try:
         Base.metadata.create_all(bind=engine)
@@ -108,60 +234,33 @@ def init_db():
 
         # Manually fix schema for production
         from sqlalchemy import text
+        all_applied = True
         try:
             with engine.connect() as conn:
                 conn = conn.execution_options(isolation_level="AUTOCOMMIT")
-                print("Checking schema for missing columns...")
-                
-                updates = [
-                    ("users", "profile_image_url", "VARCHAR"),
-                    ("users", "profile_image_data", "BYTEA"),
-                    ("users", "created_at", "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"),
-                    ("categories", "image_data", "BYTEA"),
-                    ("menu_groups", "image_data", "BYTEA"),
-                    ("menu_items", "image_data", "BYTEA"),
-                    ("company_settings", "logo_url", "VARCHAR"),
-                    ("company_settings", "logo_data", "BYTEA"),
-                    ("payment_modes", "branch_id", "INTEGER"),
-                    ("storage_areas", "branch_id", "INTEGER"),
-                    ("discount_rules", "branch_id", "INTEGER"),
-                    ("tables", "merged_to_id", "INTEGER"),
-                    ("tables", "merge_group_id", "VARCHAR"),
-                    ("branches", "tax_rate", "FLOAT"),
-                    ("branches", "service_charge_rate", "FLOAT"),
-                    ("branches", "discount_rate", "FLOAT"),
-                    ("branches", "slug", "VARCHAR"),
-                    ("roles", "branch_id", "INTEGER"),
-                    # New columns for KOT/Order branch isolation and other missing branch_ids
-                    ("kots", "branch_id", "INTEGER"),
-                    ("orders", "branch_id", "INTEGER"),
-                    ("tables", "branch_id", "INTEGER"),
-                    ("floors", "branch_id", "INTEGER"),
-                    ("sessions", "branch_id", "INTEGER"),
-                    ("products", "branch_id", "INTEGER"),
-                    ("inventory_transactions", "branch_id", "INTEGER"),
-                    ("bills_of_materials", "branch_id", "INTEGER"),
-                    ("batch_productions", "branch_id", "INTEGER"),
-                    ("units_of_measurement", "branch_id", "INTEGER"),
-                    ("categories", "branch_id", "INTEGER"),
-                    ("menu_groups", "branch_id", "INTEGER"),
-                    ("menu_items", "branch_id", "INTEGER"),
-                    ("printers", "branch_id", "INTEGER"),
-                    ("qr_codes", "branch_id", "INTEGER"),
-                    ("pos_sessions", "branch_id", "INTEGER"),
-                    # Add finished_product_id if missing
-                    ("bills_of_materials", "finished_product_id", "INTEGER"),
-                    ("batch_productions", "finished_product_id", "INTEGER")
-                ]
-                
-                for table, col, dtype in updates:
-                    try:
-                        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col} {dtype}"))
-                        print(f"  ✓ {table}.{col} verified")
-                    except Exception as e:
-                        print(f"  ⚠ Error checking {table}.{col}: {e}")
-                
-                print("✓ Schema verified")
+
+                # create_all builds new tables complete; the patches only matter for
+                # databases created before a column existed (PostgreSQL in production)
+                if engine.dialect.name == "postgresql":
+                    print("Checking schema for missing columns...")
+                    
+                    for table, col, dtype in SCHEMA_PATCHES:
+                        try:
+                            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col} {dtype}"))
+                            print(f"  ✓ {table}.{col} verified")
+                        except Exception as e:
+                            all_applied = False
+                            print(f"  ⚠ Error checking {table}.{col}: {e}")
+                    
+                    for table, column, constraint in UNIQUE_PER_BRANCH_PATCHES:
+                        try:
+                            patch_unique_per_branch(conn, table, column, constraint)
+                            print(f"  ✓ {table}.{constraint} verified")
+                        except Exception as e:
+                            all_applied = False
+                            print(f"  ⚠ Error checking {table}.{constraint}: {e}")
+                    
+                    print("✓ Schema verified")
                 
                 # Migrations: Populate missing slugs for branches
                 from app.services.branch_service import slugify
@@ -174,38 +273,76 @@ def init_db():
                     print(f"  → Populated slug '{new_slug}' for branch ID {row[0]}")
         except Exception as e:
             print(f"⚠ Schema check failed: {e}")
+            return False
+        return all_applied
 
     except OperationalError as e:
         print(f"Error creating tables: {e}")
         raise
 
 
+def _is_remote_database(db_url: str = None) -> bool:
+    db_url = db_url or settings.DATABASE_URL
+    return "localhost" not in db_url and "127.0.0.1" not in db_url
+
+
+def get_pool_kwargs(poolclass) -> dict:
+    """
+    Pool settings shared by the sync and async engines (per worker process).
+    In PgBouncer mode the pre-ping round-trip is skipped: PgBouncer already
+    hands out healthy server connections.
+    """
+    return {
+        "poolclass": poolclass,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING and not settings.DB_PGBOUNCER,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def get_connect_args(db_url: str) -> dict:
+    """psycopg2 connect args for a database URL (empty for non-Postgres backends)"""
+    connect_args = {}
+
+    if make_url(db_url).get_backend_name() == "postgresql":
+        connect_args = {"connect_timeout": settings.DB_CONNECT_TIMEOUT}
+
+        # PgBouncer (transaction pooling) rejects startup options like statement_timeout
+        if not settings.DB_PGBOUNCER:
+            connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+
+        # Add SSL if not localhost (usually for Neon/Render in production)
+        if _is_remote_database(db_url):
+            connect_args["sslmode"] = "require"
+    return connect_args
+
+
 def get_engine():
     """Get the database engine"""
     global engine
     if engine is None:
-        # Check if we need SSL (usually for Neon/Render in production)
-        connect_args = {
-            "connect_timeout": 10,
-            "options": "-c statement_timeout=30000"
-        }
-        
-        # Add SSL if not localhost
-        if "localhost" not in settings.DATABASE_URL and "127.0.0.1" not in settings.DATABASE_URL:
-            connect_args["sslmode"] = "require"
-
         engine = create_engine(
             settings.DATABASE_URL,
-            pool_pre_ping=True,
-            pool_size=5,
-            max_overflow=10,
-            pool_recycle=3600,
-            pool_timeout=30,
-            connect_args=connect_args
+            connect_args=get_connect_args(settings.DATABASE_URL),
+            **get_pool_kwargs(InstrumentedQueuePool)
         )
     return engine
 
 
+def get_replica_engine():
+    """Get the read replica engine, or None when DATABASE_REPLICA_URL is not set"""
+    global replica_engine
+    if replica_engine is None and settings.DATABASE_REPLICA_URL:
+        replica_engine = create_engine(
+            settings.DATABASE_REPLICA_URL,
+            connect_args=get_connect_args(settings.DATABASE_REPLICA_URL),
+            **get_pool_kwargs(InstrumentedQueuePool)
+        )
+    return replica_engine
+
+
 def get_db():
     """
     Database dependency for FastAPI routes
@@ -220,3 +357,146 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db(request: Request):
+    """
+    Database dependency for read-only routes (reports, exports).
+    Reads from the replica when one is configured and healthy, except for
+    callers who wrote recently - they read from the primary so they see
+    their own changes. Never commit on this session.
+    """
+    global SessionLocal, ReplicaSessionLocal
+    replica = get_replica_engine()
+
+    if replica is not None and not wrote_recently(request) and replica_health.is_usable(replica):
+        if ReplicaSessionLocal is None:
+            ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica)
+        db = ReplicaSessionLocal()
+    else:
+        if SessionLocal is None:
+            SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+        db = SessionLocal()
+
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_async_database_url():
+    """
+    Translate DATABASE_URL to the equivalent async driver URL.
+    postgresql:// -> postgresql+asyncpg://, sqlite:// -> sqlite+aiosqlite://
+    """
+    url = make_url(settings.DATABASE_URL)
+    backend = url.get_backend_name()
+
+    if backend == "postgresql":
+        # asyncpg does not understand libpq-only query params (sslmode, channel_binding)
+        url = url.set(drivername="postgresql+asyncpg").difference_update_query(
+            ["sslmode", "channel_binding"]
+        )
+    elif backend == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url
+
+
+PG_EPOCH = datetime(2000, 1, 1)
+
+
+def _encode_timestamp(value: datetime) -> tuple:
+    """
+    timestamp (without time zone) parameter for asyncpg, as microseconds since
+    2000-01-01. Aware values are stored as UTC wall time; psycopg2 sends them
+    with their offset, which PostgreSQL drops, while asyncpg rejects them.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return ((value - PG_EPOCH) // timedelta(microseconds=1),)
+
+
+def _decode_timestamp(value: tuple) -> datetime:
+    return PG_EPOCH + timedelta(microseconds=value[0])
+
+
+def _register_asyncpg_codecs(dbapi_connection, connection_record):
+    dbapi_connection.run_async(
+        lambda connection: connection.set_type_codec(
+            "timestamp", schema="pg_catalog", format="tuple",
+            encoder=_encode_timestamp, decoder=_decode_timestamp
+        )
+    )
+
+
+def get_async_engine():
+    """Get the async database engine"""
+    global async_engine
+    if async_engine is None:
+        url = get_async_database_url()
+        connect_args = {}
+
+        if url.get_backend_name() == "postgresql":
+            connect_args = {"timeout": settings.DB_CONNECT_TIMEOUT}
+
+            if settings.DB_PGBOUNCER:
+                # Transaction pooling: a prepared statement may not exist on the
+                # next server connection, so disable both statement caches and
+                # give any remaining prepared statements unique names
+                url = url.update_query_dict({"prepared_statement_cache_size": "0"})
+                connect_args["statement_cache_size"] = 0
+                connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+            else:
+                connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+
+            # Add SSL if not localhost
+            if _is_remote_database():
+                connect_args["ssl"] = "require"
+
+        async_engine = create_async_engine(
+            url,
+            connect_args=connect_args,
+            **get_pool_kwargs(InstrumentedAsyncQueuePool)
+        )
+        if url.get_backend_name() == "postgresql":
+            # The model defaults are timezone-aware UTC (see _encode_timestamp)
+            event.listen(async_engine.sync_engine, "connect", _register_asyncpg_codecs)
+    return async_engine
+
+
+def get_pool_status() -> dict:
+    """Pool metrics for both engines plus the connection budget of all workers"""
+    pools = {}
+    for name, eng in (("sync", engine), ("async", async_engine), ("replica", replica_engine)):
+        if eng is not None and hasattr(eng.pool, "stats"):
+            pools[name] = eng.pool.stats()
+
+    per_engine = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    # Replica connections count against the replica, not the primary
+    per_worker = per_engine * len([name for name in pools if name != "replica"])
+    return {
+        "pgbouncer": settings.DB_PGBOUNCER,
+        "workers": settings.WEB_CONCURRENCY,
+        "max_connections_per_worker": per_worker,
+        "max_connections_all_workers": per_worker * settings.WEB_CONCURRENCY,
+        "pools": pools,
+        "replica": replica_health.to_dict() if replica_engine is not None else None,
+    }
+
+
+async def get_async_db():
+    """
+    Async database dependency for FastAPI routes.
+    Objects are not expired on commit so they can be serialized without lazy loads.
+    """
+    global AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        AsyncSessionLocal = async_sessionmaker(
+            bind=get_async_engine(),
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False
+        )
+
+    async with AsyncSessionLocal() as db:
+        yield db
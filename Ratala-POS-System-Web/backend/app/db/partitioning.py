@@ -0,0 +1,371 @@
+"""
+Monthly partitions of orders and their lines (PostgreSQL)
+
+orders, order_items, kots and kot_items only ever grow, and every branch
+query paid for their total size. On PostgreSQL they are declaratively
+partitioned:
+
+    orders       RANGE (created_at)  orders_p2026_01, ... one per month, plus orders_default
+    order_items  RANGE (id)          order_items_p2026_01, ... per archived month, plus order_items_hot
+    kots         RANGE (id)          kots_p2026_01, ..., kots_hot
+    kot_items    RANGE (id)          kot_items_p2026_01, ..., kot_items_hot
+
+Lines follow their order through their own ids, which grow with time and are
+never NULL (standalone KOTs have no order). The lines of every month that is
+not archived yet are in the _hot partitions, and archive_month splits a
+closed month off them, up to the first line of any later order or created
+in a later month (kot_items: of any such KOT). Cold line partitions
+therefore only hold lines of archived orders, and live writes never reach
+them; a line whose id is past the bound (ingested late with an older
+created_at, or imported out of order) stays hot. Every partition stays
+attached, so placement only changes where a row is stored, never which rows
+a query sees: reports and the day-book read hot and cold months alike, and
+their created_at filters prune orders to the months they cover.
+
+Archiving a month (archive_orders.py) moves its partitions to
+ORDER_ARCHIVE_TABLESPACE and/or ORDER_ARCHIVE_ACCESS_METHOD (e.g. a columnar,
+compressed access method) and freezes them. Archived partitions are marked
+with the table comment "archived".
+
+PostgreSQL cannot enforce a unique constraint that leaves out the partition
+key, nor a foreign key to a partitioned table whose partitions get detached.
+Once partitioned, the primary key of orders is (id, created_at), and the
+foreign keys between these four tables and from order_idempotency_keys to
+orders are dropped; the ORM cascades already delete an order's lines with
+it. Foreign keys to other tables stay. The order and KOT numbers stay unique:
+each such constraint moves to a plain lookup table of the claimed values
+(orders_order_number_unique, kots_branch_id_kot_number_unique) under the
+constraint's name, kept by statement triggers on the partitioned table, so a
+duplicate number still fails with an IntegrityError. Rows moved between
+partitions by the maintenance below bypass those triggers and keep their
+claims.
+"""
+import re
+from datetime import date, datetime
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.schema import AddConstraint, CreateIndex, ForeignKeyConstraint, UniqueConstraint
+
+from app.models.orders import ACTIVE_ORDER_STATUSES, KOT, KOTItem, Order, OrderIdempotencyKey, OrderItem
+
+# Table -> (partition key, (column, parent table) whose ids bound its partitions)
+PARTITIONED_TABLES = {
+    "orders": ("created_at", None),
+    "order_items": ("id", ("order_id", "orders")),
+    "kots": ("id", ("order_id", "orders")),
+    "kot_items": ("id", ("kot_id", "kots")),
+}
+MODELS = {"orders": Order, "order_items": OrderItem, "kots": KOT, "kot_items": KOTItem}
+ARCHIVED = "archived"
+
+_BOUND = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+
+
+class MonthPartition(NamedTuple):
+    month: date
+    name: str
+    archived: bool
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def is_partitioned(conn, table: str = "orders") -> bool:
+    return conn.execute(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"
+    ), {"table": table}).scalar() or False
+
+
+def _partitions(conn, table: str) -> dict:
+    """Partition name -> (bound expression, table comment)"""
+    return {
+        name: (bound, comment)
+        for name, bound, comment in conn.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), obj_description(c.oid, 'pg_class') "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ), {"table": table}).all()
+    }
+
+
+def month_partitions(conn) -> List[MonthPartition]:
+    """Monthly partitions of orders, oldest first"""
+    months = []
+    for name, (_, comment) in _partitions(conn, "orders").items():
+        match = re.fullmatch(r"orders_p(\d{4})_(\d{2})", name)
+        if match:
+            months.append(MonthPartition(date(int(match[1]), int(match[2]), 1), name, comment == ARCHIVED))
+    return sorted(months)
+
+
+# --- Converting the tables -------------------------------------------------
+
+def _table_constraints(conn, table: str, partitioned: bool):
+    """Primary key, unique constraints, indexes and outgoing foreign keys from the model"""
+    model_table = MODELS[table].__table__
+    key = PARTITIONED_TABLES[table][0]
+    extra = f", {key}" if partitioned and key != "id" else ""
+    conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id{extra})"))
+    for constraint in model_table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            columns = [column.name for column in constraint.columns]
+            name = constraint.name or f"{table}_{columns[0]}_key"
+            if partitioned and key not in columns:
+                _create_unique_lookup(conn, table, name, columns)
+            else:
+                conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE ({', '.join(columns)})"))
+        elif isinstance(constraint, ForeignKeyConstraint):
+            if partitioned and constraint.referred_table.name in PARTITIONED_TABLES:
+                continue
+            conn.execute(AddConstraint(constraint))
+    for index in model_table.indexes:
+        if index.unique and partitioned:
+            continue  # ix_<table>_id: the primary key leads with id
+        conn.execute(CreateIndex(index))
+
+
+def _unique_lookups(table: str):
+    """(lookup table, columns) for each unique constraint of a partitioned table without its key"""
+    key = PARTITIONED_TABLES[table][0]
+    for constraint in MODELS[table].__table__.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            columns = [column.name for column in constraint.columns]
+            if key not in columns:
+                yield f"{table}_{'_'.join(columns)}_unique", columns
+
+
+def _create_unique_lookup(conn, table: str, name: str, columns: List[str]):
+    """
+    Enforce UNIQUE (columns) of a partitioned table through a plain table of
+    the claimed values, with the constraint's name as its primary key
+    """
+    lookup = f"{table}_{'_'.join(columns)}_unique"
+    listed = ", ".join(columns)
+    present = " AND ".join(f"{{row}}.{column} IS NOT NULL" for column in columns)
+    same = " AND ".join(f"l.{column} = o.{column}" for column in columns)
+    changed = (
+        f"({', '.join(f'o.{column}' for column in columns)}) IS DISTINCT FROM "
+        f"({', '.join(f'n.{column}' for column in columns)})"
+    )
+    new_values = ", ".join(f"n.{column}" for column in columns)
+
+    # Rows with a NULL column never conflict, as in a unique constraint
+    conn.execute(text(
+        f"CREATE TABLE {lookup} AS SELECT {listed} FROM {table} WHERE {present.format(row=table)}"
+    ))
+    conn.execute(text(f"ALTER TABLE {lookup} ADD CONSTRAINT {name} PRIMARY KEY ({listed})"))
+    conn.execute(text(f"""
+        CREATE FUNCTION {lookup}_claim() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO {lookup} ({listed}) SELECT {listed} FROM new_rows n WHERE {present.format(row='n')};
+            ELSIF TG_OP = 'DELETE' THEN
+                DELETE FROM {lookup} l USING old_rows o WHERE {same};
+            ELSE
+                DELETE FROM {lookup} l USING old_rows o JOIN new_rows n ON n.id = o.id
+                    WHERE {changed} AND {same};
+                INSERT INTO {lookup} ({listed}) SELECT {new_values} FROM old_rows o JOIN new_rows n ON n.id = o.id
+                    WHERE {changed} AND {present.format(row='n')};
+            END IF;
+            RETURN NULL;
+        END $$
+    """))
+    # Transition tables need one trigger per event; statement triggers on the
+    # parent do not fire for rows moved partition to partition
+    for event, referencing in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+    ):
+        conn.execute(text(
+            f"CREATE TRIGGER {lookup}_{event.lower()} AFTER {event} ON {table} "
+            f"REFERENCING {referencing} FOR EACH STATEMENT EXECUTE FUNCTION {lookup}_claim()"
+        ))
+
+
+def _drop_unique_lookups(conn, table: str):
+    for lookup, _ in _unique_lookups(table):
+        conn.execute(text(f"DROP FUNCTION IF EXISTS {lookup}_claim() CASCADE"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {lookup}"))
+
+
+def _rebuild(conn, table: str, partition_clause: str, create_partitions):
+    """
+    Copy a table into a new one (partitioned or not) that takes its name,
+    sequence and constraints
+    """
+    staging = f"{table}_rebuild"
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}).scalar()
+    conn.execute(text(f"CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) {partition_clause}"))
+    create_partitions(staging)
+    conn.execute(text(f"INSERT INTO {staging} SELECT * FROM {table}"))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {staging}.id"))
+    conn.execute(text(f"DROP TABLE {table} CASCADE"))
+    conn.execute(text(f"ALTER TABLE {staging} RENAME TO {table}"))
+
+
+def partition_order_tables(conn, months_ahead: int = 3):
+    """Convert the four tables in place (one transaction; they are locked meanwhile)"""
+    if is_partitioned(conn):
+        return
+    # The partition key is part of the primary key, so it must be NOT NULL
+    conn.execute(text("UPDATE orders SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL"))
+
+    first = conn.execute(text("SELECT min(created_at) FROM orders")).scalar() or datetime.now()
+    last = add_months(month_start(datetime.now()), months_ahead)
+
+    def create_month_partitions(staging):
+        month = month_start(first)
+        while month <= last:
+            conn.execute(text(
+                f"CREATE TABLE {partition_name('orders', month)} PARTITION OF {staging} "
+                f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+            ))
+            month = add_months(month, 1)
+        conn.execute(text(f"CREATE TABLE orders_default PARTITION OF {staging} DEFAULT"))
+
+    def create_hot_partition(table):
+        def create(staging):
+            conn.execute(text(
+                f"CREATE TABLE {table}_hot PARTITION OF {staging} FOR VALUES FROM (MINVALUE) TO (MAXVALUE)"
+            ))
+        return create
+
+    for table, (key, _) in PARTITIONED_TABLES.items():
+        create = create_month_partitions if table == "orders" else create_hot_partition(table)
+        _rebuild(conn, table, f"PARTITION BY RANGE ({key})", create)
+        conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {key} SET NOT NULL"))
+    for table in PARTITIONED_TABLES:
+        _table_constraints(conn, table, partitioned=True)
+
+
+def unpartition_order_tables(conn):
+    """Turn the four tables back into plain tables with every model constraint"""
+    if not is_partitioned(conn):
+        return
+    for table, (key, _) in PARTITIONED_TABLES.items():
+        _drop_unique_lookups(conn, table)
+        _rebuild(conn, table, "", lambda staging: None)
+        if key != "id":
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {key} DROP NOT NULL"))
+    for table in PARTITIONED_TABLES:
+        _table_constraints(conn, table, partitioned=False)
+    for constraint in OrderIdempotencyKey.__table__.foreign_key_constraints:
+        if constraint.referred_table.name == "orders":
+            conn.execute(AddConstraint(constraint))
+
+
+# --- Maintenance -----------------------------------------------------------
+
+def ensure_month_partitions(conn, through: date) -> List[str]:
+    """Create the orders partitions up to the month of `through`; returns the new ones"""
+    existing = month_partitions(conn)
+    month = add_months(existing[-1].month, 1) if existing else month_start(through)
+    created = []
+    while month <= month_start(through):
+        name = partition_name("orders", month)
+        upper = add_months(month, 1)
+        # Rows that landed in the default partition must move before the range can attach
+        conn.execute(text(f"CREATE TABLE {name} (LIKE orders INCLUDING DEFAULTS)"))
+        conn.execute(text(
+            f"WITH moved AS (DELETE FROM orders_default WHERE created_at >= :lower AND created_at < :upper "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        ), {"lower": month, "upper": upper})
+        conn.execute(text(f"ALTER TABLE orders ATTACH PARTITION {name} FOR VALUES FROM ('{month}') TO ('{upper}')"))
+        created.append(name)
+        month = upper
+    return created
+
+
+def archive_candidates(conn, hot_months: int, today: Optional[date] = None) -> List[MonthPartition]:
+    """Months before the last hot_months that are not archived and have no open orders, oldest first"""
+    cutoff = add_months(month_start(today or date.today()), -hot_months)
+    statuses = ", ".join(f"'{status}'" for status in ACTIVE_ORDER_STATUSES)
+    candidates = []
+    for partition in month_partitions(conn):
+        if partition.month >= cutoff:
+            break
+        if partition.archived:
+            continue
+        if conn.execute(text(f"SELECT 1 FROM {partition.name} WHERE status IN ({statuses}) LIMIT 1")).first():
+            break  # later months stay hot too, so the line partitions stay in id order
+        candidates.append(partition)
+    return candidates
+
+
+def _hot_lower_bound(conn, table: str) -> str:
+    bound, _ = _partitions(conn, table)[f"{table}_hot"]
+    return _BOUND.search(bound).group(1)
+
+
+def _split_hot(conn, table: str, month: date, upper: int, storage: str) -> Optional[str]:
+    """Move the rows below `upper` out of <table>_hot into a partition of their own"""
+    key = PARTITIONED_TABLES[table][0]
+    lower = _hot_lower_bound(conn, table)
+    if lower != "MINVALUE" and int(lower) >= upper:
+        return None
+    name = partition_name(table, month)
+    hot = f"{table}_hot"
+    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {hot}"))
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS) {storage}"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {hot} WHERE {key} < :upper RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+    ), {"upper": upper})
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper})"))
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {hot} FOR VALUES FROM ({upper}) TO (MAXVALUE)"))
+    conn.execute(text(f"COMMENT ON TABLE {name} IS '{ARCHIVED}'"))
+    return name
+
+
+def archive_month(conn, partition: MonthPartition, tablespace: str = "", access_method: str = "") -> List[str]:
+    """
+    Split a closed month's lines off the hot partitions and move all of the
+    month's partitions to cold storage. Returns the archived partitions;
+    VACUUM (FREEZE) them after the transaction commits.
+    """
+    storage = " ".join(filter(None, [
+        f"USING {access_method}" if access_method else "",
+        f"TABLESPACE {tablespace}" if tablespace else "",
+    ]))
+    archived = [partition.name]
+    if access_method:
+        conn.execute(text(f"ALTER TABLE {partition.name} SET ACCESS METHOD {access_method}"))
+    if tablespace:
+        conn.execute(text(f"ALTER TABLE {partition.name} SET TABLESPACE {tablespace}"))
+    conn.execute(text(f"COMMENT ON TABLE {partition.name} IS '{ARCHIVED}'"))
+
+    # Lines move only when every line below the bound is of this month's orders or older
+    later = f"created_at >= '{add_months(partition.month, 1)}'"
+    bounds = {"orders": _id_bound(conn, "orders", later)}
+    for table in ("order_items", "kots", "kot_items"):
+        column, parent = PARTITIONED_TABLES[table][1]
+        if bounds[parent] is None:
+            return archived
+        bounds[table] = _id_bound(conn, table, f"{column} >= {bounds[parent]} OR {later}")
+        if bounds[table] is None:
+            return archived
+        name = _split_hot(conn, table, partition.month, bounds[table], storage)
+        if name:
+            archived.append(name)
+    return archived
+
+
+def _id_bound(conn, table: str, later: str) -> Optional[int]:
+    """Lowest id among the later rows of a table (one past the highest id if there are none)"""
+    bound = conn.execute(text(f"SELECT min(id) FROM {table} WHERE {later}")).scalar()
+    if bound is None:
+        highest = conn.execute(text(f"SELECT max(id) FROM {table}")).scalar()
+        bound = highest + 1 if highest is not None else None
+    return bound
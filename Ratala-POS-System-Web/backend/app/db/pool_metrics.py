@@ -0,0 +1,91 @@
+"""
+Connection pool metrics
+
+QueuePool subclasses that record how long each checkout waits for a
+connection, how often the pool is exhausted (the caller has to wait for a
+checkin), how often that wait times out, and the overflow high-water mark.
+
+Exposed by GET /api/v1/diagnostics/db-pool together with the number of
+connections the configured workers can open, so WEB_CONCURRENCY and
+DB_POOL_SIZE / DB_MAX_OVERFLOW can be checked against Postgres max_connections.
+"""
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from app.core.loop_monitor import LagHistogram
+
+
+class PoolMetrics:
+    """Checkout latency and saturation counters for one pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkout_latency = LagHistogram()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.max_overflow_seen = 0
+
+    def record_checkout(self, duration_ms: float, waited: bool, overflow: int):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_latency.observe(duration_ms)
+            if waited:
+                self.waits += 1
+            self.max_overflow_seen = max(self.max_overflow_seen, overflow)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+            self.waits += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "max_overflow_seen": self.max_overflow_seen,
+                "checkout_latency": self.checkout_latency.to_dict(),
+            }
+
+
+class PoolMetricsMixin:
+    """Times QueuePool._do_get; must come before the pool class in the MRO"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        # No idle connection and no overflow left: this checkout has to wait
+        waited = self.checkedin() == 0 and self._max_overflow > -1 and self.overflow() >= self._max_overflow
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_checkout((time.perf_counter() - started) * 1000, waited, max(self.overflow(), 0))
+        return conn
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            **self.metrics.to_dict(),
+        }
+
+
+class InstrumentedQueuePool(PoolMetricsMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(PoolMetricsMixin, AsyncAdaptedQueuePool):
+    pass
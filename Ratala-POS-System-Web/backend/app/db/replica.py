@@ -0,0 +1,200 @@
+"""
+Read replica routing helpers
+
+Reports and exports read from DATABASE_REPLICA_URL when it is set (see
+get_read_db in app.db.database). Two guards send a read back to the primary:
+
+- read-your-writes: a caller who changed data in the last
+  REPLICA_READ_AFTER_WRITE_SECONDS reads from the primary, so a bill that was
+  just settled shows up in their sales report. A request counts as a write
+  when it committed an INSERT / UPDATE / DELETE (engine events below); such
+  writes by an authenticated caller are remembered per token in this worker
+  and in a short-lived cookie for other workers.
+- replica health: if the replica is unreachable or lags by more than
+  REPLICA_MAX_LAG_SECONDS, every read falls back to the primary for a while.
+"""
+import hashlib
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+LAST_WRITE_COOKIE = "last_write_at"
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "MERGE")
+
+# {"pending": DML run since the last commit / rollback, "wrote": a commit included DML}
+_request_writes: ContextVar[Optional[dict]] = ContextVar("request_writes", default=None)
+
+
+def caller_key(authorization: Optional[str]) -> Optional[str]:
+    """Stable key for the caller without decoding the token"""
+    if not authorization:
+        return None
+    return hashlib.sha1(authorization.encode()).hexdigest()
+
+
+class RecentWrites:
+    """Timestamp of the last successful write per caller (this worker only)"""
+
+    def __init__(self, window_seconds: int):
+        self.window = window_seconds
+        self._lock = threading.Lock()
+        self._writes = {}
+
+    def record(self, key: str):
+        now = time.time()
+        with self._lock:
+            self._writes[key] = now
+            if len(self._writes) > 10000:
+                self._writes = {k: t for k, t in self._writes.items() if now - t < self.window}
+
+    def is_recent(self, key: Optional[str]) -> bool:
+        if not key:
+            return False
+        written_at = self._writes.get(key)
+        return written_at is not None and time.time() - written_at < self.window
+
+
+recent_writes = RecentWrites(settings.REPLICA_READ_AFTER_WRITE_SECONDS)
+
+
+def wrote_recently(request) -> bool:
+    """Did this caller write anything within the read-after-write window?"""
+    if recent_writes.is_recent(caller_key(request.headers.get("authorization"))):
+        return True
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, 0))
+    except ValueError:
+        return False
+    return time.time() - last_write < settings.REPLICA_READ_AFTER_WRITE_SECONDS
+
+
+# ============ Write tracking (SQLAlchemy events) ============
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    writes = _request_writes.get()
+    if writes is None:
+        return
+    if context.isinsert or context.isupdate or context.isdelete or \
+            statement.lstrip()[:6].upper() in WRITE_STATEMENTS:
+        writes["pending"] = True
+
+
+def _commit(conn):
+    writes = _request_writes.get()
+    if writes is not None and writes["pending"]:
+        writes["wrote"] = True
+        writes["pending"] = False
+
+
+def _rollback(conn):
+    writes = _request_writes.get()
+    if writes is not None:
+        writes["pending"] = False
+
+
+def install_write_tracking():
+    """Register the listeners on every Engine (sync and async)"""
+    if not event.contains(Engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "commit", _commit)
+        event.listen(Engine, "rollback", _rollback)
+
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI middleware that remembers authenticated callers whose request committed a write"""
+
+    def __init__(self, app):
+        self.app = app
+        install_write_tracking()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        key = caller_key(dict(scope["headers"]).get(b"authorization", b"").decode() or None)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        writes = {"pending": False, "wrote": False}
+        token = _request_writes.set(writes)
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and writes["wrote"]:
+                recent_writes.record(key)
+                cookie = (
+                    f"{LAST_WRITE_COOKIE}={time.time():.3f}; Max-Age={settings.REPLICA_READ_AFTER_WRITE_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            _request_writes.reset(token)
+
+
+class ReplicaHealth:
+    """Cached replica reachability / lag check so reads don't pay for it every time"""
+
+    CHECK_INTERVAL = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._usable = False
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def is_usable(self, engine) -> bool:
+        if time.time() - self._checked_at < self.CHECK_INTERVAL:
+            return self._usable
+        with self._lock:
+            if time.time() - self._checked_at >= self.CHECK_INTERVAL:
+                self._usable = self._check(engine)
+                self._checked_at = time.time()
+        return self._usable
+
+    def _check(self, engine) -> bool:
+        try:
+            with engine.connect() as conn:
+                if engine.dialect.name == "postgresql":
+                    # NULL on a primary / a replica that has not replayed anything yet
+                    lag = conn.execute(text(
+                        "SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+                    )).scalar()
+                    self.lag_seconds = float(lag) if lag is not None else 0.0
+                else:
+                    conn.execute(text("SELECT 1"))
+                    self.lag_seconds = 0.0
+        except Exception as e:
+            self.lag_seconds = None
+            self.last_error = str(e)
+            print(f"⚠ Read replica unavailable, reading from primary: {e}")
+            return False
+
+        self.last_error = None
+        if self.lag_seconds > settings.REPLICA_MAX_LAG_SECONDS:
+            print(f"⚠ Read replica is {self.lag_seconds:.1f}s behind, reading from primary")
+            return False
+        return True
+
+    def to_dict(self) -> dict:
+        return {
+            "usable": self._usable,
+            "lag_seconds": self.lag_seconds,
+            "last_error": self.last_error,
+        }
+
+
+replica_health = ReplicaHealth()
@@ -0,0 +1,73 @@
+"""
+Schema fingerprint and migration lock used by init_db
+
+Every worker used to run create_all plus ~40 ALTER TABLEs on startup. Instead,
+init_db hashes the model metadata and the list of schema patches, compares it
+with the row in schema_fingerprint (one query) and only runs the DDL when they
+differ. A Postgres advisory lock makes sure only one process migrates while
+the other workers wait and then find the fingerprint current.
+"""
+import hashlib
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import text, select, delete, insert
+from sqlalchemy.exc import SQLAlchemyError
+
+# Any 64-bit key works as long as every worker uses the same one
+MIGRATION_LOCK_KEY = zlib.crc32(b"ratala_schema_migration")
+
+
+def compute_schema_fingerprint(metadata, dialect, schema_patches) -> str:
+    """Hash tables, columns, constraints, indexes and the manual schema patches"""
+    parts = []
+    for table in sorted(metadata.tables.values(), key=lambda t: t.name):
+        parts.append(f"table {table.name}")
+        for column in table.columns:
+            parts.append(
+                f"  {column.name} {column.type.compile(dialect=dialect)} "
+                f"null={column.nullable} pk={column.primary_key} "
+                f"default={getattr(column.server_default, 'arg', None)}"
+            )
+        for fk in sorted(table.foreign_keys, key=lambda fk: fk.target_fullname):
+            parts.append(f"  fk {fk.parent.name} -> {fk.target_fullname} ondelete={fk.ondelete}")
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            parts.append(f"  index {index.name} {[c.name for c in index.columns]} unique={index.unique}")
+    for patch in schema_patches:
+        parts.append(f"patch {patch}")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def read_schema_fingerprint(engine, fingerprint_table):
+    """Fingerprint of the applied schema, or None (no table yet, no database, ...)"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(fingerprint_table.c.fingerprint)).scalar()
+    except SQLAlchemyError:
+        return None
+
+
+def write_schema_fingerprint(engine, fingerprint_table, fingerprint: str):
+    with engine.begin() as conn:
+        conn.execute(delete(fingerprint_table))
+        conn.execute(insert(fingerprint_table).values(id=1, fingerprint=fingerprint, applied_at=datetime.utcnow()))
+
+
+@contextmanager
+def schema_migration_lock(engine):
+    """
+    Hold a session-level advisory lock while migrating (PostgreSQL only).
+    Other workers block here until the migrating process is done.
+    """
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
@@ -0,0 +1,44 @@
+"""
+Change versions for POS delta sync
+
+Every row a POS terminal mirrors from the catalogue (categories, menu groups,
+menu items, floors) carries sync_version, the time of its last write in
+microseconds. The column's default and onupdate call next_sync_version(), so
+ORM flushes, Core update() and Query.update() - the soft deletes of a
+category's groups and items - all bump it. Rows written before the column
+existed have 0.
+
+Versions only grow within a worker; across workers they follow the clock.
+A row is versioned when its statement runs, not when it commits, so
+GET /pos/sync never hands out a cursor newer than now minus
+POS_SYNC_CURSOR_LAG_SECONDS: a write still uncommitted when the cursor was
+issued is sent on the next sync, provided its transaction took less than the
+lag. Raw SQL updates do not bump the version.
+"""
+import threading
+import time
+
+from sqlalchemy import BigInteger, Column
+
+_lock = threading.Lock()
+_last = 0
+
+
+def sync_version_at(timestamp: float) -> int:
+    """The version a write at this time.time() would get"""
+    return int(timestamp * 1_000_000)
+
+
+def next_sync_version() -> int:
+    """Current time in microseconds, strictly increasing within this process"""
+    global _last
+    with _lock:
+        _last = max(_last + 1, sync_version_at(time.time()))
+        return _last
+
+
+def sync_version_column() -> Column:
+    return Column(
+        BigInteger, nullable=False, server_default="0",
+        default=next_sync_version, onupdate=next_sync_version
+    )
@@ -9,7 +9,11 @@ import os
 
 # Force reload for route registration
 from app.core.config import settings
+from app.core.loop_monitor import loop_monitor, LoopMonitorMiddleware
+from app.core.query_counter import install_query_counter, QueryCounterMiddleware
 from app.db.database import init_db, get_db
+from app.db.replica import ReadYourWritesMiddleware
+from app.services.table_reconciler import table_reconciler
 from app.core.dependencies import get_password_hash
 from app.models import User as DBUser
 from app.api.v1 import api_router
@@ -28,8 +32,22 @@ app.add_middleware(
     allow_credentials=settings.CORS_ALLOW_CREDENTIALS,
     allow_methods=settings.CORS_ALLOW_METHODS,
     allow_headers=settings.CORS_ALLOW_HEADERS,
+    expose_headers=settings.CORS_EXPOSE_HEADERS,
 )
 
+# Event loop lag / blocking-call detector (opt-in)
+if settings.LOOP_MONITOR_ENABLED:
+    app.add_middleware(LoopMonitorMiddleware, monitor=loop_monitor)
+
+# SQL query counter / N+1 detector (opt-in)
+if settings.QUERY_COUNTER_ENABLED:
+    install_query_counter()
+    app.add_middleware(QueryCounterMiddleware)
+
+# Remember recent writers so their report reads skip the replica
+if settings.DATABASE_REPLICA_URL:
+    app.add_middleware(ReadYourWritesMiddleware)
+
 # Include API routes with prefix
 app.include_router(api_router, prefix=settings.API_PREFIX)
 
@@ -87,6 +105,32 @@ def startup_event():
         raise
 
 
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Start the event loop heartbeat and watchdog if diagnostics are enabled"""
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+        print(f"✓ Event loop monitor running (threshold {settings.LOOP_MONITOR_THRESHOLD_MS}ms)")
+
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    await loop_monitor.stop()
+
+
+@app.on_event("startup")
+async def start_table_reconciler():
+    """Start repairing drifted table statuses in the background (see app/services/table_reconciler.py)"""
+    if settings.TABLE_RECONCILE_INTERVAL_SECONDS > 0:
+        table_reconciler.start()
+        print(f"✓ Table reconciler running (every {settings.TABLE_RECONCILE_INTERVAL_SECONDS}s)")
+
+
+@app.on_event("shutdown")
+async def stop_table_reconciler():
+    await table_reconciler.stop()
+
+
 @app.get("/")
 async def root():
     """Root endpoint - API health check"""
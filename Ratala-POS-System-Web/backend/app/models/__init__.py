@@ -12,13 +12,15 @@ from app.models.inventory import (
     UnitOfMeasurement, Product, InventoryTransaction,
     BillOfMaterials, BOMItem, BatchProduction
 )
-from app.models.orders import Floor, Table, Session, Order, OrderItem, KOT, KOTItem
+from app.models.orders import Floor, Table, Session, Order, OrderItem, KOT, KOTItem, OrderIdempotencyKey
 from app.models.purchase import Supplier, PurchaseBill, PurchaseReturn, PurchaseBillItem
 from app.models.delivery import DeliveryPartner
 from app.models.settings import CompanySettings, PaymentMode, StorageArea, DiscountRule
 from app.models.pos_session import POSSession
 from app.models.qr_code import QRCode
 from app.models.printer import Printer
+from app.models.sequence import DocumentSequence
+from app.models.schema_fingerprint import SchemaFingerprint
 
 __all__ = [
     # Auth
@@ -50,6 +52,7 @@ __all__ = [
     "OrderItem",
     "KOT",
     "KOTItem",
+    "OrderIdempotencyKey",
     # Purchase
     "Supplier",
     "PurchaseBill",
@@ -64,4 +67,8 @@ __all__ = [
     "DiscountRule",
     "QRCode",
     "Printer",
+    # Numbering
+    "DocumentSequence",
+    # Schema
+    "SchemaFingerprint",
 ]
@@ -2,7 +2,7 @@
 Inventory-related models (Products, Units, Transactions, BOM, Production)
 Transaction-based inventory system - stock is ALWAYS derived
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, select, func, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, select, func, UniqueConstraint, Index
 from sqlalchemy.orm import relationship, column_property
 from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime
@@ -113,6 +113,13 @@ class InventoryTransaction(Base):
     user = relationship("User")
     pos_session = relationship("POSSession")
 
+    __table_args__ = (
+        # Stock sums per product and type; quantity included so they stay index-only on Postgres
+        Index('ix_inventory_txn_product_type', 'product_id', 'transaction_type',
+              postgresql_include=['quantity']),
+        Index('ix_inventory_txn_branch_created_at', 'branch_id', 'created_at'),
+    )
+
 
 class BillOfMaterials(Base):
     """Bill of Materials defines requirements for a finished product"""
@@ -154,7 +161,7 @@ class BatchProduction(Base):
     __tablename__ = "batch_productions"
     
     id = Column(Integer, primary_key=True, index=True)
-    production_number = Column(String, unique=True, nullable=False)
+    production_number = Column(String, nullable=False)  # unique per branch
     bom_id = Column(Integer, ForeignKey("bills_of_materials.id"), nullable=False)
     quantity = Column(Float, nullable=False)
     status = Column(String, default="Pending")
@@ -171,3 +178,7 @@ class BatchProduction(Base):
     pos_session = relationship("POSSession")
     finished_product_id = Column(Integer, ForeignKey("products.id"), nullable=True)
     finished_product = relationship("Product", foreign_keys=[finished_product_id])
+
+    __table_args__ = (
+        UniqueConstraint('branch_id', 'production_number', name='uq_production_number_branch'),
+    )
@@ -1,10 +1,11 @@
 """
 Menu-related models (Categories, Menu Groups, Menu Items)
 """
-from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, LargeBinary
+from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from app.db.database import Base
+from app.db.sync_version import sync_version_column
 
 
 class Category(Base):
@@ -20,6 +21,11 @@ class Category(Base):
     is_active = Column(Boolean, default=True)
     branch_id = Column(Integer, ForeignKey("branches.id"), nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.now)
+    sync_version = sync_version_column()  # GET /pos/sync?since=
+
+    __table_args__ = (
+        Index('ix_categories_branch_sync_version', 'branch_id', 'sync_version'),
+    )
 
 
 class MenuGroup(Base):
@@ -35,9 +41,14 @@ class MenuGroup(Base):
     is_active = Column(Boolean, default=True)
     branch_id = Column(Integer, ForeignKey("branches.id"), nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.now)
+    sync_version = sync_version_column()  # GET /pos/sync?since=
     
     category = relationship("Category")
 
+    __table_args__ = (
+        Index('ix_menu_groups_branch_sync_version', 'branch_id', 'sync_version'),
+    )
+
 
 class MenuItem(Base):
     """Menu item model"""
@@ -58,7 +69,12 @@ class MenuItem(Base):
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     branch_id = Column(Integer, ForeignKey("branches.id"), nullable=True, index=True)
     bom_id = Column(Integer, ForeignKey("bills_of_materials.id"), nullable=True)
+    sync_version = sync_version_column()  # GET /pos/sync?since=
     
     category = relationship("Category")
     group = relationship("MenuGroup")
     bom = relationship("BillOfMaterials", back_populates="menu_items")
+
+    __table_args__ = (
+        Index('ix_menu_items_branch_sync_version', 'branch_id', 'sync_version'),
+    )
@@ -1,10 +1,16 @@
 """
 Order-related models (Floors, Tables, Sessions, Orders, Order Items, KOTs)
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, UniqueConstraint, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from app.db.database import Base
+from app.db.sync_version import sync_version_column
+
+# Orders that still hold a table / show on the POS. Paid, Completed and Cancelled are
+# settled (update_order frees the table) and are the bulk of the table
+ACTIVE_ORDER_STATUSES = ('Pending', 'In Progress', 'BillRequested', 'Draft')
+ACTIVE_ORDER_PREDICATE = text("status IN (%s)" % ", ".join(f"'{status}'" for status in ACTIVE_ORDER_STATUSES))
 
 
 class Floor(Base):
@@ -17,11 +23,13 @@ class Floor(Base):
     is_active = Column(Boolean, default=True)
     branch_id = Column(Integer, ForeignKey("branches.id"), nullable=True, index=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    sync_version = sync_version_column()  # GET /pos/sync?since=
     
     tables = relationship("Table", back_populates="floor_rel")
 
     __table_args__ = (
         UniqueConstraint('name', 'branch_id', name='uq_floor_name_branch'),
+        Index('ix_floors_branch_sync_version', 'branch_id', 'sync_version'),
     )
 
 
@@ -112,6 +120,18 @@ class Order(Base):
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
     kots = relationship("KOT", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('ix_orders_branch_created_at', 'branch_id', 'created_at'),
+        Index('ix_orders_table_status', 'table_id', 'status'),
+        Index('ix_orders_active_table', 'table_id',
+              postgresql_where=ACTIVE_ORDER_PREDICATE, sqlite_where=ACTIVE_ORDER_PREDICATE),
+        Index('ix_orders_active_branch', 'branch_id', 'created_at',
+              postgresql_where=ACTIVE_ORDER_PREDICATE, sqlite_where=ACTIVE_ORDER_PREDICATE),
+        # Prefix LIKE for the daily order number sequence (the unique index only serves "C" collation)
+        Index('ix_orders_order_number_pattern', 'order_number',
+              postgresql_ops={'order_number': 'varchar_pattern_ops'}).ddl_if(dialect='postgresql'),
+    )
+
 
 class OrderItem(Base):
     """Order item model"""
@@ -129,13 +149,17 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="items")
     menu_item = relationship("MenuItem")
 
+    __table_args__ = (
+        Index('ix_order_items_order_id', 'order_id'),
+    )
+
 
 class KOT(Base):
     """Kitchen Order Ticket model (also handles BOT - Bar Order Ticket)"""
     __tablename__ = "kots"
     
     id = Column(Integer, primary_key=True, index=True)
-    kot_number = Column(String, unique=True, nullable=False)
+    kot_number = Column(String, nullable=False)  # unique per branch
     order_id = Column(Integer, ForeignKey("orders.id"))
     branch_id = Column(Integer, ForeignKey("branches.id"), nullable=True, index=True)
     kot_type = Column(String, default="KOT")  # KOT or BOT
@@ -148,6 +172,13 @@ class KOT(Base):
     user = relationship("User", backref="created_kots")
     items = relationship("KOTItem", back_populates="kot", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        UniqueConstraint('branch_id', 'kot_number', name='uq_kot_number_branch'),
+        Index('ix_kots_order_id', 'order_id'),
+        Index('ix_kots_kot_number_pattern', 'kot_number',
+              postgresql_ops={'kot_number': 'varchar_pattern_ops'}).ddl_if(dialect='postgresql'),
+    )
+
 
 class KOTItem(Base):
     """KOT item model"""
@@ -162,3 +193,17 @@ class KOTItem(Base):
     
     kot = relationship("KOT", back_populates="items")
     menu_item = relationship("MenuItem")
+
+    __table_args__ = (
+        Index('ix_kot_items_kot_id', 'kot_id'),
+    )
+
+
+class OrderIdempotencyKey(Base):
+    """Client key of an order ingested through POST /orders/bulk (replays return the same order)"""
+    __tablename__ = "order_idempotency_keys"
+
+    branch_id = Column(Integer, ForeignKey("branches.id"), primary_key=True)
+    idempotency_key = Column(String, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,15 @@
+"""
+Schema fingerprint model - records which schema version the database is on
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+from app.db.database import Base
+
+
+class SchemaFingerprint(Base):
+    """Single row holding the hash of the schema last applied by init_db"""
+    __tablename__ = "schema_fingerprint"
+
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,15 @@
+"""
+Document number counters (orders, KOT/BOT, purchase bills/returns, productions)
+"""
+from sqlalchemy import Column, Integer, String, Date, ForeignKey
+from app.db.database import Base
+
+
+class DocumentSequence(Base):
+    """Last number handed out per branch, document type and business date"""
+    __tablename__ = "document_sequences"
+
+    branch_id = Column(Integer, ForeignKey("branches.id"), primary_key=True)
+    doc_type = Column(String, primary_key=True)  # ORD, KOT, BOT, PO, RET, PROD, AUTO
+    business_date = Column(Date, primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)
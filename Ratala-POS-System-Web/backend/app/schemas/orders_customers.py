@@ -111,7 +111,8 @@ class KOTResponse(BaseModel):
     class Config:
         from_attributes = True
 
-class OrderResponse(BaseModel):
+class OrderSummaryResponse(BaseModel):
+    """Order columns without the item and KOT graphs (fields=summary)"""
     id: int
     order_number: str
     table_id: Optional[int] = None
@@ -133,11 +134,13 @@ class OrderResponse(BaseModel):
     table: Optional[TableResponse] = None
     customer: Optional[CustomerBasicResponse] = None
     delivery_partner: Optional[DeliveryPartnerBasicResponse] = None
-    items: List[OrderItemResponse] = []
-    kots: List[KOTResponse] = []
     class Config:
         from_attributes = True
 
+class OrderResponse(OrderSummaryResponse):
+    items: List[OrderItemResponse] = []
+    kots: List[KOTResponse] = []
+
 class OrderCreate(BaseModel):
     table_id: Optional[int] = None
     customer_id: Optional[int] = None
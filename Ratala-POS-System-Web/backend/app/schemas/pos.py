@@ -19,10 +19,20 @@ class TableSyncInfo(BaseModel):
     merge_group_id: Optional[str] = None
     merged_to_id: Optional[int] = None
 
+class POSSyncDeleted(BaseModel):
+    """Ids deactivated since the cursor (delta syncs only)"""
+    categories: List[int] = []
+    groups: List[int] = []
+    items: List[int] = []
+    floors: List[int] = []
+
 class POSSyncResponse(BaseModel):
+    full: bool = True  # False: catalogue lists hold only rows changed since the cursor
+    cursor: Optional[str] = None  # pass back as ?since= on the next sync
     categories: List[CategoryResponse]
     groups: List[MenuGroupResponse]
     items: List[MenuItemResponse]
     floors: List[dict] # Floors are simple
+    deleted: POSSyncDeleted = POSSyncDeleted()
     active_session: Optional[dict] = None
     tables: List[TableSyncInfo]
@@ -6,6 +6,8 @@ from typing import List, Optional
 from app.models.branch import Branch
 from app.models.user_branch import UserBranchAssignment
 from app.schemas import BranchCreate, BranchUpdate
+from app.core.principal_cache import principal_cache
+from app.core.pricing import pricing_profiles
 from datetime import datetime
 import re
 
@@ -125,6 +127,8 @@ def update_branch(
     db_branch.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_branch)
+    principal_cache.invalidate_branch(branch_id)
+    pricing_profiles.invalidate(branch_id)
     
     return db_branch
 
@@ -139,6 +143,8 @@ def delete_branch(db: Session, branch_id: int) -> bool:
     # Deactivate instead of deleting to preserve data integrity
     db_branch.is_active = False
     db.commit()
+    principal_cache.invalidate_branch(branch_id)
+    pricing_profiles.invalidate(branch_id)
     
     return True
 
@@ -170,6 +176,7 @@ def assign_user_to_branch(
             existing.is_primary = True
             db.commit()
             db.refresh(existing)
+        principal_cache.invalidate_user(user_id)
         return existing
     
     # If this is the user's first branch, make it primary
@@ -197,6 +204,7 @@ def assign_user_to_branch(
     db.add(db_assignment)
     db.commit()
     db.refresh(db_assignment)
+    principal_cache.invalidate_user(user_id)
     
     return db_assignment
 
@@ -218,6 +226,7 @@ def remove_user_from_branch(
     was_primary = db_assignment.is_primary
     db.delete(db_assignment)
     db.commit()
+    principal_cache.invalidate_user(user_id)
     
     # If this was the primary branch, set another branch as primary
     if was_primary:
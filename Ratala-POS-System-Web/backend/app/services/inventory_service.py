@@ -1,8 +1,8 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from app.models.orders import Order, OrderItem
 from app.models.inventory import Product, InventoryTransaction, BillOfMaterials, BOMItem, UnitOfMeasurement
 from datetime import datetime
+from app.services import sequence_service
 
 class InventoryService:
     @staticmethod
@@ -153,19 +153,7 @@ class InventoryService:
         import random
         from app.models.inventory import BatchProduction
         
-        today_date = datetime.utcnow().strftime('%Y%m%d')
-        
-        while True:
-            # Count productions for today for daily sequence
-            daily_count = db.query(BatchProduction).filter(
-                func.date(BatchProduction.created_at) == datetime.utcnow().date()
-            ).count()
-            prod_num = f"AUTO-{today_date}-{str(daily_count + 1).zfill(4)}"
-            
-            # Uniqueness check
-            if not db.query(BatchProduction).filter(BatchProduction.production_number == prod_num).first():
-                break
-            daily_count += 1
+        prod_num = sequence_service.next_number(db, "AUTO", branch_id, business_date=datetime.utcnow().date())
         
         production = BatchProduction(
             production_number=prod_num,
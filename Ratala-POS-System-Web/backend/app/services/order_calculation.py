@@ -1,89 +1,177 @@
 """
 Order calculation service - centralized business logic for order amounts
+
+Amounts are stored as floats, but every calculation here runs on Decimal
+(see to_decimal) and is rounded half up to the branch's decimal places, so
+adding lines one at a time gives the same totals as pricing the whole basket
+at once. OrderTotals keeps an order's gross up to date as lines are added,
+changed or removed, without reading the order's other lines again.
 """
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.settings import CompanySettings
+
+from app.core.menu_snapshot import MenuSnapshot, menu_snapshots
+from app.core.pricing import PricingProfile, DiscountRuleSnapshot, pricing_profiles
+
+# DiscountRule.applicable_on -> order types it covers
+DISCOUNT_ORDER_TYPES = {
+    "Dine-In": {"Table", "Dine-in"},
+    "Takeaway": {"Takeaway", "Pay First"},
+    "Delivery": {"Self Delivery", "Delivery Partner", "Delivery"},
+}
+
+Amount = Union[Decimal, float, int, None]
+
+
+def to_decimal(value: Amount) -> Decimal:
+    """Exact Decimal of a stored amount (via str, so 0.1 stays 0.1)"""
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value or 0))
+
+
+def round_amount(value: Amount, places: int) -> Decimal:
+    return to_decimal(value).quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_UP)
+
+
+def line_gross(quantity: Amount, price: Amount) -> Decimal:
+    return to_decimal(quantity) * to_decimal(price)
+
+
+class OrderTotals:
+    """
+    Running gross of one order
+
+    Start from the stored gross (for_order) or from a full list of lines
+    (from_items), add / remove / shift by the lines that changed, then apply()
+    the derived amounts to the order.
+    """
+
+    __slots__ = ("gross",)
+
+    def __init__(self, gross: Amount = 0):
+        self.gross = to_decimal(gross)
+
+    @classmethod
+    def for_order(cls, order) -> "OrderTotals":
+        return cls(order.gross_amount)
+
+    @classmethod
+    def from_items(cls, items: list) -> "OrderTotals":
+        return cls(OrderCalculationService.items_gross(items))
+
+    def add(self, items: list) -> "OrderTotals":
+        self.gross += OrderCalculationService.items_gross(items)
+        return self
+
+    def remove(self, items: list) -> "OrderTotals":
+        self.gross -= OrderCalculationService.items_gross(items)
+        return self
+
+    def shift(self, delta: Amount) -> "OrderTotals":
+        self.gross += to_decimal(delta)
+        return self
+
+    def apply(self, order, profile: PricingProfile):
+        return OrderCalculationService.apply_to_order(order, profile, self.gross)
 
 
 class OrderCalculationService:
     """Service to handle all order amount calculations uniformly"""
-    
+
+    @staticmethod
+    def get_profile(db: Session, branch_id: Optional[int]) -> PricingProfile:
+        """Cached pricing profile of a branch"""
+        return pricing_profiles.get(db, branch_id)
+
+    @staticmethod
+    async def get_profile_async(db: AsyncSession, branch_id: Optional[int]) -> PricingProfile:
+        """Cached pricing profile of a branch (the profile is loaded through the sync session on a miss)"""
+        return await db.run_sync(lambda session: pricing_profiles.get(session, branch_id))
+
+    @staticmethod
+    async def get_menu_async(db: AsyncSession, branch_id: Optional[int], items: list) -> MenuSnapshot:
+        """Cached menu snapshot of a branch covering the menu items of these order lines"""
+        item_ids = [item.get('menu_item_id') for item in items]
+        return await db.run_sync(lambda session: menu_snapshots.get(session, branch_id, item_ids))
+
+    @staticmethod
+    def resolve_item_prices(menu: MenuSnapshot, items: list) -> list:
+        """
+        Fill in the current menu price for items sent without one (or with 0),
+        so the stored line and the order total use the same price
+        """
+        for item in items:
+            if not item.get('price'):
+                item['price'] = menu.price(item.get('menu_item_id')) or 0
+        return items
+
+    @staticmethod
+    def items_gross(items: list) -> Decimal:
+        """Sum of quantity * price over item dicts or OrderItem rows"""
+        total = Decimal(0)
+        for item in items:
+            if isinstance(item, dict):
+                total += line_gross(item.get('quantity'), item.get('price'))
+            else:
+                total += line_gross(item.quantity, item.price)
+        return total
+
+    @staticmethod
+    def rule_discount(profile: PricingProfile, rule_id: int, gross: Amount, order_type: Optional[str]) -> float:
+        """Discount granted by one of the branch's active rules (0 if it does not apply)"""
+        rule: Optional[DiscountRuleSnapshot] = next((r for r in profile.discount_rules if r.id == rule_id), None)
+        gross = to_decimal(gross)
+        if rule is None or gross < to_decimal(rule.min_order_amount):
+            return 0.0
+        if rule.applicable_on != "All" and order_type not in DISCOUNT_ORDER_TYPES.get(rule.applicable_on, ()):
+            return 0.0
+
+        if rule.discount_type == "Percentage":
+            discount = gross * to_decimal(rule.discount_value) / 100
+        else:
+            discount = to_decimal(rule.discount_value)
+        if rule.max_discount_amount:
+            discount = min(discount, to_decimal(rule.max_discount_amount))
+        return float(round_amount(min(discount, gross), profile.decimal_places))
+
     @staticmethod
     def calculate_order_amounts(
-        db: Session,
-        items_subtotal: float,
-        discount_amount: float = 0.0,
-        branch_id: int = None
+        profile: PricingProfile,
+        gross: Amount,
+        discount: Amount = 0.0,
+        delivery_charge: Amount = 0.0
     ) -> dict:
         """
-        Calculate all order amounts based on company settings
-        
-        Args:
-            db: Database session
-            items_subtotal: Sum of all item prices * quantities
-            discount_amount: Discount amount (if any)
-            branch_id: Branch ID for branch-specific settings (future use)
-            
-        Returns:
-            dict with gross_amount, service_charge, tax, discount, net_amount
+        Order amounts as Order column values
+
+        Service charge applies to the amount after discount, tax to that amount
+        plus service charge (same as the frontend); delivery is added untaxed.
         """
-        # Get company settings
-        settings = db.query(CompanySettings).first()
-        
-        # Default rates if no settings found
-        service_charge_rate = settings.service_charge_rate if settings else 10.0
-        tax_rate = settings.tax_rate if settings else 13.0
-        
-        # Calculate amounts
-        gross_amount = items_subtotal
-        discount = discount_amount
-        
-        # Amount after discount
-        amount_after_discount = gross_amount - discount
-        
-        # Service charge on amount after discount
-        service_charge = round(amount_after_discount * (service_charge_rate / 100), 2)
-        
-        # Tax on (amount after discount + service charge)
-        taxable_amount = amount_after_discount + service_charge
-        tax = round(taxable_amount * (tax_rate / 100), 2)
-        
-        # Final net amount
-        net_amount = round(amount_after_discount + service_charge + tax, 2)
-        
+        places = profile.decimal_places
+        gross = to_decimal(gross)
+        base_amount = max(Decimal(0), gross - to_decimal(discount))
+        service_charge = round_amount(base_amount * to_decimal(profile.service_charge_rate) / 100, places)
+        tax = round_amount((base_amount + service_charge) * to_decimal(profile.tax_rate) / 100, places)
+        net_amount = round_amount(base_amount + service_charge + tax + to_decimal(delivery_charge), places)
+
         return {
-            'gross_amount': round(gross_amount, 2),
-            'discount': round(discount, 2),
-            'service_charge': round(service_charge, 2),
-            'service_charge_rate': service_charge_rate,
-            'tax': round(tax, 2),
-            'tax_rate': tax_rate,
-            'net_amount': net_amount,
-            'total_amount': net_amount  # For backward compatibility
+            'gross_amount': float(round_amount(gross, places)),
+            'service_charge_amount': float(service_charge),
+            'tax_amount': float(tax),
+            'net_amount': float(net_amount),
+            'total_amount': float(net_amount),  # For backward compatibility
         }
-    
+
     @staticmethod
-    def recalculate_order(db: Session, order_items: list, discount_amount: float = 0.0, branch_id: int = None) -> dict:
-        """
-        Recalculate order from items
-        
-        Args:
-            db: Database session
-            order_items: List of order items with price and quantity
-            discount_amount: Discount amount
-            branch_id: Branch ID
-            
-        Returns:
-            Calculated amounts dictionary
-        """
-        items_subtotal = sum(
-            item.get('price', 0) * item.get('quantity', 0) 
-            for item in order_items
-        )
-        
-        return OrderCalculationService.calculate_order_amounts(
-            db, 
-            items_subtotal, 
-            discount_amount,
-            branch_id
+    def apply_to_order(order, profile: PricingProfile, gross: Amount):
+        """Recalculate an order's amounts from its gross, discount and delivery charge"""
+        amounts = OrderCalculationService.calculate_order_amounts(
+            profile, gross, order.discount or 0, order.delivery_charge or 0
         )
+        for key, value in amounts.items():
+            setattr(order, key, value)
+        return order
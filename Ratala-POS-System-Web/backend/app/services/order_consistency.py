@@ -0,0 +1,86 @@
+"""
+Order totals consistency check
+
+Every write path keeps Order.gross_amount equal to sum(quantity * price) of
+the order's lines (OrderTotals). GET /orders/{id} used to re-add the lines on
+every read and commit a correction when they disagreed; reads no longer
+write, so orders that drifted anyway (rows edited by hand, data written by
+older versions) are found and repaired here, in batches of orders by id:
+
+- find_drifted_orders compares each order of a batch with the sum of its
+  lines in one aggregate query
+- repair_orders recalculates the drifted orders from their lines with the
+  branch's current pricing profile, exactly as the read path used to
+
+check_order_totals.py (backend directory) runs both over a whole database.
+"""
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.pricing import pricing_profiles
+from app.models.orders import Order, OrderItem
+from app.services.order_calculation import OrderTotals, round_amount
+
+
+class DriftedOrder(NamedTuple):
+    id: int
+    branch_id: Optional[int]
+    order_number: str
+    status: str
+    stored_gross: float
+    lines_gross: float
+
+
+def find_drifted_orders(db: Session, after_id: int = 0, batch_size: int = 500,
+                        branch_id: Optional[int] = None, tolerance: float = 0.01):
+    """
+    Drifted orders among the next batch_size orders with id > after_id
+
+    Returns (drifted orders, id of the last order of the batch); the id is
+    None once there are no orders left.
+    """
+    ids = select(Order.id).where(Order.id > after_id)
+    if branch_id:
+        ids = ids.where(Order.branch_id == branch_id)
+    batch = db.execute(ids.order_by(Order.id).limit(batch_size)).scalars().all()
+    if not batch:
+        return [], None
+
+    lines = (
+        select(OrderItem.order_id, func.sum(OrderItem.quantity * OrderItem.price).label("gross"))
+        .where(OrderItem.order_id.in_(batch))
+        .group_by(OrderItem.order_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            Order.id, Order.branch_id, Order.order_number, Order.status,
+            func.coalesce(Order.gross_amount, 0), func.coalesce(lines.c.gross, 0)
+        )
+        .outerjoin(lines, lines.c.order_id == Order.id)
+        .where(Order.id.in_(batch))
+        .order_by(Order.id)
+    ).all()
+    drifted = [DriftedOrder(*row) for row in rows if abs(row[5] - row[4]) > tolerance]
+    return drifted, batch[-1]
+
+
+def repair_orders(db: Session, order_ids: List[int]) -> int:
+    """Recalculate the amounts of these orders from their lines; the caller commits"""
+    if not order_ids:
+        return 0
+    orders = db.execute(
+        select(Order).options(selectinload(Order.items)).where(Order.id.in_(order_ids))
+    ).scalars().all()
+    repaired = 0
+    for order in orders:
+        profile = pricing_profiles.get(db, order.branch_id)
+        totals = OrderTotals.from_items(order.items)
+        places = profile.decimal_places
+        if round_amount(totals.gross, places) != round_amount(order.gross_amount, places):
+            totals.apply(order, profile)
+            repaired += 1
+    db.flush()
+    return repaired
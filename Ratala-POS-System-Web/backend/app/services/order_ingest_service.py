@@ -0,0 +1,368 @@
+"""
+Bulk ingest of orders queued offline by POS terminals (POST /orders/bulk)
+
+While the connection is down a terminal keeps its orders locally, each with
+a client-generated idempotency key. Once it reconnects, it used to replay
+them through POST /orders one at a time. Each replay paid for the session
+lookup, customer lookup, numbering, KOT split and table update on its own,
+and a replay retried after a timeout created the order twice.
+
+ingest_chunk writes a chunk of orders in the caller's transaction with a
+fixed number of statements, however many orders the chunk holds:
+
+- each reference check (menu items, tables, customers, explicit order
+  numbers) runs as one query for the whole chunk; an explicit number that
+  an earlier order of the chunk already uses is rejected for that order only
+- the idempotency keys are claimed with one INSERT ... ON CONFLICT DO
+  NOTHING RETURNING. A key that is already taken belongs to an order
+  ingested earlier, so its result is "duplicate" together with that order
+- numbers come from one counter bump per document type and business date
+- orders, items, KOTs and KOT items each go in as one multi-row INSERT, and
+  table statuses are set with one UPDATE per status (SQLite runs the
+  INSERT ... RETURNING of orders and KOTs row by row, PostgreSQL batches it)
+
+Each order is priced and split into KOT / BOT tickets the same way
+create_order does it. created_at may be sent (the time the order was taken
+offline) and sets the business date of its numbers. KOTs of orders that
+arrive already Paid or Completed are stored as Served, so the kitchen does
+not see tickets for food that has long been served.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone, date
+from typing import Optional
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.menu_snapshot import menu_snapshots
+from app.core.pricing import pricing_profiles
+from app.models.customers import Customer
+from app.models.orders import KOT, KOTItem, Order, OrderIdempotencyKey, OrderItem, Table
+from app.models.pos_session import POSSession
+from app.services import sequence_service
+from app.services.order_calculation import OrderCalculationService
+
+# Order columns a client may send; the rest are set here
+CLIENT_COLUMNS = {column.key for column in Order.__table__.columns} - {'id', 'branch_id', 'created_by', 'updated_at'}
+CLOSED_STATUSES = ('Paid', 'Completed')
+TABLE_ORDER_TYPES = ('Table', 'Dine-in')
+
+
+def result(payload, status: str, order_id: Optional[int] = None, order_number: Optional[str] = None,
+           detail: Optional[str] = None) -> dict:
+    key = payload.get('idempotency_key') if isinstance(payload, dict) else None
+    entry = {"idempotency_key": key, "status": status, "order_id": order_id, "order_number": order_number}
+    if detail:
+        entry["detail"] = detail
+    return entry
+
+
+def _shape_error(payload) -> Optional[str]:
+    if not isinstance(payload, dict):
+        return "Order must be an object"
+    if not payload.get('idempotency_key') or not isinstance(payload['idempotency_key'], str):
+        return "idempotency_key is required"
+    if not payload.get('order_type'):
+        return "order_type is required"
+    items = payload.get('items')
+    if not isinstance(items, list) or not items:
+        return "items are required"
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('menu_item_id'), int) \
+                or not isinstance(item.get('quantity'), int) or item['quantity'] <= 0:
+            return "Every item needs an integer menu_item_id and a positive quantity"
+    return None
+
+
+def _created_at(payload: dict) -> datetime:
+    """Offline timestamp of the order in UTC (naive values are UTC), else now"""
+    value = payload.get('created_at')
+    if not value:
+        return datetime.now(timezone.utc)
+    created_at = datetime.fromisoformat(value) if isinstance(value, str) else value
+    if created_at.tzinfo is None:
+        return created_at.replace(tzinfo=timezone.utc)
+    # Columns store UTC wall time; SQLite would keep the client's local time
+    return created_at.astimezone(timezone.utc)
+
+
+def _business_date(created_at: datetime) -> date:
+    """Local date, the same one sequence_service uses for live orders"""
+    return created_at.astimezone().date()
+
+
+def ingest_chunk(db: Session, payloads: list, branch_id: int, branch_code: str, user_id: int) -> list:
+    """
+    Write a chunk of offline orders in the current transaction
+
+    Returns one result per payload, in the same order, with status "created",
+    "duplicate" or "error". The caller commits.
+    """
+    results = [None] * len(payloads)
+    first_index = {}  # idempotency key -> index of its first payload in the chunk
+    repeats = []  # (index, key) of later payloads with the same key
+
+    for index, payload in enumerate(payloads):
+        error = _shape_error(payload)
+        if not error:
+            try:
+                payload['created_at'] = _created_at(payload)
+            except (TypeError, ValueError):
+                error = "created_at must be an ISO 8601 timestamp"
+        if error:
+            results[index] = result(payload, "error", detail=error)
+        elif payload['idempotency_key'] in first_index:
+            repeats.append((index, payload['idempotency_key']))
+        else:
+            first_index[payload['idempotency_key']] = index
+
+    first_of = dict(first_index)
+
+    # --- Reference checks, one query each for the whole chunk ---
+    pending = [payloads[index] for index in first_index.values()]
+    menu = menu_snapshots.get(db, branch_id, {item['menu_item_id'] for p in pending for item in p['items']})
+    table_ids = {p['table_id'] for p in pending if p.get('table_id')}
+    tables = dict(db.execute(
+        select(Table.id, Table.merge_group_id).where(Table.id.in_(table_ids), Table.branch_id == branch_id)
+    ).all()) if table_ids else {}
+    customer_ids = {p['customer_id'] for p in pending if p.get('customer_id')}
+    customers = set(db.execute(
+        select(Customer.id).where(Customer.id.in_(customer_ids), Customer.branch_id == branch_id)
+    ).scalars()) if customer_ids else set()
+    numbers = {p['order_number'] for p in pending if p.get('order_number')}
+    used_numbers = set(db.execute(
+        select(Order.order_number).where(Order.order_number.in_(numbers))
+    ).scalars()) if numbers else set()
+
+    chunk_numbers = set()  # explicit numbers of the orders accepted so far
+    for key, index in list(first_index.items()):
+        payload = payloads[index]
+        error = None
+        if any(item['menu_item_id'] not in menu for item in payload['items']):
+            error = "Unknown menu item"
+        elif payload.get('table_id') and payload['table_id'] not in tables:
+            error = "Table not found"
+        elif payload.get('customer_id') and payload['customer_id'] not in customers:
+            error = "Customer not found"
+        elif payload.get('order_number') in used_numbers:
+            error = "order_number already exists"
+        elif payload.get('order_number') in chunk_numbers:
+            # The multi-row INSERT would fail for the whole chunk
+            error = "order_number repeats an earlier order in this request"
+        if error:
+            results[index] = result(payload, "error", detail=error)
+            del first_index[key]
+        elif payload.get('order_number'):
+            chunk_numbers.add(payload['order_number'])
+
+    # --- Claim the keys; a key that is already taken was ingested before ---
+    if first_index:
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        claimed = set(db.execute(
+            dialect.insert(OrderIdempotencyKey).values([
+                {'branch_id': branch_id, 'idempotency_key': key, 'created_at': datetime.now(timezone.utc)}
+                for key in first_index
+            ]).on_conflict_do_nothing().returning(OrderIdempotencyKey.idempotency_key)
+        ).scalars())
+        taken = [key for key in first_index if key not in claimed]
+        if taken:
+            previous = {
+                key: (order_id, order_number)
+                for key, order_id, order_number in db.execute(
+                    select(OrderIdempotencyKey.idempotency_key, Order.id, Order.order_number)
+                    .outerjoin(Order, Order.id == OrderIdempotencyKey.order_id)
+                    .where(OrderIdempotencyKey.branch_id == branch_id, OrderIdempotencyKey.idempotency_key.in_(taken))
+                ).all()
+            }
+            for key in taken:
+                index = first_index.pop(key)
+                results[index] = result(payloads[index], "duplicate", *previous.get(key, (None, None)))
+
+    if first_index:
+        _write_orders(db, payloads, first_index, results, menu, tables, branch_id, branch_code, user_id)
+
+    for index, key in repeats:
+        first = results[first_of[key]]
+        if first["status"] in ("created", "duplicate"):
+            results[index] = result(payloads[index], "duplicate", first["order_id"], first["order_number"])
+        else:
+            results[index] = result(payloads[index], "error", detail="Repeats the idempotency_key of an earlier order")
+    return results
+
+
+def _write_orders(db: Session, payloads: list, first_index: dict, results: list, menu, tables: dict,
+                  branch_id: int, branch_code: str, user_id: int):
+    indexes = list(first_index.values())
+    profile = pricing_profiles.get(db, branch_id)
+    active_session_id = db.execute(
+        select(POSSession.id).where(
+            POSSession.user_id == user_id,
+            POSSession.branch_id == branch_id,
+            POSSession.status == "Open"
+        ).limit(1)
+    ).scalar()
+
+    # Customers given by name only: reuse the branch's customer, else create one
+    names = {
+        payloads[index]['customer_name'] for index in indexes
+        if not payloads[index].get('customer_id') and payloads[index].get('customer_name')
+    }
+    customer_by_name = {}
+    if names:
+        for customer_id, name in db.execute(
+            select(Customer.id, Customer.name).where(Customer.name.in_(names), Customer.branch_id == branch_id)
+            .order_by(Customer.id)
+        ).all():
+            customer_by_name.setdefault(name, customer_id)
+        new_customers = [
+            Customer(name=name, branch_id=branch_id, customer_type="Regular")
+            for name in names if name not in customer_by_name
+        ]
+        if new_customers:
+            db.add_all(new_customers)
+            db.flush()
+            customer_by_name.update((customer.name, customer.id) for customer in new_customers)
+
+    # Order numbers, one counter bump per business date
+    by_date = defaultdict(list)
+    for index in indexes:
+        if not payloads[index].get('order_number'):
+            by_date[_business_date(payloads[index]['created_at'])].append(index)
+    order_numbers = {}
+    for business_date, dated in by_date.items():
+        numbers = sequence_service.next_numbers(db, "ORD", branch_id, len(dated), branch_code, business_date)
+        order_numbers.update(zip(dated, numbers))
+
+    # --- Orders ---
+    rows = []
+    for index in indexes:
+        payload = payloads[index]
+        items = OrderCalculationService.resolve_item_prices(menu, payload['items'])
+        row = {key: value for key, value in payload.items() if key in CLIENT_COLUMNS}
+        row.update(branch_id=branch_id, created_by=user_id, updated_at=payload['created_at'])
+        row['order_number'] = payload.get('order_number') or order_numbers[index]
+        row['status'] = payload.get('status') or 'Pending'
+        if active_session_id:
+            row['pos_session_id'] = active_session_id
+        if not row.get('customer_id') and payload.get('customer_name'):
+            row['customer_id'] = customer_by_name[payload['customer_name']]
+
+        gross = OrderCalculationService.items_gross(items)
+        if payload.get('discount_rule_id'):
+            row['discount'] = OrderCalculationService.rule_discount(
+                profile, payload['discount_rule_id'], gross, row.get('order_type')
+            )
+        row.update(OrderCalculationService.calculate_order_amounts(
+            profile, gross, row.get('discount') or 0, row.get('delivery_charge') or 0
+        ))
+        rows.append(row)
+
+    order_ids = db.execute(insert(Order).returning(Order.id, sort_by_parameter_order=True), rows).scalars().all()
+
+    row_items = {order_id: payloads[index]['items'] for index, order_id in zip(indexes, order_ids)}
+    db.execute(insert(OrderItem), [
+        {
+            'order_id': order_id,
+            'menu_item_id': item['menu_item_id'],
+            'quantity': item['quantity'],
+            'price': item.get('price', 0),
+            'subtotal': item.get('subtotal', item.get('price', 0) * item['quantity']),
+            'notes': item.get('notes', ''),
+        }
+        for order_id, items in row_items.items() for item in items
+    ])
+
+    # --- KOT / BOT tickets ---
+    tickets = []  # KOT column values and the lines of each ticket
+    for order_id, row in zip(order_ids, rows):
+        if row['status'] == 'Draft':
+            continue
+        kot_items, bot_items = menu.split_by_station(row_items[order_id])
+        for kot_type, lines in (('KOT', kot_items), ('BOT', bot_items)):
+            if lines:
+                tickets.append(({
+                    'order_id': order_id,
+                    'branch_id': branch_id,
+                    'kot_type': kot_type,
+                    'status': 'Served' if row['status'] in CLOSED_STATUSES else 'Pending',
+                    'created_by': user_id,
+                    'created_at': row['created_at'],
+                }, lines))
+
+    if tickets:
+        per_counter = defaultdict(list)
+        for kot, _ in tickets:
+            per_counter[(kot['kot_type'], _business_date(kot['created_at']))].append(kot)
+        for (kot_type, business_date), kots in per_counter.items():
+            numbers = sequence_service.next_numbers(db, kot_type, branch_id, len(kots), business_date=business_date)
+            for kot, number in zip(kots, numbers):
+                kot['kot_number'] = number
+
+        kot_ids = db.execute(
+            insert(KOT).returning(KOT.id, sort_by_parameter_order=True), [kot for kot, _ in tickets]
+        ).scalars().all()
+        db.execute(insert(KOTItem), [
+            {
+                'kot_id': kot_id,
+                'menu_item_id': item['menu_item_id'],
+                'quantity': item['quantity'],
+                'notes': item.get('notes', ''),
+            }
+            for kot_id, (_, lines) in zip(kot_ids, tickets) for item in lines
+        ])
+
+    _update_tables(db, rows, tables, branch_id)
+    _update_customer_stats(db, rows)
+
+    db.execute(update(OrderIdempotencyKey), [
+        {'branch_id': branch_id, 'idempotency_key': key, 'order_id': order_id}
+        for key, order_id in zip(first_index, order_ids)
+    ])
+    for index, order_id, row in zip(indexes, order_ids, rows):
+        results[index] = result(payloads[index], "created", order_id, row['order_number'])
+
+
+def _update_tables(db: Session, rows: list, tables: dict, branch_id: int):
+    """Occupied while any ingested order of the table is open, else Available (with merge groups)"""
+    targets = {}
+    for row in rows:
+        table_id = row.get('table_id')
+        if table_id and row.get('order_type') in TABLE_ORDER_TYPES:
+            status = "Available" if row['status'] in CLOSED_STATUSES else "Occupied"
+            if targets.get(table_id) != "Occupied":
+                targets[table_id] = status
+
+    by_status = defaultdict(set)
+    for table_id, status in targets.items():
+        by_status[status].add(table_id)
+    for status, table_ids in by_status.items():
+        groups = {tables[table_id] for table_id in table_ids if tables.get(table_id) and str(tables[table_id]).strip()}
+        condition = Table.id.in_(table_ids)
+        if groups:
+            condition = or_(condition, Table.merge_group_id.in_(groups))
+        db.execute(
+            update(Table).where(condition, Table.branch_id == branch_id).values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _update_customer_stats(db: Session, rows: list):
+    """Visits, spend and dues of customers whose ingested orders are already settled"""
+    settled = [row for row in rows if row['status'] in CLOSED_STATUSES and row.get('customer_id')]
+    if not settled:
+        return
+    customers = {
+        customer.id: customer
+        for customer in db.execute(
+            select(Customer).where(Customer.id.in_({row['customer_id'] for row in settled}))
+        ).scalars()
+    }
+    now = datetime.now(timezone.utc)
+    for row in settled:
+        customer = customers[row['customer_id']]
+        customer.total_visits = (customer.total_visits or 0) + 1
+        customer.total_spent = (customer.total_spent or 0) + (row.get('net_amount') or 0)
+        customer.due_amount = (customer.due_amount or 0) + (row.get('credit_amount') or 0)
+        customer.updated_at = now
+    db.flush()
@@ -0,0 +1,140 @@
+"""
+Line-level diff of an order's items
+
+PUT /orders/{id} sends the complete list of lines. Deleting every row and
+inserting the list again made each edit cost as much as the whole basket (a
+50-line banquet order deleted and re-inserted 50 rows to change one
+quantity), and every line got a new id. diff_order_items matches the incoming lines to the
+stored ones and apply_order_item_diff writes only what changed, with one
+statement per kind of change:
+
+    UPDATE order_items ... (executemany, by primary key)
+    DELETE FROM order_items WHERE id IN (...)
+    INSERT INTO order_items ... (one multi-row insert)
+
+An incoming line is matched by, in order of preference:
+
+1. its "id", when it is one of this order's lines
+2. menu item, notes, quantity and price (the line did not change)
+3. menu item and notes (new quantity or price)
+4. menu item, quantity and price (new notes)
+5. menu item alone
+
+Every stored line that is still unmatched after that is deleted, and every
+incoming line that is still unmatched is inserted.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from typing import NamedTuple, List
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.orders import OrderItem
+from app.services.order_calculation import line_gross
+
+# Columns an incoming line can change on a stored one
+LINE_COLUMNS = ('menu_item_id', 'quantity', 'price', 'subtotal', 'notes')
+
+
+class OrderItemDiff(NamedTuple):
+    inserts: List[dict]  # new lines, OrderItem column values
+    updates: List[dict]  # changed lines, id + every LINE_COLUMNS value
+    deletes: List[int]  # ids of lines that are gone
+    unchanged: int
+    gross_delta: Decimal  # change of sum(quantity * price)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.inserts or self.updates or self.deletes)
+
+
+def line_values(item: dict) -> dict:
+    """OrderItem column values of an incoming line (same defaults as create_order)"""
+    price = item.get('price', 0)
+    return {
+        'menu_item_id': item['menu_item_id'],
+        'quantity': item['quantity'],
+        'price': price,
+        'subtotal': item.get('subtotal', price * item['quantity']),
+        'notes': item.get('notes') or '',
+    }
+
+
+def _stored_values(row: OrderItem) -> dict:
+    values = {column: getattr(row, column) for column in LINE_COLUMNS}
+    values['notes'] = values['notes'] or ''
+    return values
+
+
+def _gross(values: dict) -> Decimal:
+    return line_gross(values['quantity'], values['price'])
+
+
+def _keys(values: dict) -> tuple:
+    """Match keys of passes 2-5, most specific first"""
+    return (
+        (values['menu_item_id'], values['notes'], values['quantity'], values['price']),
+        (values['menu_item_id'], values['notes']),
+        (values['menu_item_id'], values['quantity'], values['price']),
+        values['menu_item_id'],
+    )
+
+
+def diff_order_items(existing: list, incoming: list) -> OrderItemDiff:
+    """Compare an order's stored OrderItem rows with the full incoming list of lines"""
+    stored = {row.id: _stored_values(row) for row in existing}
+    lines = [line_values(item) for item in incoming]
+    matches = {}  # incoming index -> stored id
+    taken = set()
+
+    # 1. Explicit ids
+    for index, item in enumerate(incoming):
+        row_id = item.get('id')
+        if row_id in stored and row_id not in taken:
+            matches[index] = row_id
+            taken.add(row_id)
+
+    # 2-5. Same menu item, from the most to the least specific key
+    for depth in range(4):
+        buckets = defaultdict(list)
+        for row_id, values in stored.items():
+            if row_id not in taken:
+                buckets[_keys(values)[depth]].append(row_id)
+        for index, values in enumerate(lines):
+            if index not in matches:
+                candidates = buckets.get(_keys(values)[depth])
+                if candidates:
+                    matches[index] = row_id = candidates.pop(0)
+                    taken.add(row_id)
+
+    inserts, updates = [], []
+    unchanged = 0
+    gross_delta = Decimal(0)
+    for index, values in enumerate(lines):
+        row_id = matches.get(index)
+        if row_id is None:
+            inserts.append(values)
+            gross_delta += _gross(values)
+        elif values != stored[row_id]:
+            updates.append({'id': row_id, **values})
+            gross_delta += _gross(values) - _gross(stored[row_id])
+        else:
+            unchanged += 1
+
+    deletes = [row_id for row_id in stored if row_id not in taken]
+    gross_delta -= sum(_gross(stored[row_id]) for row_id in deletes)
+
+    return OrderItemDiff(inserts, updates, deletes, unchanged, gross_delta)
+
+
+async def apply_order_item_diff(db: AsyncSession, order_id: int, diff: OrderItemDiff):
+    """Write a diff; the order's loaded items collection is stale afterwards"""
+    if diff.updates:
+        await db.execute(update(OrderItem), diff.updates)
+    if diff.deletes:
+        await db.execute(
+            delete(OrderItem).where(OrderItem.id.in_(diff.deletes)).execution_options(synchronize_session=False)
+        )
+    if diff.inserts:
+        await db.execute(insert(OrderItem), [{'order_id': order_id, **values} for values in diff.inserts])
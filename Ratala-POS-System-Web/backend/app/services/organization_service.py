@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.models.organization import Organization, SubscriptionPlan, SubscriptionStatus
 from app.models.auth import User
+from app.core.principal_cache import principal_cache
 from app.schemas import OrganizationCreate, OrganizationUpdate
 from datetime import datetime
 
@@ -69,6 +70,7 @@ def create_organization(
         user.organization_id = db_organization.id
         user.is_organization_owner = True
         db.commit()
+        principal_cache.invalidate_user(user.id)
     
     return db_organization
 
@@ -1,5 +1,7 @@
 import socket
 from typing import List, Optional, Dict, Any
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.printer import Printer, PrinterBrand, PrinterConnection
 import logging
 
@@ -48,6 +50,16 @@ class PrintingService:
     def __init__(self, db_session):
         self.db = db_session
 
+    async def _get_active_printers(self, branch_id: int) -> List[Printer]:
+        """Active printers for a branch; works with both sync and async sessions."""
+        query = select(Printer).filter(
+            Printer.is_active == True,
+            Printer.branch_id == branch_id
+        )
+        if isinstance(self.db, AsyncSession):
+            return (await self.db.execute(query)).scalars().all()
+        return self.db.execute(query).scalars().all()
+
     async def print_kot(self, kot: Any):
         """Print a Kitchen Order Ticket."""
         # KOT.order relationship is needed
@@ -56,10 +68,7 @@ class PrintingService:
             logger.error("KOT has no associated order or branch_id")
             return False
 
-        printers = self.db.query(Printer).filter(
-            Printer.is_active == True,
-            Printer.branch_id == branch_id
-        ).all()
+        printers = await self._get_active_printers(branch_id)
 
         if not printers:
             logger.warning(f"No active KITCHEN printers found for branch: {branch_id}")
@@ -83,10 +92,7 @@ class PrintingService:
             logger.error("BOT has no associated order or branch_id")
             return False
 
-        printers = self.db.query(Printer).filter(
-            Printer.is_active == True,
-            Printer.branch_id == branch_id
-        ).all()
+        printers = await self._get_active_printers(branch_id)
 
         if not printers:
             logger.warning(f"No active BAR printers found for branch: {branch_id}")
@@ -106,10 +112,7 @@ class PrintingService:
     async def print_bill(self, order: Any):
         """Print a Billing Receipt."""
         branch_id = order.branch_id
-        printers = self.db.query(Printer).filter(
-            Printer.is_active == True,
-            Printer.branch_id == branch_id
-        ).all()
+        printers = await self._get_active_printers(branch_id)
 
         if not printers:
             logger.warning(f"No active BILLING printers found for branch: {branch_id}")
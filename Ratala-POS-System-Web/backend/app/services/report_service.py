@@ -5,8 +5,9 @@ from typing import Dict, List
 from sqlalchemy.orm import Session
 from datetime import datetime
 from app.models.orders import Order
-from app.utils.pdf_generator import generate_pdf_report, generate_invoice_pdf
-from app.utils.excel_generator import generate_excel_report
+
+# pdf_generator (reportlab) and excel_generator (pandas/openpyxl) are imported
+# inside the methods so importing app.services stays cheap for every worker
 
 
 class ReportService:
@@ -43,6 +44,7 @@ class ReportService:
         if title is None:
             title = report_type.replace('-', ' ').title()
         
+        from app.utils.pdf_generator import generate_pdf_report
         return generate_pdf_report(data, title)
     
     @staticmethod
@@ -51,9 +53,11 @@ class ReportService:
         if title is None:
             title = report_type.replace('-', ' ').title()
         
+        from app.utils.excel_generator import generate_excel_report
         return generate_excel_report(data, title)
     
     @staticmethod
     def generate_order_invoice(order_data: Dict) -> bytes:
         """Generate invoice PDF for an order"""
+        from app.utils.pdf_generator import generate_invoice_pdf
         return generate_invoice_pdf(order_data)
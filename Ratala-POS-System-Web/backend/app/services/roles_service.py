@@ -4,6 +4,7 @@ Role service for managing dynamic roles and permissions
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.models.role import Role
+from app.core.permissions import permission_registry, KNOWN_PERMISSIONS
 from app.schemas import RoleCreate, RoleUpdate
 
 
@@ -39,6 +40,7 @@ def create_role(db: Session, role_data: RoleCreate, branch_id: Optional[int] = N
     db.add(db_role)
     db.commit()
     db.refresh(db_role)
+    permission_registry.invalidate(db_role.branch_id, db_role.name)
     return db_role
 
 
@@ -48,12 +50,15 @@ def update_role(db: Session, role_id: int, role_data: RoleUpdate) -> Optional[Ro
     if not db_role:
         return None
     
+    previous = (db_role.branch_id, db_role.name)
     update_data = role_data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_role, key, value)
     
     db.commit()
     db.refresh(db_role)
+    permission_registry.invalidate(*previous)
+    permission_registry.invalidate(db_role.branch_id, db_role.name)
     return db_role
 
 
@@ -63,8 +68,10 @@ def delete_role(db: Session, role_id: int) -> bool:
     if not db_role:
         return False
     
+    branch_id, name = db_role.branch_id, db_role.name
     db.delete(db_role)
     db.commit()
+    permission_registry.invalidate(branch_id, name)
     return True
 
 
@@ -73,7 +80,4 @@ def get_available_permissions() -> List[str]:
     Get all available granular permissions in the system.
     This can be expanded as more features are added.
     """
-    return [
-        "dashboard.view",
-        "pos.access"
-    ]
+    return list(KNOWN_PERMISSIONS)
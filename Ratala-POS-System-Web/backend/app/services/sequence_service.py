@@ -0,0 +1,110 @@
+"""
+Document number allocation
+
+Orders, KOT/BOT tickets, purchase bills/returns and productions are numbered
+<prefix><seq:04d>, restarting at 1 every business date. Each (branch, doc
+type, business date) has a counter row in document_sequences that is bumped
+with UPDATE ... RETURNING, so the database hands out every number once, in
+constant time, however many terminals insert at the same moment.
+
+The UPDATE locks the counter row until the caller commits: numbers stay
+gapless (a rolled back order gives its number back) and documents of one type
+in one branch are numbered in commit order. The first allocation of a day
+seeds the counter from the highest number already stored with that prefix
+(documents created before the counter existed, or typed in by hand).
+"""
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.inventory import BatchProduction
+from app.models.orders import Order, KOT
+from app.models.purchase import PurchaseBill, PurchaseReturn
+from app.models.sequence import DocumentSequence
+
+# doc type -> (number column, whether the number starts with the branch code)
+DOCUMENT_TYPES = {
+    "ORD": (Order.order_number, True),
+    "PO": (PurchaseBill.bill_number, True),
+    "RET": (PurchaseReturn.return_number, True),
+    "KOT": (KOT.kot_number, False),
+    "BOT": (KOT.kot_number, False),
+    "PROD": (BatchProduction.production_number, False),
+    "AUTO": (BatchProduction.production_number, False),
+}
+
+
+def document_prefix(doc_type: str, business_date: date, branch_code: Optional[str] = None) -> str:
+    """e.g. BR1-ORD-20260101- for orders, KOT-20260101- for tickets"""
+    _, with_branch_code = DOCUMENT_TYPES[doc_type]
+    prefix = f"{doc_type}-{business_date.strftime('%Y%m%d')}-"
+    return f"{branch_code}-{prefix}" if with_branch_code else prefix
+
+
+def next_number(
+    db: Session,
+    doc_type: str,
+    branch_id: int,
+    branch_code: Optional[str] = None,
+    business_date: Optional[date] = None
+) -> str:
+    """Allocate the next document number (local date unless business_date is given)"""
+    return next_numbers(db, doc_type, branch_id, 1, branch_code, business_date)[0]
+
+
+def next_numbers(
+    db: Session,
+    doc_type: str,
+    branch_id: int,
+    count: int,
+    branch_code: Optional[str] = None,
+    business_date: Optional[date] = None
+) -> list:
+    """Allocate count consecutive document numbers with a single counter update"""
+    business_date = business_date or datetime.now().date()
+    prefix = document_prefix(doc_type, business_date, branch_code)
+    last = next_value(db, doc_type, branch_id, business_date, prefix, count)
+    return [f"{prefix}{value:04d}" for value in range(last - count + 1, last + 1)]
+
+
+def next_value(db: Session, doc_type: str, branch_id: int, business_date: date, prefix: str, count: int = 1) -> int:
+    """Bump the counter by count and return its new (last allocated) value"""
+    bump = update(DocumentSequence).where(
+        DocumentSequence.branch_id == branch_id,
+        DocumentSequence.doc_type == doc_type,
+        DocumentSequence.business_date == business_date
+    ).values(
+        last_value=DocumentSequence.last_value + count
+    ).returning(DocumentSequence.last_value).execution_options(synchronize_session=False)
+
+    value = db.execute(bump).scalar()
+    if value is None:
+        _create_counter(db, doc_type, branch_id, business_date, prefix)
+        value = db.execute(bump).scalar()
+    return value
+
+
+def _create_counter(db: Session, doc_type: str, branch_id: int, business_date: date, prefix: str):
+    """First number of the day: start after the highest one already stored"""
+    column, _ = DOCUMENT_TYPES[doc_type]
+    last = db.execute(
+        select(column).where(
+            column.class_.branch_id == branch_id,
+            column.startswith(prefix, autoescape=True)
+        ).order_by(func.length(column).desc(), column.desc()).limit(1)
+    ).scalar()
+    try:
+        last_value = int(last[len(prefix):]) if last else 0
+    except ValueError:
+        last_value = 0
+
+    # Another transaction may create the same counter meanwhile: keep theirs
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    db.execute(
+        dialect.insert(DocumentSequence).values(
+            branch_id=branch_id, doc_type=doc_type, business_date=business_date, last_value=last_value
+        ).on_conflict_do_nothing()
+    )
@@ -0,0 +1,169 @@
+"""
+Table status reconciler
+
+Order routes keep Table.status in step with the table's orders as they
+change, but tables still drift: an order deleted by hand, a worker killed
+between two commits, a merge group left with a single table. GET /tables and
+GET /tables/with-stats used to repair such tables while reading them, with a
+commit per table, so a floor plan refresh could contend with waiters placing
+orders. Reads now only show the repaired status; the rows are fixed here, in
+bulk, by two set-based UPDATEs per pass:
+
+- lone merge groups: a merge_group_id no other table of the branch shares
+  is cleared with the table's merged_to_id (what unmerge does for the last
+  table of a group)
+- stale status: a table outside any merge group that is Occupied or
+  BillRequested without an open order (ACTIVE_ORDER_STATUSES) goes back to
+  Available; merged tables may be occupied while empty and are left alone
+
+Both conditions are re-checked by the UPDATE itself, so an order placed while
+a pass runs is never overwritten by a decision made earlier.
+
+TableReconciler runs a pass over every branch each
+TABLE_RECONCILE_INTERVAL_SECONDS, and over a branch shortly after one of its
+orders changes state (notify()). Every worker runs its own; the passes are
+idempotent, so overlapping ones only cost a query.
+"""
+import asyncio
+from typing import Iterable, List, NamedTuple, Optional, Set
+
+from sqlalchemy import exists, func, or_, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.db import database
+from app.models import Order, Table
+from app.models.orders import ACTIVE_ORDER_STATUSES
+
+
+class TableFixes(NamedTuple):
+    unmerged: List[int]
+    released: List[int]
+
+    @property
+    def count(self) -> int:
+        return len(self.unmerged) + len(self.released)
+
+
+def _in_branches(branch_ids: Optional[Iterable[Optional[int]]]):
+    if branch_ids is None:
+        return true()
+    branch_ids = set(branch_ids)
+    conditions = [Table.branch_id.in_([b for b in branch_ids if b is not None])]
+    if None in branch_ids:
+        conditions.append(Table.branch_id.is_(None))
+    return or_(*conditions)
+
+
+def _not_merged():
+    return func.coalesce(Table.merge_group_id, "") == ""
+
+
+def reconcile_tables(db: Session, branch_ids: Optional[Iterable[Optional[int]]] = None) -> TableFixes:
+    """Fix drifted tables of these branches (all when None); the caller commits"""
+    scope = _in_branches(branch_ids)
+
+    other = aliased(Table)
+    group_size = (
+        select(func.count())
+        .select_from(other)
+        .where(
+            other.merge_group_id == Table.merge_group_id,
+            other.branch_id.is_not_distinct_from(Table.branch_id)
+        )
+        .scalar_subquery()
+    )
+    unmerged = db.execute(
+        update(Table)
+        .where(scope, ~_not_merged(), group_size == 1)
+        .values(merge_group_id=None, merged_to_id=None)
+        .returning(Table.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+    open_order = exists().where(Order.table_id == Table.id, Order.status.in_(ACTIVE_ORDER_STATUSES))
+    released = db.execute(
+        update(Table)
+        .where(
+            scope,
+            Table.status.in_(["Occupied", "BillRequested"]),
+            _not_merged(),
+            ~open_order
+        )
+        .values(status="Available")
+        .returning(Table.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+    return TableFixes(list(unmerged), list(released))
+
+
+class TableReconciler:
+    """Runs reconcile_tables in the background: on a timer and after order-state changes"""
+
+    def __init__(self, interval_seconds: float, debounce_seconds: float = 1.0):
+        self.interval = interval_seconds
+        self.debounce = debounce_seconds
+        self.running = False
+        self.passes = 0
+        self.fixed = 0
+
+        self._pending: Set[Optional[int]] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the reconcile loop on the running event loop"""
+        if self.running or self.interval <= 0:
+            return
+        self._wake = asyncio.Event()
+        self.running = True
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self, branch_id: Optional[int]):
+        """Reconcile this branch soon (call after an order changed state and was committed)"""
+        if not self.running:
+            return
+        self._pending.add(branch_id)
+        self._wake.set()
+
+    async def run_once(self, branch_ids: Optional[Iterable[Optional[int]]] = None) -> TableFixes:
+        async with AsyncSession(database.get_async_engine()) as db:
+            fixes = await db.run_sync(reconcile_tables, branch_ids)
+            await db.commit()
+        self.passes += 1
+        self.fixed += fixes.count
+        if fixes.count:
+            print(f"✓ Table reconciler: released {len(fixes.released)} table(s), "
+                  f"dissolved {len(fixes.unmerged)} lone merge group(s)")
+        return fixes
+
+    async def _run(self):
+        while self.running:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+                # Let a burst of order changes settle into one pass
+                await asyncio.sleep(self.debounce)
+                branch_ids = self._pending
+            except asyncio.TimeoutError:
+                branch_ids = None  # scheduled pass: every branch
+            self._wake.clear()
+            self._pending = set()
+            try:
+                await self.run_once(branch_ids)
+            except Exception as e:
+                print(f"⚠ Table reconciler pass failed: {e}")
+
+
+table_reconciler = TableReconciler(settings.TABLE_RECONCILE_INTERVAL_SECONDS)
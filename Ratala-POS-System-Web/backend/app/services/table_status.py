@@ -0,0 +1,73 @@
+"""
+Floor plan status: every table with its active order in one statement
+
+GET /tables, GET /tables/with-stats and GET /pos/sync used to look up the
+active order and then its KOTs table by table - two statements per table,
+plus one per floor for with-stats. table_status_query returns each table
+with the id, net amount and start time of its active order and that order's
+KOT / BOT counts at once:
+
+- active: the branch's open orders ranked per table with row_number(),
+  newest first, so a table with more than one open order shows the latest.
+  Open means ACTIVE_ORDER_STATUSES (Pending, In Progress, BillRequested,
+  Draft), the statuses GET /pos/sync always counted and the predicate of
+  ix_orders_active_branch; settled orders (Paid, Completed, Cancelled) never
+  show as a table's running order
+- tickets: count(*) FILTER (WHERE ...) of the KOTs / BOTs of the first-ranked
+  orders
+- tables LEFT JOIN both
+
+Window functions and aggregate FILTER run on PostgreSQL and SQLite alike.
+Callers add their own table filters and ORDER BY and read each row as
+row.Table, row.active_order_id, row.net_amount, row.order_start_time,
+row.kot_count and row.bot_count.
+"""
+from typing import Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.sql import Select
+
+from app.models import KOT, Order, Table
+from app.models.orders import ACTIVE_ORDER_STATUSES
+
+
+def table_status_query(branch_id: Optional[int]) -> Select:
+    """Tables with their active order and its ticket counts (all branches when branch_id is None)"""
+    active = (
+        select(
+            Order.id, Order.table_id, Order.net_amount, Order.created_at,
+            func.row_number().over(
+                partition_by=Order.table_id,
+                order_by=(Order.created_at.desc(), Order.id.desc())
+            ).label("rank")
+        )
+        .where(Order.table_id.is_not(None), Order.status.in_(ACTIVE_ORDER_STATUSES))
+    )
+    if branch_id is not None:
+        active = active.where(Order.branch_id == branch_id)
+    active = active.cte("active")
+
+    is_kot = func.coalesce(KOT.kot_type, "") == "KOT"
+    tickets = (
+        select(
+            KOT.order_id,
+            func.count().filter(is_kot).label("kot_count"),
+            func.count().filter(~is_kot).label("bot_count"),
+        )
+        .join(active, and_(active.c.id == KOT.order_id, active.c.rank == 1))
+        .group_by(KOT.order_id)
+        .cte("tickets")
+    )
+
+    return (
+        select(
+            Table,
+            active.c.id.label("active_order_id"),
+            active.c.net_amount,
+            active.c.created_at.label("order_start_time"),
+            func.coalesce(tickets.c.kot_count, 0).label("kot_count"),
+            func.coalesce(tickets.c.bot_count, 0).label("bot_count"),
+        )
+        .outerjoin(active, and_(active.c.table_id == Table.id, active.c.rank == 1))
+        .outerjoin(tickets, tickets.c.order_id == active.c.id)
+    )
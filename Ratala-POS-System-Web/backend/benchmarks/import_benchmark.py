@@ -0,0 +1,97 @@
+"""
+Import-time and memory profile of a worker
+
+Imports app.main in fresh subprocesses (the work every worker repeats on
+start), using `python -X importtime` to find the most expensive modules, and
+reports peak RSS after import. Fails (exit 1) if a library that should only
+load on first use - reportlab, pandas, openpyxl, qrcode, PIL - is imported
+at startup.
+
+    python benchmarks/import_benchmark.py
+    python benchmarks/import_benchmark.py --runs 5 --top 30
+
+Run from the backend directory.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Only export / QR routes need these; they must stay out of the startup path
+LAZY_MODULES = ("reportlab", "pandas", "openpyxl", "qrcode", "PIL", "xlsxwriter")
+
+MEASURE_SCRIPT = """
+import resource, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+loaded = sorted({name.split('.')[0] for name in sys.modules} & set(%r))
+print(f"RESULT {elapsed:.4f} {rss_mb:.1f} {','.join(loaded)}")
+""" % (LAZY_MODULES,)
+
+
+def _env():
+    return {**os.environ, "PYTHONPATH": str(BACKEND_DIR)}
+
+
+def measure():
+    """Import time (s), peak RSS (MB) and eagerly loaded heavy modules for one fresh process"""
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE_SCRIPT],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True
+    ).stdout
+    line = next(l for l in output.splitlines() if l.startswith("RESULT "))
+    parts = line.split(" ")
+    loaded = [name for name in parts[3].split(",") if name] if len(parts) > 3 else []
+    return float(parts[1]), float(parts[2]), loaded
+
+
+def importtime_profile():
+    """Parse `-X importtime` output into (module, self_us, cumulative_us) rows"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((module.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile worker import time and memory")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20, help="Modules to list by cumulative import time")
+    args = parser.parse_args()
+
+    samples = [measure() for _ in range(args.runs)]
+    import_ms = [s[0] * 1000 for s in samples]
+    rss_mb = [s[1] for s in samples]
+    eager = samples[0][2]
+
+    print(f"import app.main  median={statistics.median(import_ms):.0f}ms  min={min(import_ms):.0f}ms  (runs={args.runs})")
+    print(f"peak RSS         median={statistics.median(rss_mb):.1f}MB")
+
+    rows = importtime_profile()
+    print(f"\nTop {args.top} imports by cumulative time (-X importtime):")
+    for module, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  (self {self_us / 1000:6.1f}ms)  {module.strip()}")
+
+    heavy = [r for r in rows if r[0].strip().split(".")[0] in LAZY_MODULES]
+    if eager:
+        cost = sum(r[1] for r in heavy) / 1000
+        print(f"\n✗ Loaded at startup but should be lazy: {', '.join(eager)} (~{cost:.0f}ms self time)")
+        sys.exit(1)
+    print(f"\n✓ None of {', '.join(LAZY_MODULES)} loaded at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Login burst benchmark
+
+Simulates shift start: many staff logging in at once against one uvicorn
+worker, while a few terminals keep refreshing GET /tables. Runs the burst
+twice, comparing bcrypt hashed inline (PASSWORD_HASH_WORKERS=0, which blocks
+the event loop for every verify the way the login route used to) with the
+dedicated password hasher pool, and reports per worker:
+
+    logins/s, login p50/p95, 503s (PASSWORD_HASH_MAX_PENDING reached)
+    GET /tables p50/p95/max while the burst is running
+
+    python benchmarks/login_benchmark.py
+    python benchmarks/login_benchmark.py --logins 8 --readers 4 --duration 15 --hash-workers 4
+
+Run from the backend directory; the database given by --database-url is
+dropped and recreated - never point it at real data.
+"""
+import argparse
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+from load_benchmark import BACKEND_DIR, BRANCH_CODE, seed_database, free_port, start_server, percentile
+
+
+class Client(threading.Thread):
+    """Repeats one request until stop_at, recording latency and status"""
+
+    def __init__(self, port, method, path, body, headers, stop_at, samples, lock):
+        super().__init__(daemon=True)
+        self.port = port
+        self.method, self.path, self.body, self.headers = method, path, body, headers
+        self.stop_at = stop_at
+        self.samples = samples
+        self.lock = lock
+
+    def run(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        while time.time() < self.stop_at:
+            started = time.perf_counter()
+            try:
+                conn.request(self.method, self.path, body=self.body, headers=self.headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+                status = 599
+            with self.lock:
+                self.samples.append(((time.perf_counter() - started) * 1000, status))
+
+
+def run_burst(database_url: str, hash_workers: int, args, tmp_dir: str) -> dict:
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "PASSWORD_HASH_WORKERS": str(hash_workers),
+        "ENVIRONMENT": "development",
+        "PYTHONPATH": str(BACKEND_DIR),
+    }
+    os.environ.update(env)
+    seeded = seed_database(tables=args.tables, menu_items=10)
+
+    port = free_port()
+    log_path = Path(tmp_dir) / f"server-{hash_workers}.log"
+    server = start_server(port, env, log_path)
+
+    lock = threading.Lock()
+    logins, reads = [], []
+    login_body = urlencode({"username": "bench_admin", "password": "bench"})
+    login_headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    read_headers = {"Authorization": f"Bearer {seeded['token']}", "X-Branch-Code": BRANCH_CODE}
+    try:
+        started = time.time()
+        stop_at = started + args.duration
+        clients = [
+            Client(port, "POST", "/api/v1/auth/token", login_body, login_headers, stop_at, logins, lock)
+            for _ in range(args.logins)
+        ] + [
+            Client(port, "GET", "/api/v1/tables", None, read_headers, stop_at, reads, lock)
+            for _ in range(args.readers)
+        ]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        duration = time.time() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    ok_logins = sorted(ms for ms, status in logins if status == 200)
+    read_ms = sorted(ms for ms, status in reads if status == 200)
+    return {
+        "hash_workers": hash_workers,
+        "logins_per_s": len(ok_logins) / duration,
+        "login_p50_ms": percentile(ok_logins, 50),
+        "login_p95_ms": percentile(ok_logins, 95),
+        "rejected": sum(1 for _, status in logins if status == 503),
+        "failed": sum(1 for _, status in logins + reads if status not in (200, 503)),
+        "reads_per_s": len(read_ms) / duration,
+        "read_p50_ms": percentile(read_ms, 50),
+        "read_p95_ms": percentile(read_ms, 95),
+        "read_max_ms": read_ms[-1] if read_ms else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput per worker, inline vs pooled bcrypt")
+    parser.add_argument("--database-url", help="Defaults to a throwaway SQLite file")
+    parser.add_argument("--logins", type=int, default=8, help="Concurrent clients logging in")
+    parser.add_argument("--readers", type=int, default=2, help="Concurrent clients refreshing GET /tables")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per run")
+    parser.add_argument("--tables", type=int, default=30)
+    parser.add_argument("--hash-workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--json", action="store_true", help="Print raw results as JSON")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    database_url = args.database_url or f"sqlite:///{tmp_dir.name}/login_bench.db"
+
+    results = []
+    for hash_workers in (0, args.hash_workers):
+        label = "inline" if hash_workers == 0 else f"pool x{hash_workers}"
+        print(f"Running {label}: {args.logins} logins + {args.readers} readers for {args.duration:.0f}s ...")
+        results.append({"label": label, **run_burst(database_url, hash_workers, args, tmp_dir.name)})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\n{'':<12}{'logins/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'503s':>6}"
+          f"{'reads/s':>10}{'read p50':>10}{'read p95':>10}{'read max':>10}")
+    for row in results:
+        print(f"{row['label']:<12}{row['logins_per_s']:>10.1f}{row['login_p50_ms']:>9.0f}{row['login_p95_ms']:>9.0f}"
+              f"{row['rejected']:>6}{row['reads_per_s']:>10.1f}{row['read_p50_ms']:>10.1f}"
+              f"{row['read_p95_ms']:>10.1f}{row['read_max_ms']:>10.1f}")
+    if any(row["failed"] for row in results):
+        print(f"\n⚠ Failed requests: {', '.join(str(row['failed']) for row in results)} (see server logs in {tmp_dir.name})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Worker startup benchmark
+
+Times what every gunicorn/uvicorn worker does before it can serve traffic:
+importing the app and running init_db(). Each run is a fresh subprocess.
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --database-url postgresql://... --workers 4
+
+Modes compared:
+- cold:  empty database, full DDL (first deploy)
+- ddl:   schema exists but the fingerprint row is removed, so the full
+         create_all + ALTER TABLE path runs again (the old per-worker cost)
+- warm:  fingerprint is current, init_db skips all DDL
+
+--workers N starts N processes at once per run, like a rolling restart; with
+PostgreSQL only one of them takes the migration advisory lock.
+
+Run from the backend directory.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+WORKER_SCRIPT = """
+import time
+started = time.perf_counter()
+from app.db.database import init_db
+import app.models
+imported = time.perf_counter()
+init_db()
+done = time.perf_counter()
+print(f"RESULT {imported - started:.4f} {done - imported:.4f}")
+"""
+
+
+def run_workers(database_url: str, workers: int):
+    """Start `workers` processes at once; return (import_s, init_db_s) per worker"""
+    env = {**os.environ, "DATABASE_URL": database_url, "PYTHONPATH": str(BACKEND_DIR)}
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER_SCRIPT],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        for _ in range(workers)
+    ]
+    results = []
+    for proc in procs:
+        output, _ = proc.communicate()
+        line = next((l for l in output.splitlines() if l.startswith("RESULT ")), None)
+        if proc.returncode != 0 or line is None:
+            raise RuntimeError(f"Worker failed:\n{output}")
+        _, import_s, init_s = line.split()
+        results.append((float(import_s), float(init_s)))
+    return results
+
+
+def clear_fingerprint(database_url: str):
+    env = {**os.environ, "DATABASE_URL": database_url, "PYTHONPATH": str(BACKEND_DIR)}
+    subprocess.run(
+        [sys.executable, "-c",
+         "from sqlalchemy import text\n"
+         "from app.db.database import get_engine\n"
+         "with get_engine().begin() as conn:\n"
+         "    conn.execute(text('DELETE FROM schema_fingerprint'))\n"],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True
+    )
+
+
+def summarize(label: str, samples):
+    init_ms = [s[1] * 1000 for s in samples]
+    import_ms = [s[0] * 1000 for s in samples]
+    print(
+        f"{label:<6} n={len(samples):<3} "
+        f"init_db median={statistics.median(init_ms):8.1f}ms max={max(init_ms):8.1f}ms   "
+        f"import median={statistics.median(import_ms):8.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark worker startup (import + init_db)")
+    parser.add_argument("--database-url", help="Defaults to a throwaway SQLite file")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1, help="Processes started concurrently per run")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    database_url = args.database_url
+    if not database_url:
+        tmp_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{tmp_dir.name}/startup_bench.db"
+
+    print(f"Database: {database_url.split('@')[-1]}  runs={args.runs}  workers={args.workers}\n")
+    started = time.perf_counter()
+
+    # Cold start is only meaningful once, against a fresh database
+    cold = run_workers(database_url, 1) if tmp_dir else []
+
+    ddl, warm = [], []
+    for _ in range(args.runs):
+        clear_fingerprint(database_url)
+        ddl += run_workers(database_url, args.workers)
+        warm += run_workers(database_url, args.workers)
+
+    if cold:
+        summarize("cold", cold)
+    summarize("ddl", ddl)
+    summarize("warm", warm)
+
+    speedup = statistics.median(s[1] for s in ddl) / max(statistics.median(s[1] for s in warm), 1e-9)
+    print(f"\ninit_db with current fingerprint is {speedup:.1f}x faster than re-running DDL")
+    print(f"Total benchmark time: {time.perf_counter() - started:.1f}s")
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Offline order ingest (order_ingest_service.ingest_chunk) on SQLite
+
+A replayed chunk must not create its orders again, and a bad order must only
+fail itself, never the valid orders of its chunk.
+"""
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+BRANCH_CODE = "BR1"
+
+
+@pytest.fixture
+def db(sqlite_engine):
+    from app.core.menu_snapshot import menu_snapshots
+    from app.core.pricing import pricing_profiles
+    from app.models import Branch, Category, CompanySettings, MenuItem, Organization, Table, User
+
+    with Session(sqlite_engine) as db:
+        owner = User(username="owner", email="owner@x", full_name="Owner", hashed_password="-", role="admin")
+        db.add(owner)
+        db.flush()
+        organization = Organization(name="Org", slug="org", owner_id=owner.id)
+        db.add(organization)
+        db.flush()
+        branch = Branch(organization_id=organization.id, name="Main", code=BRANCH_CODE, slug="main")
+        db.add(branch)
+        db.flush()
+        food = Category(name="Food", type="KOT", branch_id=branch.id)
+        drinks = Category(name="Drinks", type="BOT", branch_id=branch.id)
+        db.add_all([food, drinks, CompanySettings(company_name="X")])
+        db.flush()
+        db.add_all([
+            MenuItem(name="Momo", category_id=food.id, price=200, kot_bot="KOT", branch_id=branch.id),
+            MenuItem(name="Beer", category_id=drinks.id, price=500, kot_bot="BOT", branch_id=branch.id),
+            Table(table_id="T1", floor="Ground", branch_id=branch.id),
+        ])
+        db.commit()
+
+        # Worker-wide caches: another test's database may have used the same ids
+        menu_snapshots.invalidate(branch.id)
+        pricing_profiles.invalidate(branch.id)
+        pricing_profiles.invalidate_all()
+        db.info.update(branch_id=branch.id, user_id=owner.id)
+        yield db
+
+
+def ingest(db, payloads):
+    from app.services import order_ingest_service
+
+    results = order_ingest_service.ingest_chunk(
+        db, payloads, db.info["branch_id"], BRANCH_CODE, db.info["user_id"]
+    )
+    db.commit()
+    return results
+
+
+def menu_ids(db):
+    from app.models import MenuItem
+
+    return dict(db.execute(select(MenuItem.name, MenuItem.id)).all())
+
+
+def order_count(db):
+    from app.models import Order
+
+    return db.execute(select(func.count(Order.id))).scalar()
+
+
+def test_replaying_a_key_returns_the_earlier_order(db):
+    menu = menu_ids(db)
+    payloads = [
+        {"idempotency_key": "k1", "order_type": "Takeaway", "items": [{"menu_item_id": menu["Momo"], "quantity": 2}]},
+        {"idempotency_key": "k2", "order_type": "Takeaway", "status": "Paid",
+         "items": [{"menu_item_id": menu["Beer"], "quantity": 1}]},
+    ]
+    first = ingest(db, [dict(payload) for payload in payloads])
+    assert [entry["status"] for entry in first] == ["created", "created"]
+
+    replay = ingest(db, [dict(payload) for payload in payloads])
+    assert [entry["status"] for entry in replay] == ["duplicate", "duplicate"]
+    assert [(entry["order_id"], entry["order_number"]) for entry in replay] == \
+        [(entry["order_id"], entry["order_number"]) for entry in first]
+    assert order_count(db) == 2
+
+
+def test_bad_orders_fail_alone(db):
+    from app.models import KOT, Order
+
+    menu = menu_ids(db)
+    momo = [{"menu_item_id": menu["Momo"], "quantity": 1}]
+    ingest(db, [{"idempotency_key": "old", "order_type": "Takeaway", "order_number": "BR1-ORD-OLD", "items": momo}])
+
+    results = ingest(db, [
+        {"idempotency_key": "a", "order_type": "Takeaway", "order_number": "BR1-ORD-X", "items": momo},
+        {"idempotency_key": "b", "order_type": "Takeaway", "items": [{"menu_item_id": 99999, "quantity": 1}]},
+        {"idempotency_key": "c", "order_type": "Takeaway", "order_number": "BR1-ORD-X", "items": momo},
+        {"idempotency_key": "d", "order_type": "Takeaway", "order_number": "BR1-ORD-OLD", "items": momo},
+        {"order_type": "Takeaway", "items": momo},
+        {"idempotency_key": "e", "order_type": "Takeaway", "items": []},
+        {"idempotency_key": "f", "order_type": "Takeaway", "table_id": 99999, "items": momo},
+        {"idempotency_key": "g", "order_type": "Takeaway", "created_at": "yesterday", "items": momo},
+        {"idempotency_key": "a", "order_type": "Takeaway", "items": momo},
+        {"idempotency_key": "h", "order_type": "Takeaway", "items": [{"menu_item_id": menu["Beer"], "quantity": 2}]},
+    ])
+
+    assert [entry["status"] for entry in results] == [
+        "created", "error", "error", "error", "error", "error", "error", "error", "duplicate", "created"
+    ]
+    assert results[2]["detail"] == "order_number repeats an earlier order in this request"
+    assert results[3]["detail"] == "order_number already exists"
+    assert results[8]["order_id"] == results[0]["order_id"]
+    assert results[0]["order_number"] == "BR1-ORD-X"
+
+    created = [results[0]["order_id"], results[9]["order_id"]]
+    assert order_count(db) == 3
+    assert db.execute(select(func.count(KOT.id)).where(KOT.order_id.in_(created))).scalar() == 2
+    assert db.execute(select(Order.order_number).where(Order.id == results[9]["order_id"])).scalar() \
+        .startswith("BR1-ORD-")
+
+
+def test_a_number_rejected_earlier_in_the_chunk_is_free(db):
+    menu = menu_ids(db)
+    results = ingest(db, [
+        {"idempotency_key": "a", "order_type": "Takeaway", "order_number": "BR1-ORD-Y",
+         "items": [{"menu_item_id": 99999, "quantity": 1}]},
+        {"idempotency_key": "b", "order_type": "Takeaway", "order_number": "BR1-ORD-Y",
+         "items": [{"menu_item_id": menu["Momo"], "quantity": 1}]},
+    ])
+    assert [entry["status"] for entry in results] == ["error", "created"]
+    assert results[1]["order_number"] == "BR1-ORD-Y"
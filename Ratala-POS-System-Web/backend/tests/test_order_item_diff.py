@@ -0,0 +1,155 @@
+"""
+diff_order_items: which stored lines an order update keeps, changes, deletes and adds
+
+Whatever the matching, applying a diff must leave exactly the incoming lines
+(what deleting and re-inserting every line did before) and gross_delta must
+be the change of sum(quantity * price).
+"""
+from collections import Counter
+from decimal import Decimal
+
+from app.models.orders import OrderItem
+from app.services.order_item_diff import LINE_COLUMNS, diff_order_items, line_values
+
+MOMO, BEER, TEA = 1, 2, 3
+PRICES = {MOMO: 200, BEER: 500, TEA: 50}
+
+
+def stored(*lines):
+    """OrderItem rows with ids 1, 2, ... from (menu item, quantity[, notes])"""
+    rows = []
+    for row_id, (menu_item_id, quantity, *notes) in enumerate(lines, start=1):
+        price = PRICES[menu_item_id]
+        rows.append(OrderItem(
+            id=row_id, menu_item_id=menu_item_id, quantity=quantity, price=price,
+            subtotal=price * quantity, notes=notes[0] if notes else None
+        ))
+    return rows
+
+
+def incoming(*lines):
+    """Request lines from (menu item, quantity[, notes[, id]])"""
+    items = []
+    for menu_item_id, quantity, *rest in lines:
+        item = {"menu_item_id": menu_item_id, "quantity": quantity, "price": PRICES[menu_item_id]}
+        if rest:
+            item["notes"] = rest[0]
+        if len(rest) > 1:
+            item["id"] = rest[1]
+        items.append(item)
+    return items
+
+
+def gross(lines) -> Decimal:
+    return sum((Decimal(line["quantity"]) * Decimal(line["price"]) for line in lines), Decimal(0))
+
+
+def rows_values(existing):
+    return [{"quantity": row.quantity, "price": row.price} for row in existing]
+
+
+def check_applies(existing, items, diff):
+    """The stored lines after the diff are exactly the incoming ones"""
+    rows = {row.id: line_values({column: getattr(row, column) for column in LINE_COLUMNS}) for row in existing}
+    for row_id in diff.deletes:
+        del rows[row_id]
+    for update in diff.updates:
+        rows[update["id"]] = {key: value for key, value in update.items() if key != "id"}
+    result = list(rows.values()) + diff.inserts
+
+    def key(line):
+        return tuple(sorted(line.items()))
+
+    assert Counter(map(key, result)) == Counter(key(line_values(item)) for item in items)
+    assert diff.gross_delta == gross(items) - gross(rows_values(existing))
+    assert diff.unchanged + len(diff.updates) + len(diff.inserts) == len(items)
+
+
+def test_nothing_changed():
+    existing = stored((MOMO, 2), (BEER, 1, "chilled"))
+    items = incoming((MOMO, 2), (BEER, 1, "chilled"))
+    diff = diff_order_items(existing, items)
+    assert (diff.unchanged, diff.changed, diff.gross_delta) == (2, False, 0)
+    check_applies(existing, items, diff)
+
+
+def test_reordered_lines_are_unchanged():
+    existing = stored((MOMO, 2), (BEER, 1), (TEA, 3, "no sugar"))
+    items = incoming((TEA, 3, "no sugar"), (BEER, 1), (MOMO, 2))
+    diff = diff_order_items(existing, items)
+    assert diff.unchanged == 3 and not diff.changed
+    check_applies(existing, items, diff)
+
+
+def test_reordered_lines_with_ids_keep_their_rows():
+    existing = stored((MOMO, 2), (BEER, 1))
+    items = incoming((BEER, 4, "", 2), (MOMO, 2, "", 1))
+    diff = diff_order_items(existing, items)
+    assert diff.updates == [{"id": 2, **line_values(items[0])}]
+    assert diff.unchanged == 1 and diff.inserts == diff.deletes == []
+    assert diff.gross_delta == 3 * PRICES[BEER]
+    check_applies(existing, items, diff)
+
+
+def test_same_item_twice_matches_each_line_once():
+    existing = stored((MOMO, 1), (MOMO, 1, "spicy"))
+    items = incoming((MOMO, 1, "spicy"), (MOMO, 3))
+    diff = diff_order_items(existing, items)
+    # The plain line got the new quantity; the spicy one is untouched
+    assert diff.updates == [{"id": 1, **line_values(items[1])}]
+    assert diff.unchanged == 1 and diff.inserts == diff.deletes == []
+    assert diff.gross_delta == 2 * PRICES[MOMO]
+    check_applies(existing, items, diff)
+
+
+def test_same_item_twice_one_removed():
+    existing = stored((MOMO, 1), (MOMO, 1))
+    items = incoming((MOMO, 1))
+    diff = diff_order_items(existing, items)
+    assert diff.unchanged == 1 and diff.deletes == [2] and diff.updates == diff.inserts == []
+    assert diff.gross_delta == -PRICES[MOMO]
+    check_applies(existing, items, diff)
+
+
+def test_same_item_added_again():
+    existing = stored((MOMO, 2))
+    items = incoming((MOMO, 2), (MOMO, 1, "for kids"))
+    diff = diff_order_items(existing, items)
+    assert diff.unchanged == 1 and diff.inserts == [line_values(items[1])] and diff.deletes == []
+    assert diff.gross_delta == PRICES[MOMO]
+    check_applies(existing, items, diff)
+
+
+def test_quantity_dropping_to_zero_keeps_a_zero_line():
+    # As the delete-and-reinsert it replaced, a 0 line is stored, not removed
+    existing = stored((MOMO, 2), (BEER, 1))
+    items = incoming((MOMO, 0), (BEER, 1))
+    diff = diff_order_items(existing, items)
+    assert diff.updates == [{"id": 1, **line_values(items[0])}]
+    assert diff.updates[0]["subtotal"] == 0
+    assert diff.gross_delta == -2 * PRICES[MOMO]
+    check_applies(existing, items, diff)
+
+
+def test_lines_added_and_removed():
+    existing = stored((MOMO, 2), (BEER, 1), (TEA, 1))
+    items = incoming((TEA, 1), (MOMO, 1, "extra sauce"), (BEER, 2, "", 99))
+    diff = diff_order_items(existing, items)
+    # id 99 is not a line of this order: BEER is matched by menu item instead
+    assert sorted(update["id"] for update in diff.updates) == [1, 2]
+    assert diff.unchanged == 1 and diff.inserts == diff.deletes == []
+    check_applies(existing, items, diff)
+
+    items = incoming((TEA, 2), (BEER, 1))
+    diff = diff_order_items(existing, items)
+    assert diff.deletes == [1] and diff.unchanged == 1 and len(diff.updates) == 1
+    check_applies(existing, items, diff)
+
+
+def test_every_line_replaced():
+    existing = stored((MOMO, 2), (BEER, 1))
+    items = incoming((TEA, 4))
+    diff = diff_order_items(existing, items)
+    assert sorted(diff.deletes) == [1, 2] and diff.inserts == [line_values(items[0])]
+    assert diff.gross_delta == 4 * PRICES[TEA] - 2 * PRICES[MOMO] - PRICES[BEER]
+    check_applies(existing, items, diff)
@@ -0,0 +1,160 @@
+"""
+Partitioning the order tables keeps every row and every unique number
+
+Runs partition_order_tables on a populated PostgreSQL database (three months
+of orders with lines and KOTs, standalone KOTs without an order and an order
+without created_at), archives the oldest month and converts back, checking
+row counts and that duplicate order / KOT numbers are still rejected at each
+step. Needs TEST_POSTGRES_URL (see conftest.py).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+TABLES = ("orders", "order_items", "kots", "kot_items")
+FIRST_DAY = datetime(2026, 1, 1, 12)
+DAYS = 90
+
+
+def row_counts(conn) -> dict:
+    return {table: conn.execute(text(f"SELECT count(*) FROM {table}")).scalar() for table in TABLES}
+
+
+def rejects(engine, statement: str) -> bool:
+    """Does the statement fail on a unique number? (rolled back either way)"""
+    with engine.connect() as conn:
+        try:
+            conn.execute(text(statement))
+        except IntegrityError:
+            return True
+        finally:
+            conn.rollback()
+    return False
+
+
+@pytest.fixture(scope="module")
+def engine(postgres_engine_factory):
+    from app.models import Branch, Organization, User
+
+    engine = postgres_engine_factory("partition_check")
+    with Session(engine) as db:
+        owner = User(username="owner", email="owner@x", full_name="Owner", hashed_password="-", role="admin")
+        db.add(owner)
+        db.flush()
+        organization = Organization(name="Org", slug="org", owner_id=owner.id)
+        db.add(organization)
+        db.flush()
+        db.add(Branch(id=1, organization_id=organization.id, name="Main", code="BR1", slug="main"))
+        db.commit()
+    with engine.begin() as conn:
+        for day in range(DAYS):
+            created_at = FIRST_DAY + timedelta(days=day)
+            conn.execute(text(
+                "INSERT INTO orders (id, order_number, order_type, status, branch_id, created_at) "
+                "VALUES (:id, :number, 'Takeaway', 'Paid', 1, :created_at)"
+            ), {"id": day + 1, "number": f"BR1-ORD-{created_at:%Y%m%d}-0001", "created_at": created_at})
+            conn.execute(text(
+                "INSERT INTO order_items (id, order_id, quantity, price, subtotal, created_at) "
+                "VALUES (:id, :id, 1, 100, 100, :created_at), (:id + 1000, :id, 2, 50, 100, :created_at)"
+            ), {"id": day + 1, "created_at": created_at})
+            conn.execute(text(
+                "INSERT INTO kots (id, kot_number, order_id, branch_id, created_at) "
+                "VALUES (:id, :number, :id, 1, :created_at)"
+            ), {"id": day + 1, "number": f"KOT-{created_at:%Y%m%d}-0001", "created_at": created_at})
+            conn.execute(text(
+                "INSERT INTO kot_items (id, kot_id, quantity, created_at) VALUES (:id, :id, 1, :created_at)"
+            ), {"id": day + 1, "created_at": created_at})
+        # Standalone KOTs (POST /kots without an order) and an order without created_at
+        conn.execute(text(
+            "INSERT INTO kots (id, kot_number, order_id, branch_id, created_at) VALUES "
+            "(500, 'KOT-20260105-0002', NULL, 1, '2026-01-05'), (501, 'KOT-20260301-0002', NULL, 1, '2026-03-01')"
+        ))
+        conn.execute(text("INSERT INTO kot_items (id, kot_id, quantity) VALUES (500, 500, 1), (501, 501, 3)"))
+        conn.execute(text(
+            "INSERT INTO orders (id, order_number, order_type, status, branch_id, created_at, updated_at) "
+            "VALUES (999, 'BR1-ORD-LEGACY', 'Takeaway', 'Paid', 1, NULL, '2026-02-10')"
+        ))
+        for table in TABLES:
+            conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), 5000)"))
+    return engine
+
+
+def test_partitioning_keeps_rows_and_unique_numbers(engine):
+    from app.db.partitioning import is_partitioned, partition_order_tables
+
+    with engine.connect() as conn:
+        before = row_counts(conn)
+    with engine.begin() as conn:
+        partition_order_tables(conn, months_ahead=1)
+
+    with engine.connect() as conn:
+        assert is_partitioned(conn)
+        assert row_counts(conn) == before
+        assert conn.execute(text("SELECT created_at FROM orders WHERE id = 999")).scalar() == datetime(2026, 2, 10)
+        assert conn.execute(text("SELECT count(*) FROM kot_items WHERE kot_id IN (500, 501)")).scalar() == 2
+
+    assert rejects(engine, "INSERT INTO orders (order_number, order_type, created_at) "
+                           "VALUES ('BR1-ORD-20260101-0001', 'Takeaway', now())")
+    assert rejects(engine, "INSERT INTO kots (kot_number, branch_id) VALUES ('KOT-20260105-0002', 1)")
+    assert rejects(engine, "INSERT INTO orders (order_number, order_type, created_at) "
+                           "VALUES ('BR1-ORD-X', 'Takeaway', now()), ('BR1-ORD-X', 'Takeaway', now())")
+
+    with engine.begin() as conn:
+        # A standalone KOT still goes in; a renumbered order frees its old number
+        conn.execute(text("INSERT INTO kots (kot_number, branch_id) VALUES ('KOT-20260401-0001', 1)"))
+        conn.execute(text("UPDATE orders SET order_number = 'BR1-ORD-RENUMBERED' WHERE id = 999"))
+        conn.execute(text("UPDATE orders SET status = 'Completed' WHERE id = 1"))
+        conn.execute(text(
+            "INSERT INTO orders (order_number, order_type, created_at) VALUES ('BR1-ORD-LEGACY', 'Takeaway', now())"
+        ))
+    assert rejects(engine, "INSERT INTO orders (order_number, order_type, created_at) "
+                           "VALUES ('BR1-ORD-RENUMBERED', 'Takeaway', now())")
+    assert rejects(engine, "INSERT INTO orders (order_number, order_type, created_at) "
+                           "VALUES ('BR1-ORD-20260101-0001', 'Takeaway', now())")
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM orders WHERE order_number = 'BR1-ORD-LEGACY'"))
+        conn.execute(text(
+            "INSERT INTO orders (order_number, order_type, created_at) VALUES ('BR1-ORD-LEGACY', 'Takeaway', now())"
+        ))
+
+
+def test_archiving_keeps_rows_and_unique_numbers(engine):
+    from app.db.partitioning import archive_month, ensure_month_partitions, month_partitions
+
+    with engine.connect() as conn:
+        before = row_counts(conn)
+    with engine.begin() as conn:
+        ensure_month_partitions(conn, datetime.now().date() + timedelta(days=62))
+        january = month_partitions(conn)[0]
+        archived = archive_month(conn, january)
+
+    assert archived == ["orders_p2026_01", "order_items_p2026_01", "kots_p2026_01", "kot_items_p2026_01"]
+    with engine.connect() as conn:
+        assert row_counts(conn) == before
+        # Lines below the first id of a later month; the January standalone KOT (id 500) stays hot
+        assert conn.execute(text("SELECT count(*) FROM kots_p2026_01")).scalar() == 31
+        assert conn.execute(text("SELECT count(*) FROM order_items_p2026_01")).scalar() == 31
+    assert rejects(engine, "INSERT INTO orders (order_number, order_type, created_at) "
+                           "VALUES ('BR1-ORD-20260115-0001', 'Takeaway', now())")
+    assert rejects(engine, "INSERT INTO kots (kot_number, branch_id) VALUES ('KOT-20260105-0002', 1)")
+
+
+def test_unpartitioning_keeps_rows_and_unique_numbers(engine):
+    from app.db.partitioning import is_partitioned, unpartition_order_tables
+
+    with engine.connect() as conn:
+        before = row_counts(conn)
+    with engine.begin() as conn:
+        unpartition_order_tables(conn)
+
+    with engine.connect() as conn:
+        assert not is_partitioned(conn)
+        assert row_counts(conn) == before
+        assert conn.execute(text("SELECT to_regclass('orders_order_number_unique')")).scalar() is None
+    assert rejects(engine, "INSERT INTO orders (order_number, order_type, created_at) "
+                           "VALUES ('BR1-ORD-20260115-0001', 'Takeaway', now())")
+    assert rejects(engine, "INSERT INTO kots (kot_number, branch_id) VALUES ('KOT-20260105-0002', 1)")
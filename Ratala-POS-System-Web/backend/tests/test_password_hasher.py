@@ -0,0 +1,38 @@
+"""
+PasswordHasher rejects logins by queue depth, not by hashes in flight
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.core.password_hasher import PasswordHasher, PasswordHasherBusy
+
+
+def test_busy_counts_only_queued_hashes():
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=1)
+    hashed = hasher.hash("secret")
+    release = threading.Event()
+    started = threading.Event()
+
+    def occupy():
+        started.set()
+        release.wait(5)
+
+    async def logins():
+        running = hasher._submit(False, occupy)
+        started.wait(5)
+        # The only worker is busy and nothing is queued: this one may wait
+        first = asyncio.ensure_future(hasher.verify_and_update("secret", hashed))
+        await asyncio.sleep(0)
+        assert hasher.to_dict()["queued"] == 1
+        with pytest.raises(PasswordHasherBusy):
+            await hasher.verify_and_update("secret", hashed)
+        release.set()
+        running.result(5)
+        return await first
+
+    valid, new_hash = asyncio.run(logins())
+    assert valid and new_hash is None
+    stats = hasher.to_dict()
+    assert (stats["pending"], stats["queued"], stats["rejected"]) == (0, 0, 1)
@@ -0,0 +1,72 @@
+"""
+Document numbers from concurrent sessions are unique and gapless
+
+Many sessions allocate order and KOT numbers of one branch and day at the
+same time, starting before the day's counter exists; some roll back. The
+committed numbers must be exactly 1..N. Needs TEST_POSTGRES_URL (see
+conftest.py): SQLite serializes every writer anyway.
+"""
+import threading
+from datetime import date
+
+import pytest
+from sqlalchemy.orm import Session
+
+SESSIONS = 16
+ALLOCATIONS = 25
+BUSINESS_DATE = date(2026, 3, 1)
+
+
+@pytest.fixture(scope="module")
+def branch(postgres_engine_factory):
+    from app.models import Branch, Organization, User
+
+    engine = postgres_engine_factory("sequence_check")
+    with Session(engine) as db:
+        owner = User(username="owner", email="owner@x", full_name="Owner", hashed_password="-", role="admin")
+        db.add(owner)
+        db.flush()
+        organization = Organization(name="Org", slug="org", owner_id=owner.id)
+        db.add(organization)
+        db.flush()
+        branch = Branch(organization_id=organization.id, name="Main", code="BR1", slug="main")
+        db.add(branch)
+        db.commit()
+        return engine, branch.id
+
+
+@pytest.mark.parametrize("doc_type, branch_code", [("ORD", "BR1"), ("KOT", None)])
+def test_concurrent_numbers_are_unique_and_gapless(branch, doc_type, branch_code):
+    from app.services import sequence_service
+
+    engine, branch_id = branch
+    committed, errors = [], []
+    lock = threading.Lock()
+    start = threading.Barrier(SESSIONS)
+
+    def allocate(worker: int):
+        try:
+            start.wait()
+            for attempt in range(ALLOCATIONS):
+                with Session(engine) as db:
+                    number = sequence_service.next_number(db, doc_type, branch_id, branch_code, BUSINESS_DATE)
+                    if (worker + attempt) % 5 == 0:
+                        db.rollback()  # gives the number back
+                        continue
+                    db.commit()
+                with lock:
+                    committed.append(number)
+        except Exception as e:  # reported by the main thread
+            errors.append(e)
+
+    workers = [threading.Thread(target=allocate, args=(worker,)) for worker in range(SESSIONS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert not errors, errors
+    prefix = sequence_service.document_prefix(doc_type, BUSINESS_DATE, branch_code)
+    assert len(committed) == len(set(committed)), "duplicate numbers"
+    assert sorted(committed) == [f"{prefix}{value:04d}" for value in range(1, len(committed) + 1)]
+    assert len(committed) == SESSIONS * ALLOCATIONS * 4 // 5